@@ -0,0 +1,175 @@
+"""
+Backtest roto projections against how the season actually ended, using the snapshots in historical_store
+
+For every date with a standings snapshot, the inputs of calc_roto are rebuilt from the latest snapshot of each dataset
+on or before that date. The projected final standings are then compared with the last standings snapshot (or the one
+on --actual-date). Dates are spread over a pool of processes, each of which keeps the snapshots in memory.
+
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+import pandas
+
+import historical_store
+from calc_roto import (
+    COUNTING_STATS, RATIO_STATS, RATIO_STATS_PARTS, calc_final_standings, calc_rankings, calc_ros_values,
+    combine_projection_frames, prepare_standings
+)
+from instrumentation import entry_point, parse_args, timed
+from player_ids import resolve_projections
+from utils import DTYPES, prepare_projections, prepare_recent_playing_time
+from config import MY_TEAM_ID
+
+
+DATASETS = ['projections', 'yahoo_projections', 'yahoo_playing_time', 'rosters', 'standings']
+
+
+@entry_point
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", help="first date to backtest (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date to backtest (YYYY-MM-DD)")
+    parser.add_argument("--actual-date", help="date of the standings to score against (default the last snapshot)")
+    parser.add_argument("--jobs", type=int, default=1, help="number of processes")
+    args = parse_args(parser)
+
+    start = time.perf_counter()
+
+    snapshots = load_snapshots()
+
+    actual_date = args.actual_date or snapshots['standings'][-1][0]
+    actual = prepare_standings(snapshot_as_of(snapshots['standings'], actual_date))
+
+    dates = [
+        date for date in historical_store.dates('standings', args.start, args.end)
+        if date < actual_date and all(snapshot_as_of(snapshots[dataset], date) is not None for dataset in DATASETS)
+    ]
+
+    # resolve the names of every projections snapshot at once
+    all_projections = pandas.concat([frame for _, frame in snapshots['projections']], ignore_index=True)
+    id_mapping = resolve_projections(all_projections, save=False)
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(args.jobs, initializer=init_backtest_worker, initargs=(snapshots, id_mapping, actual)) as executor:
+            results = list(executor.map(backtest_date_worker, dates, chunksize=max(1, len(dates) // (4 * args.jobs))))
+    else:
+        results = [backtest_date(snapshots, id_mapping, actual, date) for date in dates]
+
+    results = pandas.DataFrame(results)
+
+    print(results.to_string(index=False, float_format='%.3f'))
+    print(f"Backtested {len(dates)} dates against {actual_date} in {time.perf_counter() - start:.1f}s")
+
+    results.to_csv("backtest.csv", encoding='utf8', index=False)
+
+
+@timed
+def load_snapshots():
+    """
+    Every snapshot of each of DATASETS as a list of (date, DataFrame) in date order
+
+    Snapshots get the column types of the CSVs, and projections and recent playing time are prepared as by their
+    loaders in utils.
+
+    """
+    prepare = {'projections': prepare_projections, 'yahoo_playing_time': prepare_recent_playing_time}
+
+    snapshots = {}
+
+    for dataset in DATASETS:
+        history = historical_store.load(dataset)
+        dtypes = {col: dtype for col, dtype in DTYPES[f"{dataset}.csv"].items() if col in history}
+
+        snapshots[dataset] = [
+            (f"{date:%Y-%m-%d}", prepare.get(dataset, lambda frame: frame)(frame.drop('date', axis=1).astype(dtypes).reset_index(drop=True)))
+            for date, frame in history.groupby('date', sort=True)
+        ]
+
+    return snapshots
+
+
+def snapshot_as_of(snapshots, date):
+    """
+    The latest of a dataset's (date, DataFrame) snapshots on or before date, None if there is none
+
+    """
+    dates = [snapshot_date for snapshot_date, _ in snapshots]
+    i = numpy.searchsorted(dates, date, side='right')
+
+    return snapshots[i - 1][1] if i > 0 else None
+
+
+@timed
+def backtest_date(snapshots, id_mapping, actual, date):
+    """
+    Project the final standings from the snapshots as of date and score them against the actual final standings
+
+    """
+    ros = combine_projection_frames(
+        snapshot_as_of(snapshots['projections'], date), id_mapping, snapshot_as_of(snapshots['yahoo_projections'], date),
+        snapshot_as_of(snapshots['yahoo_playing_time'], date)
+    )
+
+    rosters = snapshot_as_of(snapshots['rosters'], date)
+    ros = ros.merge(rosters[['yahoo_id', 'team_id']], on='yahoo_id', how='left')
+
+    standings = prepare_standings(snapshot_as_of(snapshots['standings'], date))
+
+    final_standings = calc_final_standings(standings, ros)
+    ros_values = calc_ros_values(final_standings, ros)
+
+    return score_projection(date, final_standings, actual, ros_values)
+
+
+def score_projection(date, projected, actual, ros_values):
+    """
+    Errors of projected final standings against the actual ones
+
+    Gives the mean absolute % error of every category, the mean absolute error of roto points, the rank correlation of
+    the teams' roto points, and my team's projected and actual roto points.
+
+    """
+    projected = projected.sort_values('team_id').reset_index(drop=True)
+    actual = actual.sort_values('team_id').reset_index(drop=True)
+
+    score = {'date': date}
+
+    for stat in COUNTING_STATS + RATIO_STATS:
+        score[f"{stat}_mape"] = (numpy.abs(projected[stat] - actual[stat]) / actual[stat].abs()).mean()
+
+    columns = ['team_id'] + COUNTING_STATS + RATIO_STATS + RATIO_STATS_PARTS
+    projected_points = calc_rankings(projected[columns]).sort_values('team_id')['total'].values
+    actual_points = calc_rankings(actual[columns]).sort_values('team_id')['total'].values
+
+    score['points_mae'] = numpy.abs(projected_points - actual_points).mean()
+    score['points_rank_corr'] = numpy.corrcoef(
+        pandas.Series(projected_points).rank(), pandas.Series(actual_points).rank()
+    )[0, 1]
+
+    my_team = (projected['team_id'] == MY_TEAM_ID).values
+    score['my_points'] = projected_points[my_team].sum()
+    score['my_actual_points'] = actual_points[my_team].sum()
+    score['my_value'] = ros_values.loc[ros_values['team_id'] == MY_TEAM_ID, 'total_value'].sum()
+
+    return score
+
+
+# snapshots, id mapping and actual standings of a backtest worker process, sent once when the process starts
+_backtest_worker = {}
+
+
+def init_backtest_worker(snapshots, id_mapping, actual):
+    _backtest_worker['snapshots'] = snapshots
+    _backtest_worker['id_mapping'] = id_mapping
+    _backtest_worker['actual'] = actual
+
+
+def backtest_date_worker(date):
+    return backtest_date(_backtest_worker['snapshots'], _backtest_worker['id_mapping'], _backtest_worker['actual'], date)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+"""
+Benchmarks of the slow steps on generated fixtures
+
+The valuation steps run on leagues generated by synthetic_league for each number of teams, to give scaling curves.
+Each benchmark runs in a fresh process so that its peak memory is its own, and the leagues bring their own config.py.
+
+Results are saved in BENCHMARK_DIR under the current git commit, and compared with the results of --compare (by
+default the latest other commit). --history prints the saved results of every commit.
+
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import lxml.html
+import numpy
+import pandas
+
+from scrape_hashtagbasketball import CHUNK_SIZE, extract_projections, extract_updated_at, parse_updated_at, stream_projections
+from synthetic_league import generate_league, htb_page, rosters_response, yahoo_player_page
+
+
+# results are kept with the code they measure
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(REPO_DIR, '.benchmarks')
+
+# benchmarks run on a generated league
+LEAGUE_BENCHMARKS = ['combine_projections', 'calc_team_projections', 'optimize_roster', 'check_if_top_n']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teams", type=int, nargs='+', default=[12, 16, 20], help="teams in the generated leagues")
+    parser.add_argument("--roster-size", type=int, default=13, help="players on each roster")
+    parser.add_argument("--free-agents", type=int, default=300, help="players not on a roster")
+    parser.add_argument(
+        "--htb-players", type=int, nargs='+', default=[500, 20000], help="players on the generated projections pages"
+    )
+    parser.add_argument("--yahoo-players", type=int, default=1000, help="players on the generated Yahoo list pages")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the fixtures")
+    parser.add_argument("--compare", help="commit to compare with (default the latest other commit with results)")
+    parser.add_argument("--no-save", action="store_true", help="don't save the results")
+    parser.add_argument("--history", action="store_true", help="print the saved results of every commit and exit")
+    args = parser.parse_args()
+
+    if args.history:
+        print_history()
+        return
+
+    rev = git_revision()
+    baseline = load_results(args.compare) if args.compare else latest_results(exclude=rev)
+
+    print(f"{'benchmark':<40} {'seconds':>8} {'peak MB':>8}" + (f" {'vs ' + baseline['rev']:>14}" if baseline else ''))
+
+    results = []
+
+    for name, benchmark, benchmark_args, league in benchmark_runs(args):
+        seconds, peak_mb = run_isolated(benchmark, benchmark_args, args.repeat, league)
+        results.append({'name': name, 'seconds': seconds, 'peak_mb': peak_mb})
+
+        line = f"{name:<40} {seconds:>8.3f} {peak_mb:>8.1f}"
+
+        if baseline and name in baseline['results']:
+            line += f" {seconds / baseline['results'][name]['seconds']:>13.2f}x"
+
+        print(line)
+
+    if not args.no_save:
+        save_results(rev, results)
+
+
+def benchmark_runs(args):
+    """
+    Name, benchmark, its arguments and the league directory (None for none) of every benchmark to run
+
+    Leagues are generated in a temporary directory, removed after their benchmarks ran.
+
+    """
+    for n_players in args.htb_players:
+        page = htb_page(n_players, numpy.random.default_rng(args.seed))
+
+        yield f"htb tree {n_players} players", parse_htb_tree, (page,), None
+        yield f"htb stream {n_players} players", parse_htb_stream, (page,), None
+
+    rng = numpy.random.default_rng(args.seed)
+    pages = [yahoo_player_page(25, rng, start) for start in range(0, args.yahoo_players, 25)]
+
+    for n_teams in args.teams:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_league(
+                directory, n_teams=n_teams, roster_size=args.roster_size, n_free_agents=args.free_agents, seed=args.seed
+            )
+
+            # the Yahoo pages and responses are parsed with the league's config
+            if n_teams == args.teams[0]:
+                yield f"yahoo player pages {args.yahoo_players} players", parse_yahoo_pages, (pages,), directory
+
+            rosters = rosters_response(n_teams, args.roster_size, rng)
+            yield f"yahoo rosters {n_teams} teams", parse_yahoo_rosters, (rosters,), directory
+
+            for name in LEAGUE_BENCHMARKS:
+                yield f"{name} {n_teams} teams", globals()[f"setup_{name}"], (), directory
+
+            # the loop check_if_top_n replaced takes seconds, it's only timed on the smallest league for comparison
+            if n_teams == args.teams[0]:
+                yield f"check_if_top_n loop {n_teams} teams", setup_check_if_top_n_loop, (), directory
+
+
+def run_isolated(benchmark, args=(), repeat=1, league=None):
+    """
+    Run benchmark(*args) in a new process, giving its fastest wall time out of repeat runs and the growth of the
+    process's peak RSS in MB
+
+    If league is given, the process runs in that directory and uses its config.py. Benchmarks whose name starts with
+    setup_ return the function to time.
+
+    """
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(1, initializer=enter_league if league else None, initargs=(league,) if league else ()) as pool:
+        return pool.apply(measure, (benchmark, args, repeat))
+
+
+def enter_league(directory):
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+
+    # import outside of the measurements
+    import calc_h2h_points, calc_roto, retrieve_roster, scrape_yahoo
+
+
+def measure(benchmark, args=(), repeat=1):
+    if benchmark.__name__.startswith('setup_'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            benchmark = benchmark(*args)
+        args = ()
+
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            benchmark(*args)
+
+        times.append(time.perf_counter() - start)
+
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in KB on Linux
+    return min(times), (peak_after - peak_before) / 1024
+
+
+def parse_htb_tree(page):
+    root = lxml.html.fromstring(page)
+
+    return extract_projections(root), extract_updated_at(root)
+
+
+def parse_htb_stream(page):
+    projections, updated_at_text = stream_projections(page[i:i + CHUNK_SIZE] for i in range(0, len(page), CHUNK_SIZE))
+
+    return projections, parse_updated_at(updated_at_text)
+
+
+def parse_yahoo_pages(pages):
+    from scrape_yahoo import parse_player_page
+
+    return [parse_player_page(page) for page in pages]
+
+
+def parse_yahoo_rosters(content):
+    from retrieve_roster import parse_rosters
+
+    return parse_rosters(content)
+
+
+def setup_combine_projections():
+    import utils
+    from calc_roto import combine_projections
+
+    def run():
+        # read the CSVs every time
+        utils._loaded.clear()
+        shutil.rmtree(utils.CACHE_DIR, ignore_errors=True)
+
+        return combine_projections()
+
+    return run
+
+
+def setup_calc_team_projections():
+    from calc_roto import calc_team_projections, load_league
+
+    ros, _ = load_league()
+
+    return lambda: calc_team_projections(ros)
+
+
+def setup_optimize_roster():
+    from calc_roto import calc_final_standings, calc_ros_values, load_league, optimize_roster
+
+    ros, standings = load_league()
+    ros_values = calc_ros_values(calc_final_standings(standings, ros), ros)
+
+    return lambda: optimize_roster(ros_values, standings)
+
+
+def setup_check_if_top_n():
+    from calc_h2h_points import check_if_top_n
+
+    valuation = weekly_valuation()
+
+    return lambda: check_if_top_n(valuation.copy())
+
+
+def setup_check_if_top_n_loop():
+    from calc_h2h_points import weeks_left
+
+    valuation = weekly_valuation()
+    weeks = weeks_left(datetime.datetime.today())
+
+    return lambda: check_if_top_n_loop(valuation.copy(), weeks)
+
+
+def weekly_valuation():
+    """
+    Players of the league with their weekly fpoints, the input of check_if_top_n
+
+    """
+    from calc_h2h_points import add_weekly_valuation, load_players, load_schedule
+
+    return add_weekly_valuation(load_players().merge(load_schedule(), on='team'))
+
+
+def check_if_top_n_loop(valuation, weeks):
+    """
+    check_if_top_n as it was before it was vectorized: for every player and week, sort my team with the player added
+
+    My team is sorted in place week after week, so players that tie on weekly fpoints and fpoints keep their order from
+    the week before rather than the order they're listed in.
+
+    """
+    from calc_h2h_points import MY_TEAM_ID, TOP_N
+
+    top_n_data = []
+
+    current_team = valuation[valuation['team_id'] == MY_TEAM_ID].copy()
+
+    for i in range(len(valuation)):
+        playable_weeks = []
+        playable_points = 0
+
+        if any(valuation.iloc[i]['name'] == current_team['name']):
+            consider = current_team
+        else:
+            consider = pandas.concat([current_team, valuation.iloc[[i]]])
+
+        for week_num in weeks:
+            consider.sort_values(['W{} fpoints'.format(week_num), 'fpoints'], ascending=False, inplace=True)
+
+            if any(valuation.iloc[i]['name'] == consider.head(TOP_N)['name']):
+                playable_weeks.append('{}'.format(week_num))
+
+                playable_points += valuation.iloc[i]['W{} fpoints'.format(week_num)]
+
+        top_n_data.append({
+            'playable_weeks': ','.join(playable_weeks),
+            'n_playable_weeks': len(playable_weeks),
+            'playable_points': playable_points
+        })
+
+    valuation['n_playable_weeks'] = [x['n_playable_weeks'] for x in top_n_data]
+    valuation['playable_weeks'] = [x['playable_weeks'] for x in top_n_data]
+    valuation['playable_points'] = [x['playable_points'] for x in top_n_data]
+
+    return valuation
+
+
+def git_revision():
+    """
+    Short hash of the current commit, marked -dirty if tracked files have changes
+
+    """
+    def git(*args):
+        return subprocess.run(['git', '-C', REPO_DIR] + list(args), capture_output=True, text=True).stdout.strip()
+
+    rev = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    dirty = git('status', '--porcelain', '--untracked-files=no')
+
+    return f"{rev}-dirty" if dirty else rev
+
+
+def save_results(rev, results):
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+
+    with open(os.path.join(BENCHMARK_DIR, f"{rev}.json"), 'w') as f:
+        json.dump({
+            'rev': rev,
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'results': {result['name']: result for result in results},
+        }, f, indent=1)
+
+
+def load_results(rev):
+    """
+    Saved results of the commit rev, which may be abbreviated
+
+    """
+    paths = sorted(glob.glob(os.path.join(BENCHMARK_DIR, f"{rev}*.json")))
+
+    if not paths:
+        raise ValueError(f"No benchmark results for {rev} in {BENCHMARK_DIR}")
+
+    with open(paths[0]) as f:
+        return json.load(f)
+
+
+def latest_results(exclude=None):
+    """
+    Most recently saved results of a commit other than exclude, None if there are none
+
+    """
+    paths = [
+        path for path in glob.glob(os.path.join(BENCHMARK_DIR, '*.json')) if os.path.basename(path) != f"{exclude}.json"
+    ]
+
+    if not paths:
+        return None
+
+    with open(max(paths, key=os.path.getmtime)) as f:
+        return json.load(f)
+
+
+def print_history():
+    """
+    Print the seconds of every benchmark (rows) for every commit with saved results (columns), oldest first
+
+    """
+    history = []
+
+    for path in glob.glob(os.path.join(BENCHMARK_DIR, '*.json')):
+        with open(path) as f:
+            history.append(json.load(f))
+
+    history.sort(key=lambda results: results['date'])
+
+    names = list(dict.fromkeys(name for results in history for name in results['results']))
+
+    print(f"{'benchmark':<40}" + ''.join(f" {results['rev']:>14}" for results in history))
+
+    for name in names:
+        print(f"{name:<40}" + ''.join(
+            f" {results['results'][name]['seconds']:>14.3f}" if name in results['results'] else f" {'':>14}"
+            for results in history
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,62 +3,104 @@ Calculate valuations for the rest of season and the next few weeks, based on the
 
 """
 
+import argparse
 import datetime
-import math
+import numpy
 import pandas
 
 
-from config import SEASON_START, LAST_WEEK, MY_TEAM_ID
+from config import SEASON_START, LAST_WEEK, MY_TEAM_ID, TOP_N
+from instrumentation import entry_point, parse_args, timed
+from daily_lineup import DailyLineups, slot_eligibility, week_numbers
+from player_ids import resolve_projections
+from schedule import load_schedule as load_season_schedule, next_week
 from utils import load_projections, load_rosters
 
 
-NEXT_WEEK = int(math.ceil((datetime.datetime.today() - SEASON_START).days / 7.0) + 1)
 WEEKS_AHEAD = 3
 
 
+@entry_point
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--daily", action="store_true", help="value players by their starts in optimal daily lineups")
+    parser.add_argument("--games-cap", type=int, help="most games started per week")
+    parser.add_argument("--as-of", help="value the rest of season as of this date (YYYY-MM-DD, default today)")
+    args = parse_args(parser)
+
+    as_of = pandas.Timestamp(args.as_of) if args.as_of else datetime.datetime.today()
+
+    if next_week(as_of, SEASON_START) > LAST_WEEK:
+        parser.error(f"no weeks left as of {as_of:%Y-%m-%d}")
+
+    valuation = value_players(load_players(), as_of, daily=args.daily, games_cap=args.games_cap)
+
+    output_csv(valuation, as_of)
+
+
+def load_players():
+    """
+    Load projections with the Yahoo id and team id of each player
+
+    """
     rosters = load_rosters()
 
     projections = load_projections()
 
-    valuation = projections.merge(rosters, on='name', how='left')
+    # join on Yahoo ids, names differ between Hashtag Basketball and Yahoo
+    id_mapping = resolve_projections(projections)
+    players = projections.merge(id_mapping[['htb_name', 'yahoo_id']], left_on='name', right_on='htb_name', how='left')
+
+    return players.drop('htb_name', axis=1).merge(rosters[['yahoo_id', 'team_id']], on='yahoo_id', how='left')
 
-    schedule = load_schedule()
 
-    valuation = valuation.merge(schedule, on='team')
+def value_players(players, as_of, daily=False, games_cap=None):
+    """
+    Value players for the weeks left as of a date
 
-    valuation = add_weekly_valuation(valuation)
+    The schedule is loaded once per process, so players can be valued as of many dates.
 
-    valuation = check_if_top_n(valuation)
+    """
+    valuation = players.merge(load_schedule(as_of), on='team')
 
-    output_csv(valuation)
+    valuation = add_weekly_valuation(valuation, as_of)
 
+    valuation = check_if_top_n(valuation, as_of)
 
+    if daily:
+        valuation = add_daily_lineup_valuation(valuation, as_of, games_cap)
 
+    return valuation
 
 
-def load_schedule():
+@timed
+def load_schedule(as_of=None):
     """
-    Load rest of year schedule
+    Load the games of every team in every week, and in the rest of year as of a date (default today) as 'ros'
 
     """
-    schedule = pandas.read_csv("schedule_{}.csv".format(SEASON_START.year))
+    schedule = load_season_schedule(SEASON_START.year)
 
-    schedule['ros'] = 0
+    return schedule.weekly_frame(LAST_WEEK, as_of or datetime.datetime.today(), SEASON_START)
 
-    for i in range(NEXT_WEEK, LAST_WEEK + 1):
-        schedule['ros'] += schedule['W{}'.format(i)]
 
-    return schedule
+def weeks_left(as_of):
+    return list(range(next_week(as_of, SEASON_START), LAST_WEEK + 1))
 
 
-def add_weekly_valuation(valuation):
+@timed
+def add_weekly_valuation(valuation, as_of=None):
     """
     Based on the next few weeks, calculate the projected points
 
     """
-    for week_num in range(NEXT_WEEK, LAST_WEEK + 1):
-        valuation['W{} fpoints'.format(week_num)] = valuation['W{}'.format(week_num)] * valuation['fpoints']
+    weeks = weeks_left(as_of or datetime.datetime.today())
+
+    weekly_fpoints = valuation[[f"W{week_num}" for week_num in weeks]].values * valuation[['fpoints']].values
+    valuation = pandas.concat([
+        valuation,
+        pandas.DataFrame(weekly_fpoints, columns=[f"W{week_num} fpoints" for week_num in weeks], index=valuation.index),
+    ], axis=1)
 
     # assume each player plays a projected % of games
     # apply that % to the remaining games on schedule
@@ -71,46 +113,98 @@ def add_weekly_valuation(valuation):
     return valuation
 
 
-def check_if_top_n(valuation):
+@timed
+def check_if_top_n(valuation, as_of=None):
     """
     For each remaining week, check if the player would rank in the top N per week for your team
 
+    A player makes the top N in a week if fewer than N players on your team rank ahead of him by weekly fpoints, then
+    fpoints. Your own players are ranked within your team, ties going to the player listed first. Other players rank
+    behind your players they tie with. All players and weeks are compared at once as players x your players x weeks.
+
+    """
+    weeks = weeks_left(as_of or datetime.datetime.today())
+
+    # missing points sort last
+    weekly_fpoints = numpy.nan_to_num(
+        valuation[['W{} fpoints'.format(week_num) for week_num in weeks]].values.astype(float), nan=-numpy.inf
+    )
+    fpoints = numpy.nan_to_num(valuation['fpoints'].values.astype(float), nan=-numpy.inf)
+
+    on_team = (valuation['team_id'] == MY_TEAM_ID).values
+    team_names = valuation['name'].values[on_team]
+
+    # players x team players x weeks
+    player_weekly = weekly_fpoints[:, numpy.newaxis, :]
+    player_fpoints = fpoints[:, numpy.newaxis, numpy.newaxis]
+    team_weekly = weekly_fpoints[numpy.newaxis, on_team, :]
+    team_fpoints = fpoints[numpy.newaxis, on_team, numpy.newaxis]
+
+    ahead = (team_weekly > player_weekly) | ((team_weekly == player_weekly) & (team_fpoints > player_fpoints))
+    tied = (team_weekly == player_weekly) & (team_fpoints == player_fpoints)
+
+    # other players fall behind everyone on the team they tie with
+    playable = (ahead | tied).sum(axis=1) < TOP_N
+
+    # team players are ranked within the team
+    listed_before = numpy.tri(len(team_names), k=-1, dtype=bool)[..., numpy.newaxis]
+    team_ahead = ahead[on_team] | (tied[on_team] & listed_before)
+    team_playable = team_ahead.sum(axis=1) < TOP_N
+
+    for name in numpy.unique(team_names):
+        playable[valuation['name'].values == name] = team_playable[team_names == name].any(axis=0)
+
+    valuation['n_playable_weeks'] = playable.sum(axis=1)
+    valuation['playable_weeks'] = [
+        ','.join(str(week_num) for week_num, is_playable in zip(weeks, player_playable) if is_playable)
+        for player_playable in playable
+    ]
+    valuation['playable_points'] = numpy.where(
+        playable, valuation[['W{} fpoints'.format(week_num) for week_num in weeks]].values, 0
+    ).sum(axis=1)
+
+    return valuation
+
+
+@timed
+def add_daily_lineup_valuation(valuation, as_of=None, games_cap=None):
     """
-    top_n_data = []
+    Points each player scores as a starter in optimal daily lineups of your team, for each remaining week
+
+    For your players, these are the points of their starts. For free agents, they are how many points your team gains
+    by adding them. Each player is expected to play his projected % of his team's games. The days are those of the
+    weeks left, as for add_weekly_valuation, so the daily and weekly valuations cover the same games.
 
-    current_team = valuation[valuation['team_id'] == MY_TEAM_ID].copy()
+    """
+    weeks = weeks_left(as_of or datetime.datetime.today())
+    first_day = pandas.Timestamp(SEASON_START) + pandas.Timedelta(weeks=weeks[0] - 1)
+    last_day = pandas.Timestamp(SEASON_START) + pandas.Timedelta(weeks=weeks[-1], days=-1)
 
-    for i in range(len(valuation)):
-        playable_weeks = []
-        playable_points = 0
+    schedule = load_season_schedule(SEASON_START.year)
+    days, plays = schedule.game_days(valuation['team'], first_day, last_day)
+    week_of_day = week_numbers(days, SEASON_START)
 
-        if any(valuation.iloc[i]['name'] == current_team['name']):
-            consider = current_team
-        else:
-            consider = current_team.copy().append(valuation.iloc[i])
+    values = (valuation['fpoints'] * valuation['gp'] / valuation['team_gtp']).values
+    eligible = slot_eligibility(valuation['pos'])
 
-        for week_num in range(NEXT_WEEK, LAST_WEEK + 1):
-            consider.sort_values(['W{} fpoints'.format(week_num), 'fpoints'], ascending=False, inplace=True)
+    on_team = (valuation['team_id'] == MY_TEAM_ID).values
+    free_agents = valuation['team_id'].isna().values
 
-            if any(valuation.iloc[i]['name'] == consider.head(10)['name']):
-                playable_weeks.append('{}'.format(week_num))
+    lineups = DailyLineups(values[on_team], eligible[on_team], plays[on_team], week_of_day, games_cap)
 
-                playable_points += valuation.iloc[i]['W{} fpoints'.format(week_num)]
+    points = numpy.full((len(valuation), len(lineups.weeks)), numpy.nan)
+    points[on_team] = lineups.start_points()
+    points[free_agents] = lineups.pickup_points(values[free_agents], eligible[free_agents], plays[free_agents])
 
-        top_n_data.append({
-            'playable_weeks': ','.join(playable_weeks),
-            'n_playable_weeks': len(playable_weeks),
-            'playable_points': playable_points
-        })
+    for i, week_num in enumerate(lineups.weeks):
+        valuation['W{} start fpoints'.format(week_num)] = points[:, i]
 
-    valuation['n_playable_weeks'] = [x['n_playable_weeks'] for x in top_n_data]
-    valuation['playable_weeks'] = [x['playable_weeks'] for x in top_n_data]
-    valuation['playable_points'] = [x['playable_points'] for x in top_n_data]
+    valuation['ros start fpoints'] = points.sum(axis=1)
 
     return valuation
 
 
-def output_csv(valuation):
+def output_csv(valuation, as_of=None):
     """
     Export valuations to CSV
 
@@ -125,7 +219,8 @@ def output_csv(valuation):
         'mpg',
     ]
 
-    weekly_columns_base = ['W{}'.format(i) for i in range(NEXT_WEEK, NEXT_WEEK + WEEKS_AHEAD)]
+    first_week = next_week(as_of or datetime.datetime.today(), SEASON_START)
+    weekly_columns_base = ['W{}'.format(i) for i in range(first_week, first_week + WEEKS_AHEAD)]
     weekly_columns_base += ['ros']
 
     weekly_columns = ['{} fpoints'.format(x) for x in weekly_columns_base]
@@ -133,6 +228,9 @@ def output_csv(valuation):
     csv_columns += weekly_columns_base
     csv_columns += weekly_columns
 
+    # daily lineup valuations, if calculated
+    csv_columns += [col for col in ['{} start fpoints'.format(x) for x in weekly_columns_base] if col in valuation]
+
     csv_columns += [
         'ros gtp',
         'ros pct',
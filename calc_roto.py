@@ -3,37 +3,67 @@ Calculate roto league valuations for the rest of season
 
 """
 import argparse
+import heapq
 import itertools
+import time
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy
 import pandas
-from scipy.optimize import minimize_scalar
-from scipy.stats import linregress
-
-from utils import load_projections, load_recent_playing_time, load_rosters
-from config import MY_TEAM_ID, N_TEAMS, ROSTER_SIZE, TOP_N
-
-
-COUNTING_STATS = ['3pm', 'pts', 'treb', 'ast', 'stl', 'blk', 'to']
-RATIO_STATS = ['fg%', 'ft%']
-RATIO_STATS_PARTS = ['fga', 'fgm', 'fta', 'ftm']
-
-IMPORTANT_CATS = ['treb', 'ast', 'stl', 'blk', 'to', 'fg%', 'ft%']
-
 
+from categories import ROTO, sequential_sum
+from instrumentation import entry_point, increment, parse_args, timed
+from player_ids import resolve_projections
+from standings_index import StandingsIndex
+from team_stats import player_matrix, roster_rows, team_totals
+from utils import (
+    load_gtp_manual, load_id_mapping, load_projections, load_recent_playing_time, load_rosters, load_standings_table,
+    load_yahoo_projections
+)
+from config import MY_TEAM_ID, ROSTER_SIZE, TOP_N
+
+
+# the league's categories, see categories.py
+COUNTING_STATS = ROTO.counting
+RATIO_STATS = [category.name for category in ROTO.ratios]
+RATIO_STATS_PARTS = ROTO.parts
+# stats summed over a team's players
+STATS = ROTO.totals_columns
+
+# categories that are not punted, whose buffers are kept
+IMPORTANT_CATS = ROTO.important
+BUFFER_SIGNS = ROTO.important_signs
+
+# column order of the final standings (without team_id) and of the rankings (without team_id)
+STANDINGS_COLUMNS = ROTO.standings_columns
+RANKING_COLUMNS = ROTO.ranking_columns
+# player valuations
+VALUE_COLUMNS = ['total_value', 'mod_value'] + [f"{name}_value" for name in ROTO.names]
+
+# a player to drop or add, Index is the row in projections
+Player = namedtuple('Player', 'Index yahoo_id team_id rank')
+EMPTY_PLAYER = Player(Index=None, yahoo_id=0, team_id=None, rank=None)
+
+# how often the n-th best player on a roster starts
+PCT_PLAYED = numpy.array((100, 100, 100, 100, 100, 100, 100, 80, 70, 50, 40, 30, 10, 10, 5, 5, 0)) / 100
+# range of the multiplier on PCT_PLAYED
+MULT_BOUNDS = (1, 20)
+
+
+@entry_point
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--optimize", action="store_true", help="run roster optimizer")
-    args = parser.parse_args()
-
-    ros = combine_projections()
+    parser.add_argument("--jobs", type=int, default=1, help="number of processes for the roster optimizer")
+    parser.add_argument("--trades", action="store_true", help="search trades with other teams")
+    parser.add_argument("--trade-size", type=int, default=2, help="most players on each side of a trade")
+    parser.add_argument("--time-budget", type=float, help="seconds to spend searching trades")
+    parser.add_argument("--top-k", type=int, default=50, help="number of trades to keep")
+    args = parse_args(parser)
 
-    # add team id to projections
-    rosters = load_rosters()
-    ros = ros.merge(rosters[['yahoo_id', 'team_id']], on='yahoo_id', how='left')
+    ros, standings = load_league()
 
-    standings = load_standings()
     final_standings = calc_final_standings(standings, ros)
     print(final_standings[['team_id'] + COUNTING_STATS + RATIO_STATS + RATIO_STATS_PARTS].to_string(index=False))
 
@@ -41,51 +71,89 @@ def main():
     print(final_rank)
     current_final_rank = final_rank.loc[final_rank['team_id'] == MY_TEAM_ID, 'total'].values[0]
 
-    # since fg% and ft% are rate stats, we need to establish value above and below a threshold
-    base_fga = final_standings[final_standings['team_id'] == MY_TEAM_ID]['fga'].values[0]
-    base_fta = final_standings[final_standings['team_id'] == MY_TEAM_ID]['fta'].values[0]
-
-    spg = calc_spg(final_standings, base_fga, base_fta)
-    base_ratio_stats = {
-        'fg%': final_standings['fg%'].min(),
-        'ft%': final_standings['ft%'].min()
-    }
-    ros_values = calc_valuation(spg, base_ratio_stats, ros)
+    ros_values = calc_ros_values(final_standings, ros)
 
     # print team valuations
-    cols = ['yahoo_name', 'yahoo_id', 'team_id', 'rank', 'gtp', 'p_mpg', 'total_value', 'mod_value', 'pts_value', '3pm_value', 'fg%_value', 'ft%_value', 'treb_value', 'ast_value', 'stl_value', 'blk_value', 'to_value']
+    cols = ['yahoo_name', 'yahoo_id', 'team_id', 'rank', 'gtp', 'p_mpg'] + VALUE_COLUMNS
     print(ros_values[ros_values['team_id'] == MY_TEAM_ID][cols])
     # print best available free agents
     print(ros_values[ros_values['team_id'].isna()].head(15)[cols])
     # output valuations
     ros_values[cols].to_csv("ros_values.csv", encoding='utf8', index=False)
 
-    ros_by_team = ros_values.groupby('team_id').sum().reset_index()
+    ros_by_team = pandas.DataFrame(team_totals(player_matrix(ros_values, VALUE_COLUMNS)), columns=VALUE_COLUMNS)
     ros_by_team.sort_values('total_value', ascending=False, inplace=True)
 
     if args.optimize:
-        optimize_roster(ros_values, standings)
+        optimize_roster(ros_values, standings, jobs=args.jobs)
+
+    if args.trades:
+        search_trades(ros_values, standings, max_players=args.trade_size, time_budget=args.time_budget, top_k=args.top_k)
 
 
+@timed
+def load_league():
+    """
+    Load rest of season projections with the team id of each player, and the current standings
+
+    """
+    ros = combine_projections()
+
+    # add team id to projections
+    rosters = load_rosters()
+    ros = ros.merge(rosters[['yahoo_id', 'team_id']], on='yahoo_id', how='left')
+
+    standings = load_standings()
+
+    return ros, standings
+
+
+@timed
+def calc_ros_values(final_standings, ros):
+    """
+    Value every player based on the projected final standings
+
+    """
+    # since ratio stats are rate stats, we need to establish value above and below a threshold
+    my_team = final_standings[final_standings['team_id'] == MY_TEAM_ID].iloc[0]
+
+    spg = calc_spg(final_standings, my_team)
+    base_ratio_stats = final_standings[RATIO_STATS].min()
+
+    return calc_valuation(spg, base_ratio_stats, ros)
+
+
+@timed
 def combine_projections():
     """
     Use rate projections from Hashtag Basketball, but games to play from Yahoo
 
     """
-    id_mapping = pandas.read_csv('id_mapping.csv')
-
     htb = load_projections()
-    htb.rename(columns={'name': 'htb_name'}, inplace=True)
-    ros_rate = htb.merge(id_mapping, on='htb_name', how='left')
-    # check that all players have been ID mapped
-    print(ros_rate[ros_rate['yahoo_id'].isna()])
+    id_mapping = resolve_projections(htb)
+
+    return combine_projection_frames(
+        htb, id_mapping, load_yahoo_projections(), load_recent_playing_time(), load_gtp_manual(), verbose=True
+    )
+
+
+def combine_projection_frames(htb, id_mapping, yahoo, pt, gtp_manual=None, verbose=False):
+    """
+    combine_projections from given DataFrames, as the loaders in utils give them
 
-    yahoo = pandas.read_csv('yahoo_projections.csv')
+    id_mapping maps htb_name to yahoo_name and yahoo_id. gtp_manual is optional. If verbose, players without a Yahoo id
+    are printed.
+
+    """
+    htb = htb.rename(columns={'name': 'htb_name'})
+    ros_rate = htb.merge(id_mapping[['htb_name', 'yahoo_name', 'yahoo_id']], on='htb_name', how='left')
+    # check that all players have been ID mapped
+    if verbose:
+        print(ros_rate[ros_rate['yahoo_id'].isna()])
 
     ros_rate = ros_rate.merge(yahoo[['yahoo_id', 'gtp', 'rank']], how='left')
 
     # override minutes per game projections with recent playing time
-    pt = load_recent_playing_time()
     ros_rate = ros_rate.merge(pt, on='yahoo_id', how='left')
 
     # weight recent playing time by the number of games played recently
@@ -97,19 +165,17 @@ def combine_projections():
         ) / (14)
     )
     
-    for stat in COUNTING_STATS + RATIO_STATS_PARTS:
-        ros_rate[stat] = ros_rate[stat] / ros_rate['mpg'] * ros_rate['p_mpg']
+    ros_rate[STATS] = ros_rate[STATS].div(ros_rate['mpg'], axis=0).mul(ros_rate['p_mpg'], axis=0)
+    ROTO.add_ratios(ros_rate, overwrite=False)
 
     # override playing time projections with manual ones if necessary
-    gtp_manual = pandas.read_csv('gtp_manual.csv', comment='#')
-    gtp_manual.drop('name', axis=1, inplace=True)
-    ros_rate = ros_rate.merge(gtp_manual, on='yahoo_id', how='left')
-    ros_rate['gtp'] = ros_rate['gtp_override'].combine_first(ros_rate['gtp'])
+    if gtp_manual is not None:
+        ros_rate = ros_rate.merge(gtp_manual[['yahoo_id', 'gtp_override']], on='yahoo_id', how='left')
+        ros_rate['gtp'] = ros_rate['gtp_override'].combine_first(ros_rate['gtp'])
 
-    ros = ros_rate[['yahoo_name', 'yahoo_id', 'rank', 'gtp', 'p_mpg', 'fg%', 'ft%']].copy()
+    ros = ros_rate[['yahoo_name', 'yahoo_id', 'rank', 'gtp', 'p_mpg'] + RATIO_STATS].copy()
     # scale rate projections to total rest of season stats
-    for stat in COUNTING_STATS + RATIO_STATS_PARTS:
-        ros[stat] = ros_rate[stat] * ros_rate['gtp']
+    ros[STATS] = ros_rate[STATS].mul(ros_rate['gtp'], axis=0)
 
     return ros
 
@@ -119,60 +185,110 @@ def load_standings():
     Load current roto standings
 
     """
-    standings = pandas.read_csv('standings.csv')
+    return prepare_standings(load_standings_table())
+
 
-    standings.rename(columns={
+def prepare_standings(standings):
+    """
+    Rename the stats of standings retrieved from Yahoo to ours and sort by team
+
+    """
+    standings = standings.rename(columns={
         '3ptm': '3pm',
         'reb': 'treb',
         'st': 'stl',
-    }, inplace=True)
+    })
     standings.sort_values('team_id', inplace=True)
     standings = standings.reset_index()
 
     return standings
 
 
-def calc_mult(mult, pct_played, max_games, gtp):
+def find_weights(pct_played, max_games, gtp):
     """
-    Objective function for minimizer
+    Finds the % of games each player on the roster will start given a maximum number of games
 
+    This assumes that the manager will start higher ranked players as much as possible.
     """
-    return numpy.abs(max_games - numpy.sum(numpy.clip(pct_played * mult, 0, 1) *  gtp))
+    return find_weights_batch(pct_played, max_games, numpy.asarray(gtp, dtype=float)[numpy.newaxis])[0]
 
 
-def find_weights(pct_played, max_games, gtp):
+def find_weights_batch(pct_played, max_games, gtp):
     """
-    Optimizing function that finds the % of games each player on the roster will start given a maximum number of games
+    Vectorized find_weights for many rosters at once
+
+    gtp is a rosters x players array of games to play, with shorter rosters padded by 0 games. Each player starts
+    clip(pct_played * mult, 0, 1) of his games, where mult is between MULT_BOUNDS and is chosen so that the roster
+    starts max_games games. Games started are piecewise linear in mult, with a breakpoint wherever a player starts
+    every game, so mult is found exactly by interpolating within the segment that reaches max_games.
 
-    This assumes that the manager will start higher ranked players as much as possible.
     """
-    result = minimize_scalar(calc_mult, bounds=(1, 20), method='bounded', args=(pct_played[:len(gtp)], max_games, gtp))
+    gtp = numpy.asarray(gtp, dtype=float)
+    pct_played = pct_played[:gtp.shape[1]]
+    increment('find_weights rosters', len(gtp))
+    max_games = numpy.broadcast_to(max_games, gtp.shape[:1])
+
+    with numpy.errstate(divide='ignore'):
+        breakpoints = numpy.clip(1 / pct_played, *MULT_BOUNDS)
 
-    return numpy.clip(pct_played[:len(gtp)] * result.x, 0, 1)
+    knots = numpy.sort(numpy.concatenate([MULT_BOUNDS, breakpoints]))
 
+    # rosters x knots of games started
+    games = gtp @ numpy.clip(pct_played[:, numpy.newaxis] * knots, 0, 1)
 
-def sum_team(x, pct_played, max_games):
+    reached = games >= max_games[:, numpy.newaxis]
+    upper = reached.argmax(axis=1)
+    lower = numpy.maximum(upper - 1, 0)
+
+    rosters = numpy.arange(len(gtp))
+    games_lower = games[rosters, lower]
+    games_upper = games[rosters, upper]
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        mult = numpy.where(
+            games_upper > games_lower,
+            knots[lower] + (max_games - games_lower) * (knots[upper] - knots[lower]) / (games_upper - games_lower),
+            knots[upper]
+        )
+
+    # the roster can't start max_games games even at the largest multiplier
+    mult = numpy.where(reached.any(axis=1), mult, MULT_BOUNDS[1])
+
+    return numpy.clip(pct_played * mult[:, numpy.newaxis], 0, 1)
+
+
+def calc_start_weights(players, gtp, max_games):
     """
-    Given how often each player on the roster starts, sum the total rest of season stats
+    Given a PlayerMatrix of the players on every team, the % of games each player will start for his team
 
     """
-    w = find_weights(pct_played, max_games, x['gtp'])
+    rosters = roster_rows(players)
+    on_roster = rosters >= 0
+
+    w = find_weights_batch(PCT_PLAYED, max_games, numpy.where(on_roster, gtp[rosters], 0))
 
-    return x[COUNTING_STATS + RATIO_STATS_PARTS].multiply(w, axis='index').sum()
+    weights = numpy.zeros(len(gtp))
+    weights[rosters[on_roster]] = w[on_roster]
 
+    return weights
 
+
+@timed
 def calc_team_projections(projections):
     """
     Calculate the total rest of season stats for every team
 
     """
-    pct_played = numpy.array((100, 100, 100, 100, 100, 100, 100, 80, 70, 50, 40, 30, 10, 10, 5, 5, 0)) / 100
+    players = player_matrix(projections, STATS)
+    weights = calc_start_weights(players, projections['gtp'].values.astype(float), projections['gtp'].max())
 
-    ros_by_team = projections.groupby('team_id').apply(sum_team, pct_played, projections['gtp'].max())
+    ros_by_team = pandas.DataFrame(team_totals(players, weights), columns=players.columns)
+    ros_by_team.insert(0, 'team_id', players.team_ids)
 
-    return ros_by_team.reset_index()
+    return ros_by_team
 
 
+@timed
 def calc_final_standings(standings, projections):
     """
     Given current standings and rest of season player projections, calculate the final standings
@@ -185,34 +301,44 @@ def calc_final_standings(standings, projections):
     final_standings = pandas.DataFrame()
     final_standings['team_id'] = standings['team_id']
 
-    for stat in COUNTING_STATS + RATIO_STATS_PARTS:
+    for stat in STATS:
         final_standings[stat] = standings[stat] + ros_by_team[stat]
-    
-    final_standings['fg%'] = final_standings['fgm'] / final_standings['fga']
-    final_standings['ft%'] = final_standings['ftm'] / final_standings['fta']
 
-    return final_standings
+    return ROTO.add_ratios(final_standings)
 
 
-def calc_spg(standings, base_fga, base_fta):
+def calc_spg(standings, my_team):
     """
     Calculate standing points gained based on given standings
 
-    Uses a linear regression between the stat's value and the stat's standing points. The worst team has standing points = 1 and the best team has standing points = N_TEAMS + 1.
+    Uses a linear regression between the stat's value and the stat's standing points. The worst team has standing points = 1 and the best team has standing points = the number of teams.
+
+    Slopes are signed by the category's direction. The slope of a ratio stat is per unit of the ratio times my team's
+    denominator (e.g. fga), so that it is in the units of the numerator (e.g. fgm).
 
     """
-    spg = {}
+    slopes = calc_spg_values(standings[ROTO.names].values.astype(float)) * ROTO.signs
 
-    for stat in COUNTING_STATS + RATIO_STATS:
-        r = linregress(list(range(1, N_TEAMS + 1)), standings[stat].sort_values())
+    denominators = numpy.ones(len(ROTO.names))
+    denominators[ROTO.is_ratio] = my_team[[category.denominator for category in ROTO.ratios]].values.astype(float)
 
-        spg[stat] = r.slope
-    
-    spg['to'] = -1 * spg['to']
-    spg['fgp'] = spg['fg%'] * base_fga
-    spg['ftp'] = spg['ft%'] * base_fta
+    return dict(zip(ROTO.names, (slopes * denominators).tolist()))
+
+
+def calc_spg_values(values):
+    """
+    Array version of calc_spg, giving the slope of each category in a teams x categories array of standings
+
+    Leading axes, such as one over standings scenarios, are kept. The least squares slope of the sorted values on the
+    standing points 1 to the number of teams is computed in closed form.
+
+    """
+    y = numpy.sort(values, axis=-2)
 
-    return spg
+    n_teams = y.shape[-2]
+    x = numpy.arange(1, n_teams + 1) - (n_teams + 1) / 2
+
+    return numpy.einsum('t,...tc->...c', x, y - y.mean(axis=-2, keepdims=True)) / (x ** 2).sum()
 
 
 def calc_valuation(spg, base_ratio_stats, projections):
@@ -222,22 +348,22 @@ def calc_valuation(spg, base_ratio_stats, projections):
     Mod value is the valuation if punting certain categories.
 
     """
-    projections['total_value'] = 0
+    stats = projections[ROTO.names].values.astype(float)
 
-    for stat in COUNTING_STATS:
-        projections[f"{stat}_value"] = projections[stat] / spg[stat]
-    
-        projections['total_value'] += projections[f"{stat}_value"]
-    
-    projections["fg%_value"] =  (projections['fg%'] - base_ratio_stats['fg%']) * projections['fga'] / spg['fgp']
+    # ratio stats are valued by their difference from the base times the player's denominator (e.g. fga)
+    base = numpy.zeros(len(ROTO.names))
+    base[ROTO.is_ratio] = [base_ratio_stats[category.name] for category in ROTO.ratios]
+    scale = numpy.ones(stats.shape)
+    scale[:, ROTO.is_ratio] = projections[[category.denominator for category in ROTO.ratios]].values.astype(float)
 
-    projections["ft%_value"] =  (projections['ft%'] - base_ratio_stats['ft%']) * projections['fta'] / spg['ftp']
+    values = (stats - base) * scale / numpy.array([spg[name] for name in ROTO.names])
+    total = sequential_sum(values)
+    punted = [ROTO.names.index(name) for name in ROTO.punted]
 
-    projections['total_value'] += projections["fg%_value"]
-    projections['total_value'] += projections["ft%_value"]
+    projections['total_value'] = total
+    projections[[f"{name}_value" for name in ROTO.names]] = values
+    projections['mod_value'] = sequential_sum(numpy.column_stack([total, -values[:, punted]]))
 
-    projections['mod_value'] = projections['total_value'] - projections['pts_value'] - projections['3pm_value']
-    
     projections.sort_values('mod_value', ascending=False, inplace=True)
     
     return projections
@@ -248,118 +374,455 @@ def calc_rankings(standings):
     Based on the given standings, calculate the standing points (rankings)
 
     """
-    rankings = standings.rank()
-    rankings['to'] = standings['to'].rank(ascending=False)
-    rankings.drop(['fga', 'fgm', 'fta', 'ftm'], axis=1, inplace=True)
-    rankings['total'] = rankings.sum(axis=1) - rankings['team_id']
-    
+    # categories where less is better are ranked by their negative
+    values = standings[ROTO.names].values.astype(float) * ROTO.signs
+
+    rankings = pandas.DataFrame(rank_average(values, axis=0), columns=ROTO.names, index=standings.index)
+    rankings['total'] = (rankings * ROTO.weights).sum(axis=1)
+    rankings.insert(0, 'team_id', standings['team_id'])
+
     rankings.sort_values('total', ascending=False, inplace=True)
 
     return rankings
 
 
+def rank_average(values, axis=-1):
+    """
+    Rank values from 1 along an axis, giving ties the average of their ranks, like pandas' rank(method='average')
+
+    NaNs are not ranked and do not affect the ranks of other values.
+
+    """
+    values = numpy.moveaxis(numpy.asarray(values, dtype=float), axis, -1)
+    shape = values.shape
+    values = values.reshape(-1, shape[-1])
+
+    order = numpy.argsort(values, axis=-1, kind='stable')
+    sorted_values = numpy.take_along_axis(values, order, axis=-1)
+
+    # tied values share a group, numbered across all rows
+    new_group = numpy.ones(sorted_values.shape, dtype=bool)
+    new_group[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    groups = numpy.cumsum(new_group).reshape(sorted_values.shape) - 1
+
+    positions = numpy.broadcast_to(numpy.arange(1, shape[-1] + 1, dtype=float), sorted_values.shape)
+    average = numpy.bincount(groups.ravel(), weights=positions.ravel()) / numpy.bincount(groups.ravel())
+
+    ranks = numpy.empty(sorted_values.shape)
+    numpy.put_along_axis(ranks, order, average[groups], axis=-1)
+    ranks[numpy.isnan(values)] = numpy.nan
+
+    return numpy.moveaxis(ranks.reshape(shape), -1, axis)
+
+
 def calc_buffer(standings):
     """
     For each category, what % ahead is my team ahead of the next team?
 
     """
-    standings = standings.copy()
-    standings['to'] = -1 * standings['to']
+    my_team = numpy.flatnonzero(standings['team_id'].values == MY_TEAM_ID)[0]
 
-    rankings = standings.rank()  # we don't want to reverse turnovers here
+    return calc_buffer_values(standings[IMPORTANT_CATS].values, my_team)
 
-    behind_values = numpy.sort(numpy.array(standings[IMPORTANT_CATS]), axis=0)[
-        (rankings[rankings['team_id'] == MY_TEAM_ID][IMPORTANT_CATS].values - 2).flatten().astype(int).tolist(),
-        tuple(range(7))
-    ]
 
-    my_values = standings[standings['team_id'] == MY_TEAM_ID][IMPORTANT_CATS].values
+def calc_buffer_values(values, my_team):
+    """
+    Array version of calc_buffer
 
-    pct_behind = numpy.abs(1 - behind_values / my_values).flatten().tolist()
+    values is a teams x IMPORTANT_CATS array of final standings and my_team is the row of my team.
 
-    return dict(zip(IMPORTANT_CATS, pct_behind))
+    """
+    return dict(zip(IMPORTANT_CATS, StandingsIndex(values, BUFFER_SIGNS).buffer(my_team).tolist()))
 
 
-def optimize_roster(projections, standings):
+@timed
+def optimize_roster(projections, standings, jobs=1, simulate=None):
     """
     Swap every player on roster for another team's player and see if that improves the team rank
 
+    With jobs > 1, the players to drop are split across a pool of processes. Results are merged in the same order as
+    a serial run.
+
+    simulate optionally builds a season simulator from the SwapEngine, e.g. simulate_roto.SeasonSimulator. Swaps are
+    then also scored by their simulated expected roto points and ranked by those.
+
     """
+    projections = projections.reset_index(drop=True)
+
     # current roster's standings
-    final_standings = calc_final_standings(standings, projections)
-    final_ranks = calc_rankings(final_standings)
-    team_rank = final_ranks.loc[final_ranks['team_id'] == MY_TEAM_ID, 'total'].values[0]
-    current_buffer = calc_buffer(final_standings)
+    engine = SwapEngine(standings, projections)
+    simulator = simulate(engine) if simulate is not None else None
+
+    columns = ['yahoo_id', 'team_id', 'rank']
+    drop_players = [Player(*row) for row in projections.loc[projections['team_id'] == MY_TEAM_ID, columns].itertuples(name=None)]
+    drop_players.append(EMPTY_PLAYER)
+    free_agents = [Player(*row) for row in projections.loc[projections['team_id'].isna(), columns].itertuples(name=None)]
+    free_agents.append(EMPTY_PLAYER)
+
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs, initializer=init_tryouts_worker, initargs=(engine, free_agents, simulator)) as executor:
+            results = list(executor.map(calc_tryouts_worker, drop_players))
+    else:
+        results = [calc_tryouts(engine, drop_player, free_agents, simulator) for drop_player in drop_players]
 
-    tryouts = []
+    tryouts = list(itertools.chain.from_iterable(results))
 
-    Player = namedtuple('Player', 'yahoo_id team_id rank')
-    empty_player = Player(yahoo_id=0, team_id=None, rank=None)
-
-    for drop_player in itertools.chain(projections[projections['team_id'] == MY_TEAM_ID].itertuples(), [empty_player]):
-        for add_player in itertools.chain(projections[projections['team_id'].isna()].itertuples(), [empty_player]):
-            if drop_player != empty_player or add_player != empty_player:
-                new_final_ranks, new_final_standings = swap_players(drop_player, add_player, projections, standings)
-
-                new_team_rank = new_final_ranks.loc[new_final_ranks['team_id'] == MY_TEAM_ID, 'total'].values[0]
-
-                changes = (new_final_ranks[new_final_ranks['team_id'] == MY_TEAM_ID] - final_ranks[final_ranks['team_id'] == MY_TEAM_ID]).to_dict('records')[0]
-                change_string = ','.join([f"{k}:{v}" for k, v in changes.items() if v != 0])
-
-                if new_team_rank >= team_rank:
-                    buffer = calc_buffer(new_final_standings)
-                    min_buffer = min(buffer.values())
-                    buffer_change = {k: buffer[k] - current_buffer[k] for k in buffer}
-                else:
-                    min_buffer = None
-                    buffer_change = {}
-
-                tryouts.append(dict({
-                    'drop_player_id': drop_player.yahoo_id,
-                    'add_player_id': add_player.yahoo_id,
-                    'add_player_team_id': add_player.team_id,
-                    'drop_player_rank': drop_player.rank,
-                    'add_player_rank': add_player.rank,
-                    'new_team_rank': new_team_rank,
-                    'change': change_string,
-                    'min_buffer': min_buffer,
-                }, **buffer_change))
-    
-    id_mapping = pandas.read_csv('id_mapping.csv')
+    id_mapping = load_id_mapping()
     tryouts = pandas.DataFrame(tryouts)
     tryouts = tryouts.merge(id_mapping.rename(columns={'yahoo_name': 'drop_name', 'yahoo_id': 'drop_player_id'})[['drop_player_id', 'drop_name']], on='drop_player_id', how='left')
     tryouts = tryouts.merge(id_mapping.rename(columns={'yahoo_name': 'add_name', 'yahoo_id': 'add_player_id'})[['add_player_id', 'add_name']], on='add_player_id', how='left')
-    tryouts.sort_values(['new_team_rank', 'min_buffer'], ascending=[False, False], inplace=True)
+    if simulator is not None:
+        tryouts.sort_values(['sim_points', 'new_team_rank'], ascending=[False, False], inplace=True)
+    else:
+        tryouts.sort_values(['new_team_rank', 'min_buffer'], ascending=[False, False], inplace=True)
     tryouts.to_csv("tryouts.csv", encoding='utf8', index=False, float_format='%.4f')
 
 
-def swap_players(drop_player, add_player, projections, standings):
+@timed
+def calc_tryouts(engine, drop_player, free_agents, simulator=None):
     """
-    Calculate team ranks based on swapping players between teams
+    Try dropping drop_player for each of free_agents
 
     """
-    if add_player is not None:
-        projections.loc[projections['yahoo_id'] == add_player.yahoo_id, 'team_id'] = MY_TEAM_ID
-    
-        if drop_player is not None:
-            projections.loc[projections['yahoo_id'] == drop_player.yahoo_id, 'team_id'] = add_player.team_id
-    else:  # just dropping a player
-        projections.loc[projections['yahoo_id'] == drop_player.yahoo_id, 'team_id'] = None
+    my_team = engine.team_index[MY_TEAM_ID]
+    team_rank = engine.ranks[my_team, -1]
+    current_buffer = dict(zip(IMPORTANT_CATS, engine.standings_index.buffer(my_team)))
 
-    final_standings = calc_final_standings(standings, projections)
+    tryouts = []
 
-    final_rank = calc_rankings(final_standings)
+    add_rows = [player.Index for player in free_agents]
+    new_finals, new_ranks = engine.swap_many(my_team, drop_player.Index, add_rows)
 
-    # reverse the team changes
-    if add_player is not None:
-        projections.loc[projections['yahoo_id'] == add_player.yahoo_id, 'team_id'] = add_player.team_id
-    
-        if drop_player is not None:
-            projections.loc[projections['yahoo_id'] == drop_player.yahoo_id, 'team_id'] = MY_TEAM_ID
-    else:
-        projections.loc[projections['yahoo_id'] == drop_player.yahoo_id, 'team_id'] = MY_TEAM_ID
+    # only my team's totals change
+    new_buffers = engine.standings_index.buffer(my_team, new_finals[:, my_team, engine.buffer_columns])
+
+    if simulator is not None:
+        sim_points, sim_p_first = simulator.swap_many(my_team, drop_player.Index, add_rows)
+
+    for i, (add_player, new_final_ranks) in enumerate(zip(free_agents, new_ranks)):
+        if drop_player != EMPTY_PLAYER or add_player != EMPTY_PLAYER:
+            new_team_rank = new_final_ranks[my_team, -1]
+
+            changes = new_final_ranks[my_team] - engine.ranks[my_team]
+            change_string = ','.join([f"{k}:{v}" for k, v in zip(RANKING_COLUMNS, changes) if v != 0])
+
+            if new_team_rank >= team_rank:
+                buffer = dict(zip(IMPORTANT_CATS, new_buffers[i].tolist()))
+                min_buffer = min(buffer.values())
+                buffer_change = {k: buffer[k] - current_buffer[k] for k in buffer}
+            else:
+                min_buffer = None
+                buffer_change = {}
+
+            tryout = {
+                'drop_player_id': drop_player.yahoo_id,
+                'add_player_id': add_player.yahoo_id,
+                'add_player_team_id': add_player.team_id,
+                'drop_player_rank': drop_player.rank,
+                'add_player_rank': add_player.rank,
+                'new_team_rank': new_team_rank,
+                'change': change_string,
+                'min_buffer': min_buffer,
+            }
+
+            if simulator is not None:
+                tryout['sim_points'] = sim_points[i]
+                tryout['sim_p_first'] = sim_p_first[i]
+
+            tryouts.append(dict(tryout, **buffer_change))
+
+    return tryouts
+
+
+# engine, free agents and simulator of a tryouts worker process, sent once when the process starts
+_tryouts_worker = {}
+
+
+def init_tryouts_worker(engine, free_agents, simulator):
+    _tryouts_worker['engine'] = engine
+    _tryouts_worker['free_agents'] = free_agents
+    _tryouts_worker['simulator'] = simulator
+
+
+def calc_tryouts_worker(drop_player):
+    return calc_tryouts(
+        _tryouts_worker['engine'], drop_player, _tryouts_worker['free_agents'], _tryouts_worker['simulator']
+    )
+
+
+@timed
+def search_trades(projections, standings, max_players=2, time_budget=None, top_k=50, min_gain=0, max_partner_loss=0):
+    """
+    Search trades of up to max_players players for up to max_players players with every other team
+
+    Keeps the top_k trades by my new team rank, printing each trade as it enters the top_k, and writes them to
+    trades.csv. The search stops after time_budget seconds if given.
+
+    """
+    projections = projections.reset_index(drop=True)
+
+    engine = SwapEngine(standings, projections)
+    my_team = engine.team_index[MY_TEAM_ID]
+
+    start = time.perf_counter()
+    best = []  # heap of the top_k trades
+
+    for i, trade in enumerate(iter_trades(engine, projections, max_players, min_gain, max_partner_loss)):
+        key = (trade['new_team_rank'], trade['value_gain'], -i)
+
+        if len(best) < top_k:
+            heapq.heappush(best, (key, trade))
+            kept = True
+        elif key > best[0][0]:
+            heapq.heapreplace(best, (key, trade))
+            kept = True
+        else:
+            kept = False
+
+        if kept and trade['new_team_rank'] > engine.ranks[my_team, -1]:
+            print(f"{trade['give_names']} -> {trade['get_names']} (team {trade['partner_team_id']}): {trade['change']}")
+
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            print(f"Stopping trade search after {time_budget} seconds")
+            break
+
+    trades = pandas.DataFrame([trade for _, trade in sorted(best, key=lambda x: x[0], reverse=True)])
+    trades.to_csv("trades.csv", encoding='utf8', index=False, float_format='%.4f')
+
+    return trades
+
+
+def iter_trades(engine, projections, max_players, min_gain, max_partner_loss):
+    """
+    Evaluate trades between my team and every other team, yielding each trade that isn't pruned
+
+    Trades are branch and bound pruned on player values: my mod_value gain has to be at least min_gain and the other
+    team's total_value loss at most max_partner_loss. Players given up are enumerated from least to most valuable, so
+    once even the most valuable players the other team has can't make up for the players given up, every later
+    branch is pruned too.
+
+    """
+    my_team = engine.team_index[MY_TEAM_ID]
+
+    mod_value = projections['mod_value'].values
+    total_value = projections['total_value'].values
+    names = projections['yahoo_name'].values
+    yahoo_ids = projections['yahoo_id'].values
+
+    gives = list(player_combinations(engine.rosters[my_team], max_players))
+    gives.sort(key=lambda rows: mod_value[list(rows)].sum())
+
+    for team, partner_rows in enumerate(engine.rosters):
+        if team == my_team or len(partner_rows) == 0:
+            continue
+
+        gets = list(player_combinations(partner_rows, max_players))
+        gets_mod = numpy.array([mod_value[list(rows)].sum() for rows in gets])
+        gets_total = numpy.array([total_value[list(rows)].sum() for rows in gets])
+
+        # most valuable players the partner could give for up to max_players players, leaving out the ones with
+        # negative values once there's one to give
+        best_get = numpy.cumsum(numpy.sort(mod_value[partner_rows])[::-1][:max_players]).max()
+
+        for give in gives:
+            give_mod = mod_value[list(give)].sum()
+            give_total = total_value[list(give)].sum()
+
+            if best_get - give_mod < min_gain:
+                break
+
+            candidates = numpy.flatnonzero(
+                (gets_mod - give_mod >= min_gain) &
+                (gets_total - give_total <= max_partner_loss)
+            )
+
+            if len(candidates) == 0:
+                continue
+
+            my_rows = engine.rosters[my_team][~numpy.isin(engine.rosters[my_team], give)]
+
+            new_rosters = {
+                my_team: engine.pad_rosters([numpy.append(my_rows, gets[c]) for c in candidates]),
+                team: engine.pad_rosters([
+                    numpy.append(partner_rows[~numpy.isin(partner_rows, gets[c])], give) for c in candidates
+                ]),
+            }
+
+            _, new_ranks = engine.move_many(new_rosters)
+
+            for c, ranks in zip(candidates, new_ranks):
+                changes = ranks[my_team] - engine.ranks[my_team]
+
+                yield {
+                    'partner_team_id': engine.team_ids[team],
+                    'give_player_ids': ','.join(str(yahoo_ids[row]) for row in give),
+                    'get_player_ids': ','.join(str(yahoo_ids[row]) for row in gets[c]),
+                    'new_team_rank': ranks[my_team, -1],
+                    'partner_rank_change': ranks[team, -1] - engine.ranks[team, -1],
+                    'change': ','.join([f"{k}:{v}" for k, v in zip(RANKING_COLUMNS, changes) if v != 0]),
+                    'value_gain': gets_mod[c] - give_mod,
+                    'partner_value_change': give_total - gets_total[c],
+                    'give_names': ','.join(str(names[row]) for row in give),
+                    'get_names': ','.join(str(names[row]) for row in gets[c]),
+                }
+
+
+def player_combinations(rows, max_players):
+    """
+    All groups of 1 to max_players players from rows
+
+    """
+    return itertools.chain.from_iterable(itertools.combinations(rows, k) for k in range(1, max_players + 1))
+
+
+class SwapEngine:
+    """
+    Keeps the rest of season totals of every team so that a swap only re-evaluates the rosters it changes
+
+    Players are referred to by their row position in projections. Rosters keep the projections row order, which is the
+    order players are weighted in by find_weights.
+
+    """
+    def __init__(self, standings, projections):
+        players = player_matrix(projections, STATS, standings['team_id'].values)
+
+        # an extra row of zeros pads rosters that are a player short
+        self.empty_row = len(projections)
+        self.stats = numpy.vstack([players.values, numpy.zeros(len(players.columns))])
+        self.gtp = numpy.append(projections['gtp'].values.astype(float), 0)
+        self.max_games = projections['gtp'].max()
+
+        self.team_ids = players.team_ids
+        self.team_index = {team_id: i for i, team_id in enumerate(self.team_ids)}
+        self.base = standings[STATS].values.astype(float)
+        self.buffer_columns = [STANDINGS_COLUMNS.index(stat) for stat in IMPORTANT_CATS]
+
+        rosters = roster_rows(players, pad=self.empty_row)
+        self.rosters = [rows[rows != self.empty_row] for rows in rosters]
+        self.ros = self.roster_totals(rosters)
+
+        self.final = calc_final_values(self.base + self.ros)
+        self.ranks = calc_rank_values(self.final)
+        self.standings_index = StandingsIndex(self.final[:, self.buffer_columns], BUFFER_SIGNS)
+
+    def team_totals(self, rows):
+        """
+        Total rest of season stats of a roster given as projections rows
+
+        """
+        return self.roster_totals(numpy.asarray(rows)[numpy.newaxis])[0]
+
+    def roster_totals(self, rosters):
+        """
+        Total rest of season stats of a rosters x players array of projections rows
+
+        """
+        return numpy.einsum('rp,rps->rs', self.roster_weights(rosters), self.stats[rosters])
+
+    def roster_weights(self, rosters):
+        """
+        % of games each player starts in a rosters x players array of projections rows
+
+        """
+        return find_weights_batch(PCT_PLAYED, self.max_games, self.gtp[rosters])
+
+    def move(self, new_rosters):
+        """
+        Final standings and rankings after replacing the rosters of some teams
+
+        new_rosters maps a team's row in the standings to its new roster rows. Only those teams are re-evaluated.
+
+        """
+        finals, ranks = self.move_many({team: self.pad_rosters([rows]) for team, rows in new_rosters.items()})
+
+        return finals[0], ranks[0]
+
+    def move_many(self, new_rosters):
+        """
+        Final standings and rankings for a batch of moves
+
+        new_rosters maps a team's row in the standings to a moves x players array of its new roster rows, as given by
+        pad_rosters. Returns arrays with a leading axis over the moves.
+
+        """
+        n_moves = len(next(iter(new_rosters.values())))
+        increment('swap moves', n_moves)
+
+        ros = numpy.repeat(self.ros[numpy.newaxis], n_moves, axis=0)
+
+        for team, rosters in new_rosters.items():
+            ros[:, team] = self.roster_totals(rosters)
+
+        finals = calc_final_values(self.base + ros)
+
+        return finals, calc_rank_values(finals)
+
+    def pad_rosters(self, rosters):
+        """
+        Stack rosters of projections rows into a rosters x players array, sorted and padded with the empty row
+
+        """
+        padded = numpy.full((len(rosters), max(len(rows) for rows in rosters)), self.empty_row)
+
+        for i, rows in enumerate(rosters):
+            padded[i, :len(rows)] = numpy.sort(rows)
+
+        return padded
+
+    def swap(self, team, drop_row=None, add_row=None):
+        """
+        Final standings and rankings after a team drops and / or adds a player
+
+        """
+        finals, ranks = self.swap_many(team, drop_row, [add_row])
+
+        return finals[0], ranks[0]
+
+    def swap_many(self, team, drop_row, add_rows):
+        """
+        Final standings and rankings for each of add_rows being added to a team after it drops drop_row
+
+        Either drop_row or entries of add_rows may be None for no player. Returns arrays with a leading axis over
+        add_rows.
+
+        """
+        return self.move_many({team: self.swap_rosters(team, drop_row, add_rows)})
+
+    def swap_rosters(self, team, drop_row, add_rows):
+        """
+        The team's new rosters for each of add_rows being added after it drops drop_row, as given by pad_rosters
+
+        """
+        rows = self.rosters[team]
+
+        if drop_row is not None:
+            rows = rows[rows != drop_row]
+
+        add_rows = numpy.array([self.empty_row if row is None else row for row in add_rows], dtype=int)
+
+        return numpy.sort(numpy.column_stack([numpy.tile(rows, (len(add_rows), 1)), add_rows]), axis=1)
+
+
+def calc_final_values(totals):
+    """
+    Add the ratio stats to a teams x STATS array of totals, giving STANDINGS_COLUMNS
+
+    Leading axes, such as one over candidate swaps, are kept.
+
+    """
+    return ROTO.final_values(totals)
+
+
+def calc_rank_values(final):
+    """
+    Array version of calc_rankings, giving RANKING_COLUMNS for every team
+
+    Leading axes, such as one over candidate swaps, are kept.
+
+    """
+    rankings = rank_average(ROTO.category_values(final), axis=-2)
 
-    return final_rank, final_standings
+    return numpy.concatenate([rankings, ROTO.total(rankings)[..., numpy.newaxis]], axis=-1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,146 @@
+"""
+Scoring categories of the league
+
+A category is a counting stat, summed over a team's players, or a ratio of two counting stats, such as fg% = fgm / fga.
+Direction is -1 for categories where less is better, such as turnovers. A roto category's standing points count weight
+times towards a team's total.
+
+The league's categories are set by name in config.py: ROTO_CATEGORIES, PUNTED_CATEGORIES (left out of mod value and
+roster buffers) and POINTS_SCORING (the fantasy points of each stat in points leagues). The categories are compiled into
+the column lists and index arrays that the array functions of calc_roto and calc_h2h_points use, so every league runs
+the same code.
+
+"""
+from collections import namedtuple
+
+import numpy
+
+from config import POINTS_SCORING, PUNTED_CATEGORIES, ROTO_CATEGORIES
+
+
+# numerator and denominator are None for counting stats
+Category = namedtuple('Category', 'name numerator denominator direction weight')
+
+
+def counting(name, direction=1, weight=1.0):
+    return Category(name, None, None, direction, weight)
+
+
+def ratio(name, numerator, denominator, direction=1, weight=1.0):
+    return Category(name, numerator, denominator, direction, weight)
+
+
+# every category that can be computed from the projections
+CATEGORIES = {category.name: category for category in [
+    counting('3pm'),
+    counting('pts'),
+    counting('treb'),
+    counting('ast'),
+    counting('stl'),
+    counting('blk'),
+    counting('to', direction=-1),
+    counting('fgm'),
+    counting('ftm'),
+    ratio('fg%', 'fgm', 'fga'),
+    ratio('ft%', 'ftm', 'fta'),
+    ratio('a/to', 'ast', 'to'),
+]}
+
+
+class RotoCategories:
+    """
+    Categories of a roto league compiled into columns and index arrays
+
+    Teams' totals are kept in totals_columns: the counting categories, then the parts of the ratio categories that
+    are not counting categories themselves. final_values adds the ratio categories to totals, giving
+    standings_columns. Categories are ordered counting then ratio, as in the rankings.
+
+    """
+    def __init__(self, categories, punted=()):
+        categories = [CATEGORIES[category] if isinstance(category, str) else category for category in categories]
+        categories = [category for category in categories if category.numerator is None] + [
+            category for category in categories if category.numerator is not None
+        ]
+
+        self.categories = categories
+        self.names = [category.name for category in categories]
+        self.counting = [category.name for category in categories if category.numerator is None]
+        self.ratios = [category for category in categories if category.numerator is not None]
+
+        # parts of every ratio, attempts before makes
+        parts = [part for category in self.ratios for part in (category.denominator, category.numerator)]
+        self.parts = [part for part in dict.fromkeys(parts) if part not in self.counting]
+
+        self.totals_columns = self.counting + self.parts
+        self.standings_columns = self.totals_columns + [category.name for category in self.ratios]
+        self.ranking_columns = self.names + ['total']
+
+        self.numerators = numpy.array([self.totals_columns.index(category.numerator) for category in self.ratios], dtype=int)
+        self.denominators = numpy.array([self.totals_columns.index(category.denominator) for category in self.ratios], dtype=int)
+        # position of every category in standings_columns
+        self.standings_index = numpy.array([self.standings_columns.index(name) for name in self.names], dtype=int)
+
+        self.signs = numpy.array([category.direction for category in categories], dtype=float)
+        self.weights = numpy.array([category.weight for category in categories], dtype=float)
+        self.is_ratio = numpy.array([category.numerator is not None for category in categories])
+
+        self.punted = [name for name in punted if name in self.names]
+        self.important = [name for name in self.names if name not in self.punted]
+        self.important_signs = [category.direction for category in categories if category.name in self.important]
+
+    def final_values(self, totals):
+        """
+        Add the ratio categories to a ... x totals_columns array of totals, giving standings_columns
+
+        """
+        ratios = totals[..., self.numerators] / totals[..., self.denominators]
+
+        return numpy.concatenate([totals, ratios], axis=-1)
+
+    def add_ratios(self, frame, overwrite=True):
+        """
+        Compute the ratio categories of a DataFrame from their parts, keeping ones it has unless overwrite
+
+        """
+        for category in self.ratios:
+            if overwrite or category.name not in frame:
+                frame[category.name] = frame[category.numerator] / frame[category.denominator]
+
+        return frame
+
+    def category_values(self, final):
+        """
+        The categories of a ... x standings_columns array, signed so that higher is better
+
+        """
+        return final[..., self.standings_index] * self.signs
+
+    def total(self, points):
+        """
+        Total standing points of a ... x categories array of standing points
+
+        """
+        return points @ self.weights
+
+
+def fantasy_points(frame, scoring):
+    """
+    Fantasy points of every row of a DataFrame of stats, given the points of each stat
+
+    The stats are added in the order of scoring.
+
+    """
+    points = frame[list(scoring)].values.astype(float) * numpy.array(list(scoring.values()), dtype=float)
+
+    return sequential_sum(points)
+
+
+def sequential_sum(values):
+    """
+    Sum a ... x columns array over its columns left to right, as adding one column at a time would
+
+    """
+    return numpy.cumsum(values, axis=-1)[..., -1]
+
+
+ROTO = RotoCategories(ROTO_CATEGORIES, PUNTED_CATEGORIES)
@@ -18,6 +18,12 @@ MY_TEAM_ID = 1
 # number of teams
 N_TEAMS = 12
 
+# roto categories and the ones punted, by name from categories.CATEGORIES
+ROTO_CATEGORIES = ['3pm', 'pts', 'treb', 'ast', 'stl', 'blk', 'to', 'fg%', 'ft%']
+PUNTED_CATEGORIES = ['pts', '3pm']
+# fantasy points of each stat in points leagues
+POINTS_SCORING = {'pts': 1.0, 'treb': 1.2, 'ast': 1.5, 'blk': 3.0, 'stl': 3.0, 'to': -1.0}
+
 # Yahoo app client id and secret
 YAHOO_CLIENT_ID = ''
 YAHOO_CLIENT_SECRET = ''
@@ -0,0 +1,232 @@
+"""
+Daily lineups for head to head points leagues
+
+Lineups are set every day, with each player started in a slot his positions are eligible for. For every remaining day
+of the season, the players with a game that day are assigned to LINEUP_SLOTS to maximize their expected fantasy points
+(a min-cost assignment), which gives each player's points as actually started.
+
+Candidate pickups are evaluated without solving a lineup per candidate. Lineups that can be filled form a matroid, so
+adding a player to a day's optimal lineup either fills an open slot or replaces exactly one starter. Which starter
+depends only on the slots the player is eligible for, so one assignment per day and set of eligible slots gives the
+points a candidate has to beat, for all candidates at once, and the starter he replaces for a weekly games cap.
+
+"""
+import numpy
+import pandas
+from scipy.optimize import linear_sum_assignment
+
+
+LINEUP_SLOTS = ['PG', 'SG', 'G', 'SF', 'PF', 'F', 'C', 'C', 'UTIL', 'UTIL']
+
+# positions eligible for each slot, None for any position
+SLOT_POSITIONS = {
+    'PG': {'PG'},
+    'SG': {'SG'},
+    'G': {'PG', 'SG'},
+    'SF': {'SF'},
+    'PF': {'PF'},
+    'F': {'SF', 'PF'},
+    'C': {'C'},
+    'UTIL': None,
+}
+
+# value of a forced start, larger than any lineup's points
+FORCED_VALUE = 1e9
+
+
+def slot_eligibility(positions, slots=LINEUP_SLOTS):
+    """
+    Players x slots boolean array of whether each player can start in each slot, given positions such as "PG,SG"
+
+    """
+    player_positions = [set(str(pos).split(',')) if pandas.notna(pos) else set() for pos in positions]
+
+    return numpy.array([
+        [SLOT_POSITIONS[slot] is None or bool(SLOT_POSITIONS[slot] & pos) for slot in slots]
+        for pos in player_positions
+    ], dtype=bool).reshape(len(player_positions), len(slots))
+
+
+def solve_lineup(values, eligible):
+    """
+    Best lineup of players with the given values and slot eligibility, giving whether each player starts and the total
+
+    """
+    if len(values) == 0:
+        return numpy.zeros(0, dtype=bool), 0.0
+
+    rows, cols = linear_sum_assignment(-(values[:, numpy.newaxis] * eligible))
+
+    starts = numpy.zeros(len(values), dtype=bool)
+    starts[rows] = eligible[rows, cols]
+
+    return starts, values[starts].sum()
+
+
+class DailyLineups:
+    """
+    Optimal daily lineups of a roster for every remaining day
+
+    values is each player's expected fantasy points when he plays, eligible the players x slots eligibility and plays the
+    players x days game days. week_of_day is the scoring week of each day. games_cap limits the games started in a
+    week, keeping the highest scoring starts as if the week's games were known in advance.
+
+    """
+    def __init__(self, values, eligible, plays, week_of_day, games_cap=None):
+        self.values = numpy.nan_to_num(numpy.asarray(values, dtype=float))
+        self.eligible = eligible
+        self.plays = plays
+        self.week_of_day = numpy.asarray(week_of_day)
+        self.weeks = numpy.unique(self.week_of_day)
+        self.games_cap = games_cap
+
+        # players x days
+        self.starts = numpy.zeros(plays.shape, dtype=bool)
+        self.day_points = numpy.zeros(plays.shape[1])
+
+        for day in range(plays.shape[1]):
+            playing = numpy.flatnonzero(plays[:, day])
+            starts, self.day_points[day] = solve_lineup(self.values[playing], eligible[playing])
+            self.starts[playing[starts], day] = True
+
+        # points a player with the given slots has to beat on each day and the starts of the roster when he starts,
+        # computed as needed
+        self.forced = {}
+
+    def start_points(self):
+        """
+        Players x weeks array of the points each player scores as a starter, after the weekly games cap
+
+        """
+        points = numpy.where(self.starts, self.values[:, numpy.newaxis], 0)
+
+        if self.games_cap is not None:
+            for week in self.weeks:
+                in_week = self.week_of_day == week
+                week_points = points[:, in_week]
+
+                # drop the lowest scoring starts beyond the cap
+                order = numpy.argsort(-week_points, axis=None, kind='stable')
+                started = numpy.flatnonzero(week_points.ravel()[order] > 0)
+                dropped = numpy.zeros(week_points.size, dtype=bool)
+                dropped[order[started[self.games_cap:]]] = True
+
+                points[:, in_week] = numpy.where(dropped.reshape(week_points.shape), 0, week_points)
+
+        return self.by_week(points)
+
+    def forced_lineup(self, slots):
+        """
+        Points on each day that a player eligible for slots has to score to start, and the players x days starts of the
+        roster on the days he starts
+
+        The threshold is the points of the starter that the player would replace, 0 where a slot is open and inf where
+        no slot is eligible. The starter replaced is the one the assignment with the player forced in leaves out.
+
+        """
+        key = slots.tobytes()
+
+        if key not in self.forced:
+            threshold = numpy.full(self.plays.shape[1], numpy.inf)
+            starts = self.starts.copy()
+
+            if slots.any():
+                for day in range(self.plays.shape[1]):
+                    playing = numpy.flatnonzero(self.plays[:, day])
+
+                    values = numpy.append(self.values[playing], FORCED_VALUE)
+                    eligible = numpy.vstack([self.eligible[playing], slots])
+
+                    forced_starts, _ = solve_lineup(values, eligible)
+
+                    starts[:, day] = False
+                    starts[playing[forced_starts[:-1]], day] = True
+
+                threshold = numpy.maximum(self.values @ self.starts - self.values @ starts, 0)
+
+            self.forced[key] = threshold, starts
+
+        return self.forced[key]
+
+    def threshold(self, slots):
+        """
+        Points on each day that a player eligible for slots has to score to start, 0 where a slot is open and inf where
+        no slot is eligible
+
+        """
+        return self.forced_lineup(slots)[0]
+
+    def pickup_points(self, values, eligible, plays):
+        """
+        Candidates x weeks array of how many points the roster gains by adding each candidate, for candidates with the
+        given values, slots x eligibility and days played
+
+        """
+        values = numpy.nan_to_num(numpy.asarray(values, dtype=float))
+
+        patterns, pattern_index = numpy.unique(eligible, axis=0, return_inverse=True)
+        pattern_index = pattern_index.ravel()
+        forced = [self.forced_lineup(slots) for slots in patterns]
+
+        # candidates x days points to beat
+        thresholds = numpy.array([threshold for threshold, _ in forced]).reshape(len(patterns), plays.shape[1])[pattern_index]
+        starts = plays & (values[:, numpy.newaxis] > thresholds)
+
+        if self.games_cap is None:
+            return self.by_week(numpy.where(starts, values[:, numpy.newaxis] - thresholds, 0))
+
+        # patterns x players x days
+        forced_starts = numpy.array([roster_starts for _, roster_starts in forced]).reshape((len(patterns),) + self.starts.shape)
+
+        return self.capped_pickup_points(values, starts, forced_starts[pattern_index])
+
+    def capped_pickup_points(self, values, starts, forced_starts):
+        """
+        pickup_points with a weekly games cap, given the candidates x days starts of each candidate and the candidates x
+        players x days starts of the roster when he starts
+
+        On the days a candidate starts, the roster's starts are those of the lineup he is forced into, so the starter he
+        replaces loses that start. Then the highest scoring starts of the week, his included, count up to the cap.
+
+        """
+        base_points = numpy.where(self.starts, self.values[:, numpy.newaxis], 0)
+        forced_points = numpy.where(forced_starts, self.values[:, numpy.newaxis], 0)
+        gains = numpy.zeros((len(values), len(self.weeks)))
+
+        for w, week in enumerate(self.weeks):
+            in_week = self.week_of_day == week
+
+            base_total = capped_total(base_points[:, in_week].reshape(1, -1), self.games_cap)
+
+            # candidates x (players x days + days) points of every start of the week with the candidate added
+            roster_points = numpy.where(
+                starts[:, numpy.newaxis, in_week], forced_points[:, :, in_week], base_points[numpy.newaxis, :, in_week]
+            )
+            added_points = numpy.where(starts[:, in_week], values[:, numpy.newaxis], 0)
+            week_points = numpy.concatenate([roster_points.reshape(len(values), -1), added_points], axis=1)
+
+            gains[:, w] = capped_total(week_points, self.games_cap) - base_total
+
+        return gains
+
+    def by_week(self, points):
+        return numpy.column_stack([points[:, self.week_of_day == week].sum(axis=1) for week in self.weeks])
+
+
+def capped_total(points, games_cap):
+    """
+    Total of each row of points keeping only the games_cap highest scoring starts, as start_points does
+
+    """
+    started = numpy.where(points > 0, points, 0)
+    kept = -numpy.sort(-started, axis=1)[:, :games_cap]
+
+    return kept.sum(axis=1) + numpy.where(points > 0, 0, points).sum(axis=1)
+
+
+def week_numbers(days, season_start):
+    """
+    Scoring week of each day, weeks starting on the Monday season_start
+
+    """
+    return ((days - pandas.Timestamp(season_start)).days // 7 + 1).values
@@ -0,0 +1,167 @@
+"""
+Columnar store of dated snapshots of the scraped data
+
+Each dataset is a directory of Parquet files partitioned by snapshot date, e.g.
+historical/rosters/date=2020-01-06/rosters.parquet. Snapshots are only ever added, or replaced by a newer snapshot of
+the same date, and loading a date range only reads the requested columns of the requested dates.
+
+Run this module to import the old historical/{dataset}_{date}.csv snapshots.
+
+"""
+import argparse
+import datetime
+import glob
+import os
+import re
+
+import pandas
+import pyarrow.parquet
+
+from instrumentation import entry_point, parse_args
+
+
+HISTORICAL_DIR = 'historical'
+
+# types of the columns of each dataset, other columns keep the type pandas gives them
+SCHEMAS = {
+    'projections': {
+        'r#': 'Int64', 'name': 'str', 'pos': 'str', 'team': 'str', 'gp': 'float', 'mpg': 'float',
+        'fg%': 'float', 'fgm': 'float', 'fga': 'float', 'ft%': 'float', 'ftm': 'float', 'fta': 'float',
+        '3pm': 'float', 'pts': 'float', 'treb': 'float', 'ast': 'float', 'stl': 'float', 'blk': 'float',
+        'to': 'float', 'total': 'float',
+    },
+    'yahoo_projections': {
+        'abbr_name': 'str', 'yahoo_id': 'Int64', 'gtp': 'float', 'rank': 'float', 'mpg': 'str',
+        'pts': 'float', 'treb': 'float', 'ast': 'float', 'stl': 'float', 'blk': 'float', 'to': 'float',
+    },
+    'yahoo_playing_time': {
+        'abbr_name': 'str', 'yahoo_id': 'Int64', 'gtp': 'float', 'rank': 'float', 'mpg': 'str',
+        'pts': 'float', 'treb': 'float', 'ast': 'float', 'stl': 'float', 'blk': 'float', 'to': 'float',
+    },
+    'rosters': {
+        'team_id': 'Int64', 'yahoo_id': 'Int64', 'name': 'str', 'nba_team': 'str', 'pos': 'str',
+    },
+    'standings': {
+        'team_id': 'Int64', 'gp': 'float', 'fg%': 'float', 'ft%': 'float', '3ptm': 'float', 'pts': 'float',
+        'reb': 'float', 'ast': 'float', 'st': 'float', 'blk': 'float', 'to': 'float',
+        'fgm': 'float', 'fga': 'float', 'ftm': 'float', 'fta': 'float',
+    },
+}
+
+
+@entry_point
+def main():
+    parse_args(argparse.ArgumentParser())
+
+    for dataset in SCHEMAS:
+        for path, date in import_csv_snapshots(dataset):
+            print(f"Imported {path} as {dataset} {date}")
+
+
+def append(dataset, date, frame):
+    """
+    Store a snapshot of a dataset taken on date, replacing any earlier snapshot of the same date
+
+    """
+    path = partition_path(dataset, format_date(date))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conform(dataset, frame).to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def load(dataset, start=None, end=None, columns=None):
+    """
+    Load the snapshots of a dataset between start and end (inclusive) into one DataFrame with a date column
+
+    Only the given columns are read.
+
+    """
+    frames = []
+
+    for date in dates(dataset, start, end):
+        path = partition_path(dataset, date)
+
+        if columns is not None:
+            available = pyarrow.parquet.read_schema(path).names
+            frame = pandas.read_parquet(path, columns=[col for col in columns if col in available])
+        else:
+            frame = pandas.read_parquet(path)
+
+        frame.insert(0, 'date', pandas.Timestamp(date))
+        frames.append(frame)
+
+    if not frames:
+        return pandas.DataFrame(columns=['date'] + list(columns or SCHEMAS.get(dataset, {})))
+
+    return pandas.concat(frames, ignore_index=True, sort=False)
+
+
+def dates(dataset, start=None, end=None):
+    """
+    Sorted dates (as YYYY-MM-DD) that a dataset has snapshots for, between start and end (inclusive)
+
+    """
+    snapshot_dates = sorted(
+        os.path.basename(path)[len('date='):]
+        for path in glob.glob(os.path.join(HISTORICAL_DIR, dataset, 'date=*'))
+    )
+
+    if start is not None:
+        snapshot_dates = [date for date in snapshot_dates if date >= format_date(start)]
+
+    if end is not None:
+        snapshot_dates = [date for date in snapshot_dates if date <= format_date(end)]
+
+    return snapshot_dates
+
+
+def conform(dataset, frame):
+    """
+    Cast the columns of a snapshot to the dataset's schema
+
+    """
+    frame = frame.copy()
+
+    for column, column_type in SCHEMAS.get(dataset, {}).items():
+        if column not in frame:
+            continue
+
+        if column_type == 'str':
+            frame[column] = frame[column].where(frame[column].isna(), frame[column].astype(str))
+        elif column_type == 'Int64':
+            frame[column] = pandas.to_numeric(frame[column], errors='coerce').round().astype('Int64')
+        else:
+            frame[column] = pandas.to_numeric(frame[column], errors='coerce').astype(column_type)
+
+    return frame
+
+
+def import_csv_snapshots(dataset):
+    """
+    Store the historical/{dataset}_{date}.csv snapshots of a dataset, yielding each imported file and its date
+
+    """
+    pattern = re.compile(re.escape(dataset) + r'_(\d{4}-\d{2}-\d{2})\.csv$')
+
+    for path in sorted(glob.glob(os.path.join(HISTORICAL_DIR, f"{dataset}_*.csv"))):
+        match = pattern.search(os.path.basename(path))
+
+        if match:
+            append(dataset, match.group(1), pandas.read_csv(path))
+            yield path, match.group(1)
+
+
+def partition_path(dataset, date):
+    return os.path.join(HISTORICAL_DIR, dataset, f"date={date}", f"{dataset}.parquet")
+
+
+def format_date(date):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return f"{date:%Y-%m-%d}"
+
+    return str(date)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+HTTP utility functions shared by the scrapers
+
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class TokenBucket:
+    """
+    Rate limiter that allows bursts of up to capacity requests and refills at rate requests per second
+
+    Safe to share between threads.
+
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request is allowed
+
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class HttpCache:
+    """
+    On disk cache of GET responses
+
+    A response younger than the ttl given for its url is served from disk. An older one is revalidated with its ETag
+    or Last-Modified, so an unchanged page costs a 304 instead of a download. Bodies are stored by content hash, so
+    identical responses are only stored once. When offline, every response comes from the cache. A response can be
+    validated before it is stored, so that e.g. a login page served with a 200 isn't reused.
+
+    """
+    def __init__(self, directory, offline=False):
+        self.directory = directory
+        self.offline = offline
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def get(self, session, url, ttl=0, validate=None):
+        """
+        GET url with session, going through the cache
+
+        validate is called with a downloaded 200 response before it is stored, and raises to keep it out of the cache.
+
+        """
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        entry = self.load_entry(key)
+
+        if entry is not None and (self.offline or time.time() - entry['fetched_at'] < ttl):
+            self.count('hits')
+            return self.cached_response(url, entry)
+
+        if self.offline:
+            raise KeyError(f"{url} is not in the HTTP cache")
+
+        headers = {}
+
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        r = session.get(url, headers=headers)
+
+        if r.status_code == 304 and entry is not None:
+            self.count('revalidated')
+            entry['fetched_at'] = time.time()
+            self.save_entry(key, entry)
+
+            return self.cached_response(url, entry)
+
+        self.count('misses')
+
+        if r.status_code == 200:
+            if validate is not None:
+                validate(r)
+
+            body_hash = hashlib.sha256(r.content).hexdigest()
+            body_path = os.path.join(self.directory, 'bodies', body_hash)
+
+            if not os.path.exists(body_path):
+                write_atomic(body_path, r.content)
+
+            self.save_entry(key, {
+                'url': url,
+                'fetched_at': time.time(),
+                'etag': r.headers.get('ETag'),
+                'last_modified': r.headers.get('Last-Modified'),
+                'content_type': r.headers.get('Content-Type'),
+                'body': body_hash,
+            })
+
+        return r
+
+    def load_entry(self, key):
+        try:
+            with open(os.path.join(self.directory, 'entries', f"{key}.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_entry(self, key, entry):
+        write_atomic(os.path.join(self.directory, 'entries', f"{key}.json"), json.dumps(entry).encode('utf-8'))
+
+    def cached_response(self, url, entry):
+        """
+        Rebuild a requests Response from a cache entry
+
+        """
+        with open(os.path.join(self.directory, 'bodies', entry['body']), 'rb') as f:
+            content = f.read()
+
+        r = requests.Response()
+        r.url = url
+        r.status_code = 200
+        r._content = content
+        r._content_consumed = True
+        r.headers = CaseInsensitiveDict({'Content-Type': entry['content_type']} if entry['content_type'] else {})
+
+        return r
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def report(self):
+        print(
+            f"HTTP cache: {self.stats['hits']} hits, {self.stats['revalidated']} revalidated, "
+            f"{self.stats['misses']} misses"
+        )
+
+
+def write_atomic(path, content):
+    """
+    Write a file so that readers never see it half written
+
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+
+    os.replace(tmp_path, path)
+
+
+# cache shared by all scripts, HTTP_CACHE_OFFLINE=1 replays cached responses without the network
+HTTP_CACHE = HttpCache(
+    os.environ.get('HTTP_CACHE_DIR', '.http_cache'),
+    offline=os.environ.get('HTTP_CACHE_OFFLINE') == '1'
+)
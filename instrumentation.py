@@ -0,0 +1,217 @@
+"""
+Timing spans, counters and profiling of a script run, written to a JSON run report
+
+Spans nest: a span opened inside another is reported as its child, and spans of the same name under the same parent
+are added up, with the number of times they ran. Counters, added to with increment, count events such as the rosters
+weighted by find_weights. Spans opened in a thread start at the top level. Spans and counters of pool worker processes
+are not included.
+
+Entry point scripts parse their arguments with parse_args, which adds --profile, and decorate main with entry_point,
+which writes reports/{script}.json when main returns or fails. With --profile, the run is also profiled with cProfile:
+the statistics are saved to reports/{script}.prof and the spans and slowest functions are printed.
+
+"""
+import contextlib
+import cProfile
+import datetime
+import functools
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+
+
+REPORT_DIR = 'reports'
+# functions printed by --profile
+PROFILE_TOP = 25
+
+
+class Span:
+    """
+    Total time and number of runs of a span, and its child spans by name
+
+    """
+    __slots__ = ('name', 'seconds', 'count', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.count = 0
+        self.children = {}
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'seconds': round(self.seconds, 6),
+            'count': self.count,
+            'children': [child.to_dict() for child in self.children.values()],
+        }
+
+
+_root = Span('run')
+_counters = Counter()
+_lock = threading.Lock()
+# each thread's stack of open spans
+_local = threading.local()
+# profiler of the run, if --profile
+_profiler = {}
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Time the enclosed code as a child of the innermost open span
+
+    """
+    stack = open_spans()
+
+    with _lock:
+        node = stack[-1].children.get(name)
+
+        if node is None:
+            node = stack[-1].children[name] = Span(name)
+
+    stack.append(node)
+    start = time.perf_counter()
+
+    try:
+        yield node
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+
+        with _lock:
+            node.seconds += elapsed
+            node.count += 1
+
+
+def timed(function):
+    """
+    Decorate a function to run it in a span named after it
+
+    """
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        with span(function.__qualname__):
+            return function(*args, **kwargs)
+
+    return timed_function
+
+
+def increment(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def open_spans():
+    stack = getattr(_local, 'stack', None)
+
+    if stack is None:
+        stack = _local.stack = [_root]
+
+    return stack
+
+
+def parse_args(parser, args=None):
+    """
+    Parse the arguments of an entry point script with parser, adding --profile, and start profiling if given
+
+    """
+    parser.add_argument("--profile", action="store_true", help=f"profile the run, saving the statistics in {REPORT_DIR}/")
+
+    parsed = parser.parse_args(args)
+
+    if parsed.profile:
+        _profiler['profile'] = cProfile.Profile()
+        _profiler['profile'].enable()
+
+    return parsed
+
+
+def entry_point(main):
+    """
+    Decorate the main function of a script to write a run report when it returns or fails
+
+    """
+    @functools.wraps(main)
+    def run(*args, **kwargs):
+        started = datetime.datetime.now()
+        start = time.perf_counter()
+        status = 'ok'
+
+        try:
+            return main(*args, **kwargs)
+        except SystemExit as e:
+            status = f"exit {e.code}"
+            raise
+        except BaseException as e:
+            status = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            write_report(script_name(), started, time.perf_counter() - start, status)
+
+    return run
+
+
+def script_name():
+    return os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+
+
+def report(script, started, seconds, status):
+    """
+    Run report of a script as a dict
+
+    """
+    _root.seconds = seconds
+    _root.count = 1
+
+    with _lock:
+        return {
+            'script': script,
+            'argv': sys.argv[1:],
+            'started': started.isoformat(timespec='seconds'),
+            'seconds': round(seconds, 6),
+            'status': status,
+            # ru_maxrss is in KB on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'spans': _root.to_dict()['children'],
+            'counters': dict(_counters),
+            'profile': None,
+        }
+
+
+def write_report(script, started, seconds, status):
+    """
+    Write the run report to REPORT_DIR/{script}.json, and save and print the profile if the run was profiled
+
+    """
+    os.makedirs(REPORT_DIR, exist_ok=True)
+
+    run_report = report(script, started, seconds, status)
+    profile = _profiler.pop('profile', None)
+
+    if profile is not None:
+        profile.disable()
+
+        run_report['profile'] = os.path.join(REPORT_DIR, f"{script}.prof")
+        profile.dump_stats(run_report['profile'])
+
+        print_spans(run_report['spans'])
+
+        for name, n in run_report['counters'].items():
+            print(f"{name:<50} {n:>20}")
+
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(PROFILE_TOP)
+
+    with open(os.path.join(REPORT_DIR, f"{script}.json"), 'w') as f:
+        json.dump(run_report, f, indent=1)
+
+
+def print_spans(spans, depth=0):
+    for node in spans:
+        print(f"{'  ' * depth + node['name']:<50} {node['seconds']:>10.3f}s {node['count']:>8}x")
+        print_spans(node['children'], depth + 1)
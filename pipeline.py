@@ -0,0 +1,317 @@
+"""
+Run the scripts of the run order as a pipeline, re-running a stage only when its inputs changed
+
+Each stage declares the files it reads and writes. Fetch stages get data from Yahoo and Hashtag Basketball, don't read
+any files and run in parallel. Other stages run once the stages writing their inputs are done, and only if the content
+of an input, of the stage's script or of a local module it imports (including config.py) changed since the stage last
+succeeded (recorded in PIPELINE_STATE). A per-stage timing report is printed at the end of each run.
+
+Names are resolved to Yahoo ids once, by the ids stage, before the calculations run in parallel. The calculations then
+find every name they can resolve already in id_mapping.csv, so they don't write it.
+
+With --watch, the pipeline runs again without the fetch stages whenever an input file changes.
+
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import SEASON_START
+from instrumentation import entry_point, increment, parse_args, span
+
+
+PIPELINE_STATE = '.pipeline_state.json'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+Stage = namedtuple('Stage', 'name script args inputs outputs fetch')
+
+STAGES = [
+    Stage('rosters', 'retrieve_roster.py', ['--cached'], [], ['rosters.csv'], True),
+    Stage('projections', 'scrape_hashtagbasketball.py', [], [], ['projections.csv'], True),
+    Stage('yahoo', 'scrape_yahoo.py', [], [], ['yahoo_projections.csv', 'yahoo_playing_time.csv'], True),
+    Stage('standings', 'retrieve_standings.py', ['--cached'], [], ['standings.csv'], True),
+    Stage('ids', 'player_ids.py', [], ['projections.csv', 'yahoo_projections.csv', 'rosters.csv'], ['id_mapping.csv'], False),
+    Stage(
+        'roto', 'calc_roto.py', ['--optimize'],
+        ['projections.csv', 'yahoo_projections.csv', 'yahoo_playing_time.csv', 'gtp_manual.csv', 'id_mapping.csv', 'rosters.csv', 'standings.csv'],
+        ['ros_values.csv', 'tryouts.csv'], False
+    ),
+    Stage(
+        'h2h', 'calc_h2h_points.py', [],
+        [
+            'projections.csv', 'yahoo_projections.csv', 'id_mapping.csv', 'rosters.csv',
+            f"schedule_{SEASON_START.year}.csv", f"daily_schedule_{SEASON_START.year}.csv"
+        ],
+        ['valuation.csv'], False
+    ),
+]
+
+
+@entry_point
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stages", nargs='*', help="stages to run, with the stages they depend on (default all)")
+    parser.add_argument("--skip-fetch", action="store_true", help="don't run the fetch stages")
+    parser.add_argument("--force", action="store_true", help="run stages even if their inputs did not change")
+    parser.add_argument("--jobs", type=int, default=4, help="number of stages to run at once")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="poll input files every SECONDS and run again when they change")
+    args = parse_args(parser)
+
+    stages = select_stages(STAGES, args.stages)
+
+    if args.skip_fetch:
+        stages = [stage for stage in stages if not stage.fetch]
+
+    results = run_pipeline(stages, force=args.force, jobs=args.jobs)
+    print_report(results)
+
+    if args.watch:
+        stages = [stage for stage in stages if not stage.fetch]
+        watched = sorted({path for stage in stages for path in stage.inputs})
+        stamps = file_stamps(watched)
+
+        print(f"Watching {len(watched)} files")
+
+        try:
+            while True:
+                time.sleep(args.watch)
+
+                new_stamps = file_stamps(watched)
+
+                if new_stamps != stamps:
+                    stamps = new_stamps
+                    print_report(run_pipeline(stages, jobs=args.jobs))
+        except KeyboardInterrupt:
+            pass
+
+    if any(result['status'] == 'failed' for result in results):
+        sys.exit(1)
+
+
+def select_stages(stages, names):
+    """
+    The named stages and every stage they depend on, in pipeline order
+
+    """
+    if not names:
+        return list(stages)
+
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in names if name not in by_name]
+
+    if unknown:
+        raise ValueError(f"unknown stages {unknown}, choose from {list(by_name)}")
+
+    selected = set()
+    pending = list(names)
+
+    while pending:
+        name = pending.pop()
+
+        if name not in selected:
+            selected.add(name)
+            pending.extend(producer.name for producer in dependencies(stages, by_name[name]))
+
+    return [stage for stage in stages if stage.name in selected]
+
+
+def dependencies(stages, stage):
+    """
+    Stages that write one of the inputs of stage
+
+    """
+    return [other for other in stages if other is not stage and set(other.outputs) & set(stage.inputs)]
+
+
+def run_pipeline(stages, force=False, jobs=4):
+    """
+    Run stages once the stages they depend on are done, skipping stages whose inputs did not change
+
+    Stages that depend on a failed stage are not run. Returns a list with the status and timing of every stage, in the
+    order they finished.
+
+    """
+    state = load_state()
+    results = []
+
+    waiting = list(stages)
+    running = {}
+    done = {}
+
+    with ThreadPoolExecutor(jobs) as executor:
+        while waiting or running:
+            for stage in list(waiting):
+                upstream = dependencies(stages, stage)
+
+                if any(done.get(other.name) == 'failed' for other in upstream):
+                    waiting.remove(stage)
+                    done[stage.name] = 'failed'
+                    results.append({'stage': stage.name, 'status': 'failed', 'seconds': 0, 'reason': 'upstream failed'})
+                elif all(other.name in done for other in upstream):
+                    waiting.remove(stage)
+                    running[executor.submit(run_stage, stage, state.get(stage.name), force)] = stage
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                stage = running.pop(future)
+                result, stage_state = future.result()
+
+                done[stage.name] = result['status']
+                results.append(result)
+
+                if stage_state is not None:
+                    state[stage.name] = stage_state
+                    save_state(state)
+
+    return results
+
+
+def run_stage(stage, last_state, force=False):
+    """
+    Run a stage's script if needed, giving its result and its new state (None if it failed)
+
+    The state of a stage is the content hash of each of its inputs, its script and the local modules it imports when
+    it last succeeded. Fetch stages always run.
+
+    """
+    inputs = {path: file_hash(path) for path in stage.inputs}
+    inputs.update({os.path.basename(path): file_hash(path) for path in local_modules(os.path.join(SCRIPT_DIR, stage.script))})
+    outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+
+    if not stage.fetch and not force and outputs_exist and last_state is not None and last_state.get('inputs') == inputs:
+        return {'stage': stage.name, 'status': 'skipped', 'seconds': 0, 'reason': 'inputs unchanged'}, None
+
+    start = time.perf_counter()
+
+    with span(f"stage {stage.name}"):
+        completed = subprocess.run(
+            [sys.executable, os.path.join(SCRIPT_DIR, stage.script)] + stage.args, capture_output=True, text=True
+        )
+
+    seconds = time.perf_counter() - start
+    increment(f"stages {'failed' if completed.returncode != 0 else 'ran'}")
+
+    if completed.returncode != 0:
+        print(f"{stage.name} failed:\n{completed.stderr}", file=sys.stderr)
+
+        return {'stage': stage.name, 'status': 'failed', 'seconds': seconds, 'reason': f"exit code {completed.returncode}"}, None
+
+    outputs = {path: file_hash(path) for path in stage.outputs}
+    changed = last_state is None or last_state.get('outputs') != outputs
+
+    result = {
+        'stage': stage.name,
+        'status': 'ran',
+        'seconds': seconds,
+        'reason': 'outputs changed' if changed else 'outputs unchanged',
+    }
+
+    return result, {'inputs': inputs, 'outputs': outputs}
+
+
+def print_report(results):
+    print(f"{'stage':<12} {'status':<8} {'seconds':>8}  reason")
+
+    for result in results:
+        print(f"{result['stage']:<12} {result['status']:<8} {result['seconds']:>8.2f}  {result['reason']}")
+
+    print(f"{'total':<12} {'':<8} {sum(result['seconds'] for result in results):>8.2f}")
+
+
+def file_hash(path):
+    """
+    SHA-256 of a file's content, or None if it does not exist
+
+    """
+    if not os.path.exists(path):
+        return None
+
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def local_modules(script):
+    """
+    Paths of script and of every module it imports, directly or not, from SCRIPT_DIR or the current directory
+
+    Imports anywhere in a module count, including ones inside functions.
+
+    """
+    found = []
+    pending = [script]
+
+    while pending:
+        path = pending.pop()
+
+        if path in found:
+            continue
+
+        found.append(path)
+
+        with open(path, encoding='utf8') as f:
+            tree = ast.parse(f.read(), filename=path)
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names = [node.module]
+            else:
+                continue
+
+            for name in names:
+                module_path = find_local_module(name.split('.')[0])
+
+                if module_path is not None:
+                    pending.append(module_path)
+
+    return sorted(found)
+
+
+def find_local_module(name):
+    for directory in (SCRIPT_DIR, os.getcwd()):
+        path = os.path.join(directory, f"{name}.py")
+
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+def file_stamps(paths):
+    return [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths if os.path.exists(path)]
+
+
+def load_state():
+    if not os.path.exists(PIPELINE_STATE):
+        return {}
+
+    with open(PIPELINE_STATE) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(f"{PIPELINE_STATE}.tmp", 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+    os.replace(f"{PIPELINE_STATE}.tmp", PIPELINE_STATE)
+
+
+if __name__ == '__main__':
+    main()
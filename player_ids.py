@@ -0,0 +1,373 @@
+"""
+Resolve player names from other sites to Yahoo player ids
+
+Names are normalized (accents, punctuation, suffixes such as Jr. and common nicknames) and looked up in an index of the
+Yahoo players known from id_mapping.csv, rosters.csv and yahoo_projections.csv. Names without an exact match are
+matched on character trigrams, with NBA team and position breaking ties. Names resolved by their normalized name are
+added to id_mapping.csv, so they are exact matches from then on and can be corrected by hand. Trigram matches are used
+but only printed, to be confirmed by adding them to id_mapping.csv by hand.
+
+Run this module to resolve the names in projections.csv and print the ones that could not be resolved.
+
+"""
+import argparse
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+import pandas
+
+from http_util import write_atomic
+from instrumentation import entry_point, increment, parse_args, timed
+from utils import load_id_mapping, load_projections, load_rosters, load_yahoo_projections
+
+
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+# nicknames and the first name they are normalized to
+NICKNAMES = {
+    'alex': 'alexander',
+    'cam': 'cameron',
+    'chris': 'christopher',
+    'herb': 'herbert',
+    'jake': 'jacob',
+    'matt': 'matthew',
+    'mike': 'michael',
+    'mo': 'maurice',
+    'moe': 'maurice',
+    'nic': 'nicolas',
+    'nick': 'nicolas',
+    'nicholas': 'nicolas',
+    'patty': 'patrick',
+    'svi': 'sviatoslav',
+    'tim': 'timothy',
+}
+
+# team abbreviations that differ between sites, and the one they are normalized to
+TEAM_ALIASES = {
+    'BRK': 'BKN',
+    'GSW': 'GS',
+    'NOP': 'NO',
+    'NOR': 'NO',
+    'NYK': 'NY',
+    'PHX': 'PHO',
+    'SAS': 'SA',
+    'UTAH': 'UTA',
+    'WAS': 'WSH',
+}
+
+# least trigram similarity (Dice coefficient) of a fuzzy match, and how much better than the next candidate it must be
+MIN_SIMILARITY = 0.75
+MIN_MARGIN = 0.05
+# similarity added for the same NBA team and for a shared position, to break ties
+TEAM_BONUS = 0.1
+POS_BONUS = 0.05
+
+# how a name was resolved: its yahoo id (None if unresolved), the Yahoo name and the method used
+Resolution = namedtuple('Resolution', 'yahoo_id yahoo_name method')
+
+
+@entry_point
+def main():
+    parse_args(argparse.ArgumentParser())
+
+    projections = load_projections()
+
+    mapping = resolve_projections(projections)
+
+    print(mapping['method'].value_counts().to_string())
+
+
+@timed
+def resolve_projections(projections, save=True):
+    """
+    Resolve the names of Hashtag Basketball projections, giving their htb_name, yahoo_name, yahoo_id and method
+
+    Names already in id_mapping.csv keep their mapping. Newly resolved names are added to id_mapping.csv if save.
+    Names that could not be resolved are printed.
+
+    """
+    id_mapping = load_id_mapping() if os.path.exists('id_mapping.csv') else None
+
+    players = projections[['name', 'team', 'pos']].drop_duplicates('name')
+    names = players['name'].astype(str)
+
+    # names already in id_mapping, including hand corrections, are used as they are
+    known = {}
+
+    if id_mapping is not None:
+        for htb_name, yahoo_name, yahoo_id in id_mapping[['htb_name', 'yahoo_name', 'yahoo_id']].itertuples(index=False):
+            if pandas.notna(yahoo_id):
+                known[htb_name] = Resolution(int(yahoo_id), yahoo_name, 'mapping')
+
+    new = ~names.isin(known).values
+    resolutions = [known.get(name) for name in names]
+
+    if new.any():
+        index = PlayerIndex(known_players(id_mapping))
+
+        new_resolutions = iter(index.resolve_all(names[new], players['team'][new], players['pos'][new]))
+        resolutions = [resolution if resolution is not None else next(new_resolutions) for resolution in resolutions]
+
+    mapping = pandas.DataFrame({
+        'htb_name': names.values,
+        'yahoo_name': [resolution.yahoo_name for resolution in resolutions],
+        'yahoo_id': pandas.array([resolution.yahoo_id for resolution in resolutions], dtype='Int32'),
+        'method': [resolution.method for resolution in resolutions],
+    })
+
+    refuse_taken_ids(mapping, id_mapping)
+
+    for method, n in mapping['method'].value_counts().items():
+        increment(f"player ids {method}", n)
+
+    unresolved = mapping[mapping['yahoo_id'].isna()]
+
+    if len(unresolved):
+        print(f"Could not resolve {len(unresolved)} players to Yahoo ids:")
+        print(unresolved[['htb_name', 'method']].to_string(index=False))
+
+    fuzzy = mapping[mapping['method'] == 'fuzzy']
+
+    if len(fuzzy):
+        print(f"Matched {len(fuzzy)} players by similar names, add them to id_mapping.csv to confirm:")
+        print(fuzzy[['htb_name', 'yahoo_name', 'yahoo_id']].to_string(index=False))
+
+    learned = mapping[mapping['method'].isin(['exact', 'initial'])]
+
+    if save and len(learned):
+        save_mappings(id_mapping, learned)
+
+    return mapping
+
+
+def known_players(id_mapping=None):
+    """
+    Yahoo players with their ids and names, and their NBA team and position where known
+
+    Uses the Yahoo names in id_mapping, rosters.csv and yahoo_projections.csv, whichever exist.
+
+    """
+    frames = []
+
+    if id_mapping is not None:
+        frames.append(id_mapping.rename(columns={'yahoo_name': 'name'})[['yahoo_id', 'name']])
+
+    if os.path.exists('rosters.csv'):
+        rosters = load_rosters()
+        frames.append(rosters[[col for col in ['yahoo_id', 'name', 'nba_team', 'pos'] if col in rosters]])
+
+    if os.path.exists('yahoo_projections.csv'):
+        frames.append(load_yahoo_projections().rename(columns={'abbr_name': 'name'})[['yahoo_id', 'name']])
+
+    if not frames:
+        return pandas.DataFrame({'yahoo_id': pandas.Series(dtype=int), 'name': pandas.Series(dtype=str)})
+
+    players = pandas.concat([frame.astype({'name': str}) for frame in frames], ignore_index=True, sort=False)
+    players = players.dropna(subset=['yahoo_id', 'name'])
+
+    # keep the team and position of a player, if any source has them
+    return players.sort_values([col for col in ['nba_team', 'pos'] if col in players], na_position='last', kind='stable')
+
+
+def refuse_taken_ids(mapping, id_mapping):
+    """
+    Unresolve newly resolved names whose Yahoo id is already mapped to another name, in id_mapping or in mapping
+
+    A Yahoo id mapped twice would value the player twice. The names are printed and marked with the method 'taken', so
+    the right name can be mapped by hand.
+
+    """
+    learned = mapping['method'].isin(['exact', 'initial', 'fuzzy']).values
+
+    taken = set(id_mapping['yahoo_id'].dropna().astype(int)) if id_mapping is not None else set()
+    learned_ids = mapping.loc[learned, 'yahoo_id'].astype(int)
+    taken |= set(learned_ids[learned_ids.duplicated(keep=False)])
+
+    refused = learned & mapping['yahoo_id'].isin(taken).fillna(False).values
+
+    if refused.any():
+        print(f"Not mapping {refused.sum()} players to Yahoo ids already mapped to another name:")
+        print(mapping.loc[refused, ['htb_name', 'yahoo_name', 'yahoo_id']].to_string(index=False))
+
+        mapping.loc[refused, 'yahoo_id'] = pandas.NA
+        mapping.loc[refused, 'method'] = 'taken'
+
+
+def save_mappings(id_mapping, learned):
+    """
+    Add newly resolved names to id_mapping.csv
+
+    A name keeps a single row, the newest, which replaces any older row such as one left without a Yahoo id.
+
+    """
+    new_rows = learned[['htb_name', 'yahoo_name', 'yahoo_id']]
+
+    if id_mapping is not None:
+        new_rows = pandas.concat([id_mapping, new_rows], ignore_index=True)
+
+    new_rows = new_rows.drop_duplicates('htb_name', keep='last')
+
+    # loaders in other processes never see it half written
+    write_atomic('id_mapping.csv', new_rows.to_csv(index=False).encode('utf8'))
+
+
+class PlayerIndex:
+    """
+    Index of Yahoo players by normalized name, by first initial and last name, and by name trigrams
+
+    """
+    def __init__(self, players):
+        self.yahoo_ids = players['yahoo_id'].astype(int).values
+        self.names = players['name'].values
+        self.teams = normalize_teams(players['nba_team']) if 'nba_team' in players else [None] * len(players)
+        self.positions = [split_positions(pos) for pos in players['pos']] if 'pos' in players else [set()] * len(players)
+
+        self.by_name = defaultdict(list)
+        self.by_initial = defaultdict(list)
+        self.by_trigram = defaultdict(list)
+        self.n_trigrams = []
+
+        for i, name in enumerate(self.names):
+            key = normalize_name(name)
+
+            self.by_name[key].append(i)
+
+            # abbreviated names, such as "L James", are also indexed by first initial and last name
+            if re.match(r'[a-z] ', key):
+                self.by_initial[key].append(i)
+
+            grams = trigrams(key)
+            self.n_trigrams.append(len(grams))
+
+            for gram in grams:
+                self.by_trigram[gram].append(i)
+
+    def resolve_all(self, names, teams=None, positions=None):
+        """
+        Resolve each of names, optionally with the NBA team and positions of each, giving a list of Resolution
+
+        """
+        teams = normalize_teams(teams) if teams is not None else [None] * len(names)
+        positions = [split_positions(pos) for pos in positions] if positions is not None else [set()] * len(names)
+
+        return [self.resolve(name, team, pos) for name, team, pos in zip(names, teams, positions)]
+
+    def resolve(self, name, team=None, positions=frozenset()):
+        """
+        Resolve a name to a Resolution, trying exact, first initial and last name, then trigram matches
+
+        A name is only resolved if a single player is the best match.
+
+        """
+        key = normalize_name(name)
+
+        for method, matches in (('exact', self.by_name.get(key)), ('initial', self.by_initial.get(initial_key(key)))):
+            if matches:
+                best = self.best_match({i: 1.0 for i in matches}, team, positions, min_similarity=0)
+
+                if best is not None:
+                    return self.resolution(best, method)
+
+                return Resolution(None, None, 'ambiguous')
+
+        # Dice coefficient between the trigrams of name and of every player sharing one
+        grams = trigrams(key)
+        shared = Counter(i for gram in grams for i in set(self.by_trigram.get(gram, ())))
+        similarity = {i: 2 * count / (len(grams) + self.n_trigrams[i]) for i, count in shared.items()}
+
+        best = self.best_match(similarity, team, positions, MIN_SIMILARITY)
+
+        if best is not None:
+            return self.resolution(best, 'fuzzy')
+
+        return Resolution(None, None, 'ambiguous' if similarity and max(similarity.values()) >= MIN_SIMILARITY else 'unmatched')
+
+    def best_match(self, similarity, team, positions, min_similarity):
+        """
+        The player with the highest similarity plus team and position bonuses, None if there is no clear best
+
+        Entries of the same Yahoo id are the same player.
+
+        """
+        scores = {}
+
+        for i, score in similarity.items():
+            if score < min_similarity:
+                continue
+
+            if team is not None and self.teams[i] == team:
+                score += TEAM_BONUS
+
+            if positions & self.positions[i]:
+                score += POS_BONUS
+
+            yahoo_id = self.yahoo_ids[i]
+
+            if yahoo_id not in scores or score > scores[yahoo_id][0]:
+                scores[yahoo_id] = (score, i)
+
+        if not scores:
+            return None
+
+        ranked = sorted(scores.values(), reverse=True)
+
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < MIN_MARGIN:
+            return None
+
+        return ranked[0][1]
+
+    def resolution(self, i, method):
+        return Resolution(int(self.yahoo_ids[i]), self.names[i], method)
+
+
+def normalize_name(name):
+    """
+    Lowercase name without accents, punctuation or suffixes, and with nicknames replaced, e.g. "P.J. Tucker Jr." is
+    "pj tucker"
+
+    """
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii').lower()
+    name = re.sub(r"[.'`]", '', name)
+
+    tokens = [token for token in re.split(r'[^a-z0-9]+', name) if token and token not in SUFFIXES]
+
+    if tokens:
+        tokens[0] = NICKNAMES.get(tokens[0], tokens[0])
+
+    return ' '.join(tokens)
+
+
+def initial_key(key):
+    """
+    First initial and last name of a normalized name, to match abbreviated names such as "L James"
+
+    """
+    tokens = key.split(' ')
+
+    if len(tokens) < 2:
+        return key
+
+    return f"{tokens[0][0]} {' '.join(tokens[1:])}"
+
+
+def trigrams(key):
+    padded = f"  {key} "
+
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalize_teams(teams):
+    return [TEAM_ALIASES.get(str(team).upper(), str(team).upper()) if pandas.notna(team) else None for team in teams]
+
+
+def split_positions(positions):
+    if pandas.isna(positions):
+        return frozenset()
+
+    return frozenset(pos.strip().upper() for pos in str(positions).split(','))
+
+
+if __name__ == '__main__':
+    main()
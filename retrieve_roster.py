@@ -3,48 +3,118 @@ Use Yahoo API to get rosters for Monday (whether today or the next closest Monda
 
 """
 
+import argparse
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas
 from lxml import etree
 
+import historical_store
 from config import YAHOO_SPORT_ID, YAHOO_LEAGUE_ID, N_TEAMS
-from yahoo_util import get_yahoo_session
+from http_util import HTTP_CACHE
+from instrumentation import entry_point, parse_args, timed
+from yahoo_util import API_URL, NS, get_with_retries, get_yahoo_session
 
 
+# seconds that retrieved rosters are reused for with --cached, e.g. by the pipeline
+ROSTER_TTL = 60 * 60
+
+
+@entry_point
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--per-team", action="store_true", help="request each team's roster separately")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests when requesting per team")
+    parser.add_argument("--retries", type=int, default=3, help="retries of failed requests")
+    parser.add_argument(
+        "--cached", action="store_true", help=f"reuse rosters retrieved in the last {ROSTER_TTL // 60} minutes"
+    )
+    args = parse_args(parser)
+
+    # rosters change with every pickup or trade, so they are only reused when asked for
+    ttl = ROSTER_TTL if args.cached else 0
+
     monday = "{:%Y-%m-%d}".format(find_closest_monday())
 
     session = get_yahoo_session()
 
-    ns = {'f': 'http://fantasysports.yahooapis.com/fantasy/v2/base.rng'}
+    if args.per_team:
+        players = retrieve_team_rosters(session, monday, workers=args.workers, retries=args.retries, ttl=ttl)
+    else:
+        players = retrieve_rosters(session, monday, retries=args.retries, ttl=ttl)
+
+    rosters = pandas.DataFrame(players)
+
+    if len(rosters) == 0:
+        raise Exception('Failed to retrieve roster')
+    else:
+        rosters.to_csv('rosters.csv', encoding='utf8', index=False)
+        historical_store.append('rosters', monday, rosters)
+
+    HTTP_CACHE.report()
+
+
+@timed
+def retrieve_rosters(session, date, retries=3, ttl=0):
+    """
+    Get the rosters of all teams in one request to the teams collection, reusing a response younger than ttl seconds
+
+    """
+    # https://developer.yahoo.com/fantasysports/guide/#teams-collection
+    team_keys = ','.join(team_key(team_id) for team_id in range(1, N_TEAMS + 1))
+
+    r = get_with_retries(session, f"{API_URL}/teams;team_keys={team_keys}/roster;date={date}", ttl=ttl, retries=retries)
+
+    return parse_rosters(r.content)
+
 
+@timed
+def retrieve_team_rosters(session, date, workers=4, retries=3, ttl=0):
+    """
+    Get the roster of each team with a separate request, making up to workers requests at once and reusing responses
+    younger than ttl seconds
+
+    """
     # https://developer.yahoo.com/fantasysports/guide/#id47
+    def retrieve_team_roster(team_id):
+        r = get_with_retries(session, f"{API_URL}/team/{team_key(team_id)}/roster;date={date}", ttl=ttl, retries=retries)
 
-    players = []
+        return parse_rosters(r.content)
+
+    with ThreadPoolExecutor(workers) as executor:
+        team_players = list(executor.map(retrieve_team_roster, range(1, N_TEAMS + 1)))
 
-    base_url = "https://fantasysports.yahooapis.com/fantasy/v2/team/{sport_id}.l.{league_id}".format(sport_id=YAHOO_SPORT_ID, league_id=YAHOO_LEAGUE_ID)
-    url = base_url + ".t.{team_id}/roster;date={date}"
+    return [player for players in team_players for player in players]
 
-    for team_id in range(1, N_TEAMS + 1):
-        r = session.get(url.format(team_id=team_id, date=monday))
 
-        root = etree.fromstring(r.content)
+def team_key(team_id):
+    return f"{YAHOO_SPORT_ID}.l.{YAHOO_LEAGUE_ID}.t.{team_id}"
+
+
+@timed
+def parse_rosters(content):
+    """
+    Get the players of every team in a Yahoo API response
+
+    """
+    root = etree.fromstring(content)
 
-        for player in root.xpath("//f:player", namespaces=ns):
+    players = []
+
+    for team in root.xpath("//f:team", namespaces=NS):
+        team_id = int(team.findtext("f:team_id", namespaces=NS))
+
+        for player in team.xpath(".//f:player", namespaces=NS):
             players.append({
                 'team_id': team_id,
-                'yahoo_id': player.findtext("f:player_id", namespaces=ns),
-                'name': player.findtext("f:name/f:full", namespaces=ns).replace('.', '')
+                'yahoo_id': player.findtext("f:player_id", namespaces=NS),
+                'name': player.findtext("f:name/f:full", namespaces=NS).replace('.', ''),
+                'nba_team': player.findtext("f:editorial_team_abbr", namespaces=NS),
+                'pos': player.findtext("f:display_position", namespaces=NS),
             })
 
-    rosters = pandas.DataFrame(players)
-
-    if len(rosters) == 0:
-        raise Exception('Failed to retrieve roster')
-    else:
-        rosters.to_csv('rosters.csv', encoding='utf8', index=False)
-        rosters.to_csv('historical/rosters_{}.csv'.format(monday), encoding='utf8', index=False)
+    return players
 
 
 def find_closest_monday():
@@ -3,13 +3,22 @@ Retrieve the roto standings from Yahoo
 
 """
 
+import argparse
 import datetime
 
 import pandas
 from lxml import etree
 
+import historical_store
 from config import YAHOO_LEAGUE_ID, YAHOO_SPORT_ID 
-from yahoo_util import get_yahoo_session, NS
+from http_util import HTTP_CACHE
+from instrumentation import entry_point, parse_args, timed
+from yahoo_util import API_URL, NS, get_with_retries, get_yahoo_session
+
+
+# seconds that responses are reused for, league settings don't change during the season, standings only with --cached
+SETTINGS_TTL = 7 * 24 * 60 * 60
+STANDINGS_TTL = 60 * 60
 
 
 STATS_TYPES = {
@@ -26,10 +35,11 @@ STATS_TYPES = {
 }
 
 
+@timed
 def get_stats(session):
-    url = f'https://fantasysports.yahooapis.com/fantasy/v2/league/{YAHOO_SPORT_ID}.l.{YAHOO_LEAGUE_ID}/settings'
+    url = f'{API_URL}/league/{YAHOO_SPORT_ID}.l.{YAHOO_LEAGUE_ID}/settings'
 
-    r = session.get(url)
+    r = get_with_retries(session, url, ttl=SETTINGS_TTL)
 
     root = etree.fromstring(r.content)
 
@@ -43,10 +53,11 @@ def get_stats(session):
     return stats_mapping
 
 
-def get_standings(session, stats_mapping):
-    url = f'https://fantasysports.yahooapis.com/fantasy/v2/league/{YAHOO_SPORT_ID}.l.{YAHOO_LEAGUE_ID}/standings'
+@timed
+def get_standings(session, stats_mapping, ttl=0):
+    url = f'{API_URL}/league/{YAHOO_SPORT_ID}.l.{YAHOO_LEAGUE_ID}/standings'
 
-    r = session.get(url)
+    r = get_with_retries(session, url, ttl=ttl)
 
     root = etree.fromstring(r.content)
 
@@ -64,8 +75,10 @@ def get_standings(session, stats_mapping):
     
     standings = pandas.DataFrame(standings)
 
+    # leagues only have some of the stats
     for stat_name, value_type in STATS_TYPES.items():
-        standings[stat_name] =  standings[stat_name].astype(value_type)
+        if stat_name in standings:
+            standings[stat_name] = standings[stat_name].astype(value_type)
     
     fg = standings['fgm/a'].str.split('/', n=1, expand=True)
     standings['fgm'] = fg[0]
@@ -81,17 +94,26 @@ def get_standings(session, stats_mapping):
     return standings
 
 
+@entry_point
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--cached", action="store_true", help=f"reuse standings retrieved in the last {STANDINGS_TTL // 60} minutes"
+    )
+    args = parse_args(parser)
+
     session = get_yahoo_session()
 
     stats_mapping = get_stats(session)
 
-    standings = get_standings(session, stats_mapping)
+    standings = get_standings(session, stats_mapping, ttl=STANDINGS_TTL if args.cached else 0)
 
     today = datetime.datetime.today()
 
     standings.to_csv("standings.csv", encoding='utf8', index=False)
-    standings.to_csv("historical/standings_{:%Y-%m-%d}.csv".format(today), encoding='utf8', index=False)
+    historical_store.append('standings', today, standings)
+
+    HTTP_CACHE.report()
 
 
 if __name__ == '__main__':
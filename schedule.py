@@ -0,0 +1,207 @@
+"""
+Season schedule of every team as arrays of game counts
+
+schedule_{year}.csv gives the games of every team in every week and daily_schedule_{year}.csv, if there is one, the
+teams playing on every date. Schedule holds them as teams x weeks and teams x days arrays, with suffix sums along the
+weeks and days, so the games of any window of weeks or days, such as the rest of the season, take a subtraction.
+
+load_schedule builds the arrays once per process and caches them in CACHE_DIR as an .npz file until the CSVs change.
+Nothing depends on today's date: the first week left is given by an as-of date.
+
+"""
+import hashlib
+import io
+import math
+import os
+import re
+
+import numpy
+import pandas
+
+from instrumentation import increment, span
+from utils import CACHE_DIR, replace_cache_file
+
+
+# key and Schedule of the latest schedule of each year built in this process
+_schedules = {}
+
+
+class Schedule:
+    """
+    Games of every team in every scoring week and on every day of the season
+
+    weekly is a teams x weeks array, column 0 being week 1. daily is a teams x days array over days, which may be
+    empty if there is no daily schedule.
+
+    """
+    def __init__(self, teams, weekly, days, daily):
+        self.teams = numpy.asarray(teams, dtype=str)
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.weekly = weekly
+        self.days = pandas.DatetimeIndex(days)
+        self.daily = daily
+
+        # games from each week (day) to the end of the season, with a column of zeros after the last
+        self.weekly_left = suffix_sums(weekly)
+        self.daily_left = suffix_sums(daily)
+
+    @property
+    def n_weeks(self):
+        return self.weekly.shape[1]
+
+    def games(self, first_week, last_week):
+        """
+        Games of every team from first_week to last_week, inclusive
+
+        """
+        first_week = min(max(first_week, 1), self.n_weeks + 1)
+        last_week = min(max(last_week, first_week - 1), self.n_weeks)
+
+        return self.weekly_left[:, first_week - 1] - self.weekly_left[:, last_week]
+
+    def day_games(self, start, end=None):
+        """
+        Games of every team from start to end (default the last day), inclusive
+
+        """
+        first = self.days.searchsorted(pandas.Timestamp(start).normalize())
+        last = len(self.days) if end is None else self.days.searchsorted(pandas.Timestamp(end), side='right')
+
+        return self.daily_left[:, first] - self.daily_left[:, max(first, last)]
+
+    def weekly_frame(self, last_week, as_of, season_start):
+        """
+        Games of every team in every week as in schedule_{year}.csv, with the games from the week after as_of to
+        last_week as 'ros'
+
+        """
+        schedule = pandas.DataFrame(self.weekly, columns=[f"W{i}" for i in range(1, self.n_weeks + 1)])
+        schedule.insert(0, 'team', self.teams)
+        schedule['ros'] = self.games(next_week(as_of, season_start), last_week)
+
+        return schedule
+
+    def game_days(self, teams, start, end=None):
+        """
+        Days from start to the last game up to end (default the last day), inclusive, and a players x days boolean array
+        of whether the team of each player plays on each day
+
+        """
+        # games on the day of start count if start is midnight, as with a date
+        start = pandas.Timestamp(start)
+        played = self.days[self.daily.any(axis=0)]
+        played = played[played >= start]
+
+        if end is not None:
+            played = played[played <= pandas.Timestamp(end)]
+
+        days = pandas.date_range(start.normalize(), played.max()) if len(played) else pandas.DatetimeIndex([])
+
+        # teams without a schedule get the extra row of zeros
+        rows = numpy.array([self.team_index.get(team, len(self.teams)) for team in numpy.asarray(teams, dtype=str)], dtype=int)
+        team_plays = numpy.vstack([self.daily > 0, numpy.zeros((1, self.daily.shape[1]), dtype=bool)])[rows]
+
+        # days before the schedule starts, or before start, have no games
+        columns = numpy.where(days >= start, self.days.get_indexer(days), -1)
+        plays = numpy.zeros((len(rows), len(days)), dtype=bool)
+        plays[:, columns >= 0] = team_plays[:, columns[columns >= 0]]
+
+        return days, plays
+
+
+def next_week(as_of, season_start):
+    """
+    First scoring week left as of a date, weeks starting on the Monday season_start
+
+    A week is left if as_of is on or before its first day. Every week is left before the season starts.
+
+    """
+    return max(1, int(math.ceil((pandas.Timestamp(as_of) - pandas.Timestamp(season_start)).days / 7.0) + 1))
+
+
+def suffix_sums(values):
+    """
+    Sums of a rows x columns array from each column to the last, with an extra column of zeros
+
+    """
+    left = numpy.zeros((values.shape[0], values.shape[1] + 1), dtype=numpy.int64)
+    left[:, :-1] = numpy.cumsum(values[:, ::-1], axis=1)[:, ::-1]
+
+    return left
+
+
+def load_schedule(year):
+    """
+    Schedule of the season starting in year, from schedule_{year}.csv and daily_schedule_{year}.csv
+
+    """
+    paths = [path for path in [f"schedule_{year}.csv", f"daily_schedule_{year}.csv"] if os.path.exists(path)]
+    stamps = [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths]
+    key = hashlib.sha256(repr(('schedule', stamps)).encode('utf-8')).hexdigest()[:16]
+
+    if _schedules.get(year, (None,))[0] != key:
+        cache_path = os.path.join(CACHE_DIR, f"schedule-{key}.npz")
+
+        try:
+            with numpy.load(cache_path) as arrays:
+                schedule = Schedule(arrays['teams'], arrays['weekly'], arrays['days'], arrays['daily'])
+
+            increment('loader disk cache hits')
+        except FileNotFoundError:
+            increment('loader cache misses')
+
+            with span('load_schedule'):
+                schedule = read_schedule(year)
+
+            content = io.BytesIO()
+            numpy.savez(
+                content, teams=schedule.teams, weekly=schedule.weekly,
+                days=schedule.days.values.astype('datetime64[D]'), daily=schedule.daily
+            )
+
+            # only keep the latest version of the schedule
+            replace_cache_file(cache_path, content.getvalue(), 'schedule-*.npz')
+
+        _schedules[year] = (key, schedule)
+
+    return _schedules[year][1]
+
+
+def read_schedule(year):
+    """
+    Build the Schedule of the season starting in year from its CSVs
+
+    Teams of the daily schedule that are not in the weekly one are added with no weekly games.
+
+    """
+    weekly = pandas.read_csv(f"schedule_{year}.csv")
+    weekly['team'] = weekly['team'].astype(str)
+
+    # columns W1, W2, ... in week order, missing weeks have no games
+    week_columns = {int(match.group(1)): col for col in weekly for match in [re.fullmatch(r'W(\d+)', col)] if match}
+    n_weeks = max(week_columns, default=0)
+    games = numpy.zeros((len(weekly), n_weeks), dtype=numpy.int64)
+
+    for week, col in week_columns.items():
+        games[:, week - 1] = weekly[col].fillna(0).values
+
+    teams = list(weekly['team'])
+
+    if os.path.exists(f"daily_schedule_{year}.csv"):
+        daily_schedule = pandas.read_csv(f"daily_schedule_{year}.csv", parse_dates=['date'])
+        daily_schedule['team'] = daily_schedule['team'].astype(str)
+
+        teams += sorted(set(daily_schedule['team']) - set(teams))
+        games = numpy.vstack([games, numpy.zeros((len(teams) - len(games), n_weeks), dtype=numpy.int64)])
+
+        days = pandas.date_range(daily_schedule['date'].min().normalize(), daily_schedule['date'].max().normalize())
+        rows = pandas.Index(teams).get_indexer(daily_schedule['team'])
+        columns = (daily_schedule['date'].dt.normalize() - days[0]).dt.days.values
+
+        daily = numpy.zeros((len(teams), len(days)), dtype=numpy.int64)
+        numpy.add.at(daily, (rows, columns), 1)
+    else:
+        days = pandas.DatetimeIndex([])
+        daily = numpy.zeros((len(teams), 0), dtype=numpy.int64)
+
+    return Schedule(teams, games, days, daily)
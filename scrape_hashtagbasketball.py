@@ -3,26 +3,52 @@ Scrape projections from Hashtag Basketball
 
 """
 
+import argparse
+from array import array
+
 import datefinder
+import lxml.etree
 import lxml.html
+import numpy
 import pandas
 import requests
 
 
 from datetime import datetime
 
+import historical_store
+from http_util import HTTP_CACHE
+from instrumentation import entry_point, parse_args, timed
+
+
+# seconds that the projections page is reused for, projections are updated about daily
+PROJECTIONS_TTL = 6 * 60 * 60
+
+PROJECTIONS_TABLE_ID = 'ContentPlaceHolder1_GridView1'
+# bytes of the page fed to the parser at a time
+CHUNK_SIZE = 64 * 1024
 
+# columns kept as text, other columns are numbers
+TEXT_COLUMNS = ['player', 'pos', 'team']
+INT_COLUMNS = ['r#', 'gp']
+# columns with the made / attempted fraction below the %
+FRACTION_COLUMNS = {'fg%': ('fgm', 'fga'), 'ft%': ('ftm', 'fta')}
+
+
+@entry_point
 def main():
-    projections_page = download_projections_page()
+    parse_args(argparse.ArgumentParser())
 
-    root = lxml.html.fromstring(projections_page)  # parse HTML
+    response = download_projections_page()
 
-    projections = extract_projections(root)
+    projections, updated_at_text = stream_projections(response.iter_content(CHUNK_SIZE))
 
-    updated_at_string = "{:%Y-%m-%d}".format(extract_updated_at(root))
+    updated_at_string = "{:%Y-%m-%d}".format(parse_updated_at(updated_at_text))
 
     projections.to_csv("projections.csv", encoding='utf8', index=False)
-    projections.to_csv("historical/projections_{}.csv".format(updated_at_string), encoding='utf8', index=False)
+    historical_store.append('projections', updated_at_string, projections)
+
+    HTTP_CACHE.report()
 
 
 def download_projections_page():
@@ -30,15 +56,154 @@ def download_projections_page():
     Download projections HTML page from Hashtag Basketball
 
     """
-    r = requests.get('https://hashtagbasketball.com/fantasy-basketball-projections')
+    return HTTP_CACHE.get(requests.Session(), 'https://hashtagbasketball.com/fantasy-basketball-projections', ttl=PROJECTIONS_TTL)
+
+
+@timed
+def stream_projections(chunks):
+    """
+    Extract the projections and the last updated text from chunks of the projections page as they are parsed
+
+    Rows of the projections table are read as soon as they are parsed, into a column buffer per stat, and then removed
+    from the tree along with everything else already read, so memory does not grow with the size of the page.
+
+    """
+    # only rows, the table and the last updated text need to be looked at
+    parser = lxml.etree.HTMLPullParser(events=('end',), tag=('tr', 'table', 'small'))
+    table = ProjectionsTable()
+    updated_at_text = None
+
+    for chunk in chunks:
+        parser.feed(chunk)
+
+        for _, element in parser.read_events():
+            if element.tag == 'tr':
+                if not in_projections_table(element):
+                    continue
+
+                table.add_row(element)
+            elif element.tag == 'small' and is_updated_at(element):
+                updated_at_text = ''.join(element.itertext())
 
-    return r.text
+            element.clear(keep_tail=True)
+
+            # drop rows before this one that are already read
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+    parser.close()
+
+    return table.to_frame(), updated_at_text
+
+
+def in_projections_table(row):
+    parent = row.getparent()
+
+    if parent is not None and parent.tag in ('tbody', 'thead'):
+        parent = parent.getparent()
+
+    return parent is not None and parent.get('id') == PROJECTIONS_TABLE_ID
+
+
+def is_updated_at(element):
+    """
+    Whether element is the #form1 > section > div > div.heading-pricing > span > small element with the last updated date
+
+    """
+    span = element.getparent()
+    div = span.getparent() if span is not None else None
+
+    return span is not None and span.tag == 'span' and div is not None and 'heading-pricing' in div.get('class', '').split()
+
+
+class ProjectionsTable:
+    """
+    Column buffers of the rows of the projections table, numbers stored as doubles
+
+    """
+    def __init__(self):
+        self.columns = None
+        self.buffers = {}
+
+    def add_row(self, row):
+        cells = [cell for cell in row if cell.tag in ('th', 'td')]
+
+        # the header is repeated throughout the table
+        if self.columns is None:
+            if cells and all(cell.tag == 'th' for cell in cells):
+                self.columns = [''.join(cell.itertext()).strip().lower() for cell in cells]
+
+                for col in self.columns:
+                    self.buffers[col] = [] if col in TEXT_COLUMNS else array('d')
+
+                for made, attempts in FRACTION_COLUMNS.values():
+                    self.buffers[made] = array('d')
+                    self.buffers[attempts] = array('d')
+
+            return
+
+        if not cells or cells[0].tag == 'th' or ''.join(cells[0].itertext()).strip() == 'R#':
+            return
+
+        for cell, col in zip(cells, self.columns):
+            contents = ''.join(cell.itertext()).strip().split('\n')
+
+            if col in TEXT_COLUMNS:
+                self.buffers[col].append(contents[0].strip())
+            else:
+                self.buffers[col].append(to_number(contents[0]))
+
+            if col in FRACTION_COLUMNS:
+                made, attempts = FRACTION_COLUMNS[col]
+                fraction_parts = contents[-1].strip().strip('()').split('/')
+
+                self.buffers[made].append(to_number(fraction_parts[0]))
+                self.buffers[attempts].append(to_number(fraction_parts[-1]))
+
+    def to_frame(self):
+        """
+        The projections, with columns in the same order as extract_projections
+
+        """
+        if self.columns is None:
+            return pandas.DataFrame()
+
+        columns = {}
+
+        for col in self.columns:
+            if col in TEXT_COLUMNS:
+                columns[col] = self.buffers[col]
+            elif col in INT_COLUMNS and numpy.all(numpy.mod(numpy.frombuffer(self.buffers[col]), 1) == 0):
+                columns[col] = numpy.frombuffer(self.buffers[col]).astype(int)
+            else:
+                columns[col] = numpy.frombuffer(self.buffers[col])
+
+            if col in FRACTION_COLUMNS:
+                for part in FRACTION_COLUMNS[col]:
+                    columns[part] = numpy.frombuffer(self.buffers[part])
+
+        projections = pandas.DataFrame(columns)
+
+        projections = projections.rename(columns={'player': 'name'})  # rename the 'player' column to 'name'
+
+        projections['name'] = projections['name'].str.replace('.', '')  # take out any periods in a player name
+
+        return projections
+
+
+def to_number(text):
+    try:
+        return float(text.strip().replace(',', ''))
+    except ValueError:
+        return numpy.nan
 
 
 def extract_projections(root):
     """
     Given parsed HTML of projections page, extract the projections
 
+    This walks a tree of the whole page, stream_projections reads the page as it is parsed instead.
+
     """
     players = []
 
@@ -90,7 +255,15 @@ def extract_updated_at(root):
     """
     updated_at_html = root.cssselect('#form1 > section > div > div.heading-pricing > span > small')
 
-    possible_dates = datefinder.find_dates(updated_at_html[0].text_content().split('by')[0].strip().replace('Last updated: ', ''))
+    return parse_updated_at(updated_at_html[0].text_content())
+
+
+def parse_updated_at(text):
+    """
+    Parse the date out of the last updated text of the projections page
+
+    """
+    possible_dates = datefinder.find_dates(text.split('by')[0].strip().replace('Last updated: ', ''))
 
     updated_at_datetime = next(possible_dates)
 
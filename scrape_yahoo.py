@@ -4,20 +4,45 @@ Scrape player projections from Yahoo
 """
 import argparse
 import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import lxml.html
+import numpy
 import pandas
 import requests
-import time
+from lxml.cssselect import CSSSelector
 
+import historical_store
 from config import YAHOO_COOKIE_STRING, YAHOO_LEAGUE_ID, YAHOO_STATS_TRANSLATION
+from http_util import HTTP_CACHE, TokenBucket
+from instrumentation import entry_point, increment, parse_args, timed
 
 
+# players per page of the player list
+PAGE_SIZE = 25
+# seconds that downloaded pages are reused for
+PAGE_TTL = 6 * 60 * 60
+
+# selectors are compiled once and reused for every page and row
+HEADER_ROW = CSSSelector('div.players thead tr.Last')
+PLAYER_ROWS = CSSSelector('div.players tbody tr')
+PLAYER_LINK = CSSSelector('.ysf-player-name a')
+
+# stats that aren't numbers, e.g. minutes per game as mm:ss
+TEXT_STATS = ['mpg']
+
+
+@entry_point
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--ros", action="store_true", help="only scrape rest of season projections")
     parser.add_argument("--l14pt", action="store_true", help="only scrape recent stats in the past 14 days")
-    args = parser.parse_args()
+    parser.add_argument("--rate", type=float, default=1, help="requests per second to Yahoo")
+    parser.add_argument("--burst", type=int, default=2, help="requests allowed at once before rate limiting")
+    parser.add_argument("--max-players", type=int, help="stop after this many players of each list")
+    args = parse_args(parser)
 
     today = datetime.datetime.today()
 
@@ -26,70 +51,164 @@ def main():
         'cookie': YAHOO_COOKIE_STRING,
     })
 
+    # be respectful of possible rate limits, across both lists
+    limiter = TokenBucket(args.rate, args.burst)
+
+    outputs = []
+
     if not args.l14pt:
         # PSR = rest of season projections
-        projections = scrape_yahoo_player_list(yahoo_session, 'PSR')
-
-        projections.to_csv("yahoo_projections.csv", encoding='utf8', index=False)
-        projections.to_csv("historical/yahoo_projections_{:%Y-%m-%d}.csv".format(today), encoding='utf8', index=False)
+        outputs.append(('PSR', 'yahoo_projections'))
 
     if not args.ros:
         # AL14 = last 14 days
-        playing_time = scrape_yahoo_player_list(yahoo_session, 'AL14')
+        outputs.append(('AL14', 'yahoo_playing_time'))
+
+    with ThreadPoolExecutor(len(outputs)) as executor:
+        futures = [
+            executor.submit(scrape_yahoo_player_list, yahoo_session, list_code, limiter, args.max_players)
+            for list_code, _ in outputs
+        ]
+
+        for (_, file_name), future in zip(outputs, futures):
+            players = future.result()
+
+            players.to_csv(f"{file_name}.csv", encoding='utf8', index=False)
+            historical_store.append(file_name, today, players)
 
-        playing_time.to_csv("yahoo_playing_time.csv", encoding='utf8', index=False)
-        playing_time.to_csv("historical/yahoo_playing_time_{:%Y-%m-%d}.csv".format(today), encoding='utf8', index=False)
+    HTTP_CACHE.report()
 
 
-def scrape_yahoo_player_list(session, list_code):
+@timed
+def scrape_yahoo_player_list(session, list_code, limiter, total_players=None, prefetch=4):
     """
     On Yahoo, the player projections are paginated to 25 players at a time. Loop over the pages.
 
+    Up to prefetch pages are downloaded ahead on a thread pool while earlier pages are parsed. The list ends at the
+    first page with fewer than 25 players, or after total_players players if that is known. A failed download or a page
+    without the player table (e.g. a login or error page) raises rather than ending the list early.
+
     """
-    # initialize loop
-    players = []
-    count = 0
+    pages = []
+    # set once the list ends, so that pages downloaded ahead aren't requested any more
+    stop = threading.Event()
 
-    get_next = True
+    with ThreadPoolExecutor(prefetch) as executor:
+        pending = deque()
+        next_count = 0
 
-    while get_next:
-        print(count)
+        try:
+            while True:
+                while len(pending) < prefetch and (total_players is None or next_count < total_players):
+                    pending.append((next_count, executor.submit(
+                        download_player_page, session, list_code, next_count, limiter, stop
+                    )))
+                    next_count += PAGE_SIZE
 
-        x = session.get(f"https://basketball.fantasysports.yahoo.com/nba/{YAHOO_LEAGUE_ID}/players?&sort=AR&sdir=1&status=ALL&pos=P&stat1=S_{list_code}&jsenabled=0&count={count}")
+                if not pending:
+                    break
 
-        root = lxml.html.fromstring(x.content)
+                count, future = pending.popleft()
+                print(list_code, count)
 
-        # maps from column number to stat
-        header_index = parse_table_header(YAHOO_STATS_TRANSLATION, root)
+                page = parse_player_page(future.result())
+                pages.append(page)
 
-        # take all the table rows that represent players
-        player_table_rows = root.cssselect('div.players tbody tr')
+                if len(page['yahoo_id']) < PAGE_SIZE:
+                    break
+        finally:
+            stop.set()
 
-        # loop over the player table rows to extract the projections player by player
-        for player_tr in player_table_rows:
-            player = {}
+            for _, future in pending:
+                future.cancel()
 
-            player['abbr_name'] = player_tr.cssselect('.ysf-player-name a')[0].text_content()
+    pages = [page for page in pages if len(page['yahoo_id'])]
 
-            player['yahoo_id'] = player_tr.cssselect('.ysf-player-name a')[0].get('href').split('/')[-1]
+    if not pages:
+        return pandas.DataFrame()
 
-            for index, stat in header_index.items():
-                player[stat] = player_tr.cssselect('td')[index].text_content()
+    projections = pandas.DataFrame({column: numpy.concatenate([page[column] for page in pages]) for column in pages[0]})
 
-            players.append(player)
+    return projections.head(total_players) if total_players is not None else projections
 
-        # check if the "next page" text links to the next page
-        # if not, end while loop
-        if not root.cssselect('ul#playerspagenav1 li')[1].getchildren():
-            get_next = False
-        else:
-            count += 25
 
-        time.sleep(1)  # be respectful of possible rate limits
+def download_player_page(session, list_code, count, limiter, stop=None):
+    """
+    Download the page of the player list starting at player number count
+
+    Returns None without downloading if stop is set by the time the limiter allows the request. Raises
+    requests.HTTPError for an error response and ValueError for a page without the player table, neither of which is
+    cached.
+
+    """
+    limiter.acquire()
+
+    if stop is not None and stop.is_set():
+        return None
+
+    increment(f"yahoo pages {list_code}")
+
+    r = HTTP_CACHE.get(session, f"https://basketball.fantasysports.yahoo.com/nba/{YAHOO_LEAGUE_ID}/players?&sort=AR&sdir=1&status=ALL&pos=P&stat1=S_{list_code}&jsenabled=0&count={count}", ttl=PAGE_TTL, validate=check_player_page)
+    r.raise_for_status()
+
+    return r.content
 
-    projections = pandas.DataFrame(players)
 
-    return projections
+def check_player_page(r):
+    """
+    Raise ValueError if a downloaded page has no player table, so that it isn't cached
+
+    """
+    if not HEADER_ROW(lxml.html.fromstring(r.content)):
+        raise ValueError("page has no player table")
+
+
+@timed
+def parse_player_page(content):
+    """
+    Extract the players from a page of the player list as a dict of column arrays
+
+    Each row's cells are read in a single pass. Stats are converted to numbers, with missing stats ('-') as NaN,
+    except for TEXT_STATS. Raises ValueError if the page has no player table.
+
+    """
+    root = lxml.html.fromstring(content)
+
+    # e.g. a login or error page, which must not be taken for the end of the list
+    if not HEADER_ROW(root):
+        raise ValueError("page has no player table")
+
+    # maps from column number to stat
+    header_index = parse_table_header(YAHOO_STATS_TRANSLATION, root)
+
+    names = []
+    yahoo_ids = []
+    stats = {stat: [] for stat in header_index.values()}
+
+    # take all the table rows that represent players
+    for player_tr in PLAYER_ROWS(root):
+        player_link = PLAYER_LINK(player_tr)[0]
+
+        names.append(player_link.text_content())
+        yahoo_ids.append(player_link.get('href').rsplit('/', 1)[-1])
+
+        cells = player_tr.findall('td')
+
+        for index, stat in header_index.items():
+            stats[stat].append(cells[index].text_content())
+
+    columns = {
+        'abbr_name': numpy.array(names, dtype=object),
+        'yahoo_id': numpy.array(yahoo_ids, dtype=int),
+    }
+
+    for stat, values in stats.items():
+        if stat in TEXT_STATS:
+            columns[stat] = numpy.array(values, dtype=object)
+        else:
+            columns[stat] = pandas.to_numeric(numpy.array(values, dtype=object), errors='coerce').astype(float)
+
+    return columns
 
 
 def parse_table_header(stats_translation, root):
@@ -101,9 +220,9 @@ def parse_table_header(stats_translation, root):
     """
     header_index = {}
     
-    header_row = root.cssselect('div.players thead tr.Last')[0]
+    header_row = HEADER_ROW(root)[0]
     
-    for i, header_cell in enumerate(header_row.cssselect('th')):
+    for i, header_cell in enumerate(header_row.findall('th')):
         text = header_cell.text_content()
         if text in stats_translation.keys():
             header_index[i] = stats_translation[text]
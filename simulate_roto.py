@@ -0,0 +1,175 @@
+"""
+Monte Carlo simulation of the rest of season for roto final standings
+
+Samples every player's games played and stats for thousands of seasons at once, then ranks the teams in every simulated
+season.
+
+"""
+import argparse
+import functools
+
+import numpy
+import pandas
+
+from instrumentation import entry_point, parse_args
+from calc_roto import (
+    RATIO_STATS_PARTS, STATS, SwapEngine, calc_final_standings, calc_final_values, calc_rank_values, calc_ros_values,
+    load_league, optimize_roster
+)
+from categories import ROTO
+
+
+# made shots are sampled from the sampled attempts, which are the denominators that are not categories
+MADE_ATTEMPTS = {
+    category.numerator: category.denominator for category in ROTO.ratios if category.denominator in RATIO_STATS_PARTS
+}
+
+
+@entry_point
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sims", type=int, default=10000, help="number of simulated seasons")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--optimize", action="store_true", help="run roster optimizer scored by simulated seasons")
+    parser.add_argument("--optimize-sims", type=int, default=1000, help="number of simulated seasons per swap")
+    parser.add_argument("--jobs", type=int, default=1, help="number of processes for the roster optimizer")
+    args = parse_args(parser)
+
+    ros, standings = load_league()
+
+    final_standings = calc_final_standings(standings, ros)
+    ros_values = calc_ros_values(final_standings, ros)
+
+    engine = SwapEngine(standings, ros_values.reset_index(drop=True))
+    simulator = SeasonSimulator(engine, n_sims=args.sims, seed=args.seed)
+
+    print(simulator.standings_distribution().to_string(index=False, float_format='%.3f'))
+
+    if args.optimize:
+        simulate = functools.partial(SeasonSimulator, n_sims=args.optimize_sims, seed=args.seed, include_free_agents=True)
+
+        optimize_roster(ros_values, standings, jobs=args.jobs, simulate=simulate)
+
+
+class SeasonSimulator:
+    """
+    Rest of season totals of every rostered player sampled for n_sims seasons
+
+    The samples stay fixed, so different rosters are compared on the same simulated seasons. Free agents are only
+    sampled if include_free_agents, which is needed to simulate swaps with them.
+
+    """
+    def __init__(self, engine, n_sims=10000, seed=0, include_free_agents=False):
+        self.engine = engine
+
+        if include_free_agents:
+            rows = numpy.arange(engine.empty_row)
+        else:
+            rows = numpy.concatenate(engine.rosters)
+
+        # column of each projections row in the samples, the last column is all zeros for the empty row
+        self.columns = numpy.full(engine.empty_row + 1, len(rows))
+        self.columns[rows] = numpy.arange(len(rows))
+
+        rng = numpy.random.default_rng(seed)
+        samples = sample_player_totals(engine.stats[rows], engine.gtp[rows], engine.max_games, n_sims, rng)
+        self.samples = numpy.concatenate([samples, numpy.zeros((n_sims, 1, len(STATS)), dtype=samples.dtype)], axis=1)
+
+        # sims x teams arrays
+        self.ros = self.roster_totals(engine.pad_rosters(engine.rosters))
+        self.ranks = calc_rank_values(calc_final_values(engine.base + self.ros))
+
+    def roster_totals(self, rosters):
+        """
+        Sims x rosters x STATS array of the simulated totals of a rosters x players array of projections rows
+
+        """
+        w = self.engine.roster_weights(rosters)
+
+        return numpy.einsum('rp,srpc->src', w, self.samples[:, self.columns[rosters]])
+
+    def standings_distribution(self):
+        """
+        Expected roto points and probability of each final position for every team
+
+        """
+        points = self.ranks[..., -1]
+        n_teams = points.shape[1]
+
+        # 1 + number of teams with more points, in every simulated season
+        positions = 1 + (points[:, numpy.newaxis, :] > points[:, :, numpy.newaxis]).sum(axis=2)
+
+        distribution = pandas.DataFrame({
+            'team_id': self.engine.team_ids,
+            'points': points.mean(axis=0),
+            'position': positions.mean(axis=0),
+        })
+
+        p_positions = (positions[..., numpy.newaxis] == numpy.arange(1, n_teams + 1)).mean(axis=0)
+
+        for i in range(n_teams):
+            distribution[f"p_{i + 1}"] = p_positions[:, i]
+
+        return distribution
+
+    def swap_many(self, team, drop_row, add_rows, chunk_size=16):
+        """
+        Simulated expected roto points and probability of finishing first for a team after it drops drop_row and adds
+        each of add_rows
+
+        Same arguments as SwapEngine.swap_many. The swaps are simulated chunk_size at a time to bound memory.
+
+        """
+        rosters = self.engine.swap_rosters(team, drop_row, add_rows)
+
+        points = []
+        p_first = []
+
+        for start in range(0, len(rosters), chunk_size):
+            chunk = rosters[start:start + chunk_size]
+
+            ros = numpy.repeat(self.ros[:, numpy.newaxis], len(chunk), axis=1)
+            ros[:, :, team] = self.roster_totals(chunk)
+
+            # sims x swaps x teams
+            team_points = calc_rank_values(calc_final_values(self.engine.base + ros))[..., -1]
+            my_points = team_points[..., team]
+
+            points.append(my_points.mean(axis=0))
+            p_first.append((team_points <= my_points[..., numpy.newaxis]).all(axis=-1).mean(axis=0))
+
+        return numpy.concatenate(points), numpy.concatenate(p_first)
+
+
+def sample_player_totals(stats, gtp, max_games, n_sims, rng):
+    """
+    Sample rest of season totals of players for n_sims seasons, giving a sims x players x STATS array
+
+    Each player plays each of the max_games remaining games with probability gtp / max_games. Given the games played,
+    counting stats and shot attempts are Poisson with the projected per game rates and made shots are binomial on the
+    attempts with the projected %.
+
+    """
+    gtp = numpy.nan_to_num(gtp)
+
+    games = rng.binomial(int(round(max_games)), numpy.clip(gtp / max_games, 0, 1), size=(n_sims, len(gtp)))
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        rates = numpy.where(gtp[:, numpy.newaxis] > 0, stats / gtp[:, numpy.newaxis], 0)
+
+    samples = rng.poisson(games[..., numpy.newaxis] * rates).astype(numpy.float32)
+
+    for made, attempts in MADE_ATTEMPTS.items():
+        m = STATS.index(made)
+        a = STATS.index(attempts)
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            pct = numpy.clip(numpy.where(stats[:, a] > 0, stats[:, m] / stats[:, a], 0), 0, 1)
+
+        samples[..., m] = rng.binomial(samples[..., a].astype(int), pct)
+
+    return samples
+
+
+if __name__ == '__main__':
+    main()
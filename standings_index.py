@@ -0,0 +1,90 @@
+"""
+Sorted index of the teams' totals in each category, to find how close teams are to gaining or losing roto points
+
+"""
+import numpy
+
+
+class StandingsIndex:
+    """
+    Every category's team totals kept in sorted order
+
+    values is a teams x categories array and signs is 1 for categories where more is better and -1 where less is better
+    (turnovers). A team's position in a category is found by binary search, so queries for a team, or for hypothetical
+    totals of a team, take O(log teams) per category.
+
+    """
+    def __init__(self, values, signs):
+        self.signs = numpy.asarray(signs, dtype=float)
+        self.values = numpy.array(values, dtype=float) * self.signs
+
+        # categories x teams
+        self.sorted = numpy.sort(self.values, axis=0).T.copy()
+
+    def search(self, team, values=None):
+        """
+        Signed totals of a team as in counts, the counts themselves and the position of the team's current total in
+        each sorted column
+
+        The columns are searched with the team's own total in them, and the counts corrected for it, so the other teams'
+        totals are never copied out.
+
+        """
+        values = self.values[team] if values is None else numpy.asarray(values, dtype=float) * self.signs
+
+        below = numpy.empty(values.shape, dtype=int)
+        tied = numpy.empty(values.shape, dtype=int)
+        own = numpy.empty(len(self.sorted), dtype=int)
+
+        for c, column in enumerate(self.sorted):
+            left = numpy.searchsorted(column, values[..., c], side='left')
+            below[..., c] = left
+            tied[..., c] = numpy.searchsorted(column, values[..., c], side='right') - left
+            own[c] = numpy.searchsorted(column, self.values[team, c], side='left')
+
+        # leave out the team's own total
+        mine = self.values[team]
+
+        return values, below - (mine < values), tied - (mine == values), own
+
+    def counts(self, team, values=None):
+        """
+        Number of other teams below and tied with a team in each category, for its current totals or for a moves x
+        categories array of hypothetical totals
+
+        """
+        _, below, tied, _ = self.search(team, values)
+
+        return below, tied
+
+    def buffer(self, team, values=None):
+        """
+        % that a team is ahead of the team ranked just below it in each category, like calc_roto.calc_buffer, for its
+        current totals or for hypothetical totals as in counts
+
+        As in calc_buffer, the team ranked just below is found from the team's average rank, and a team ranked first
+        is compared with the highest total.
+
+        """
+        values, below, tied, own = self.search(team, values)
+
+        n_teams = self.sorted.shape[1]
+        categories = numpy.arange(len(self.sorted))
+
+        def other(position):
+            # total at a position in the sorted totals of the other teams, skipping the team's own
+            return self.sorted[categories, position + (position >= own)]
+
+        # position in the sorted totals of all teams, including the team itself
+        position = (below + tied / 2 - 1).astype(int)
+        position = numpy.where(position < 0, position + n_teams, position)
+
+        # positions before the team's tie group are other teams, positions after it are shifted by the team itself
+        other_value = other(numpy.clip(numpy.where(position > below + tied, position - 1, position), 0, n_teams - 2))
+        behind_values = numpy.where((position >= below) & (position <= below + tied), values, other_value)
+
+        # the highest total may be the team's own
+        top = numpy.maximum(other(numpy.full(len(self.sorted), n_teams - 2)), values)
+        behind_values = numpy.where(position == n_teams - 1, top, behind_values)
+
+        return numpy.abs(1 - behind_values / values)
@@ -0,0 +1,471 @@
+"""
+Generate a synthetic league: every input CSV of calc_roto and calc_h2h_points, and a config.py, for a league of any size
+
+Players get per game projections that scale with their minutes, the best ones are drafted onto the teams and the rest
+are free agents. Standings are the rostered players' stats over the weeks already played. The files have the columns
+and formats written by the scrapers, so the scripts run on a generated league as on a real one.
+
+Run this module to generate a league into a directory, then run the scripts from that directory.
+
+"""
+import argparse
+import datetime
+import os
+
+import numpy
+import pandas
+
+
+TEAMS = [
+    'ATL', 'BKN', 'BOS', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GS', 'HOU', 'IND', 'LAC', 'LAL', 'MEM',
+    'MIA', 'MIL', 'MIN', 'NO', 'NY', 'OKC', 'ORL', 'PHI', 'PHO', 'POR', 'SA', 'SAC', 'TOR', 'UTA', 'WSH',
+]
+
+FIRST_NAMES = [
+    'Aaron', 'Andre', 'Ben', 'Bruce', 'Caleb', 'Chris', 'Dario', 'Dean', 'Evan', 'Franz', 'Gary', 'Grant', 'Isaiah',
+    'Jalen', 'Jaylen', 'Josh', 'Keegan', 'Kevin', 'Luka', 'Malik', 'Marcus', 'Miles', 'Nikola', 'Obi', 'Paul', 'Rudy',
+    'Scottie', 'Shai', 'Tyrese', 'Victor',
+]
+LAST_NAMES = [
+    'Adams', 'Allen', 'Banchero', 'Bridges', 'Brown', 'Collins', 'Davis', 'Edwards', 'Fox', 'Gobert', 'Green',
+    'Harris', 'Holiday', 'Jackson', 'Johnson', 'Jones', 'Lopez', 'Martin', 'Mitchell', 'Murray', 'Porter', 'Robinson',
+    'Smith', 'Thompson', 'Turner', 'Walker', 'Wallace', 'White', 'Williams', 'Young',
+]
+
+# per 36 minutes stats of each position: fga, fg%, fta, ft%, 3pm, treb, ast, stl, blk, to
+POSITION_RATES = {
+    'PG': (15, 0.45, 4.5, 0.84, 2.6, 4.5, 8.0, 1.4, 0.3, 2.8),
+    'SG': (16, 0.45, 4.0, 0.83, 2.8, 4.8, 4.0, 1.2, 0.4, 2.0),
+    'SF': (14, 0.47, 4.0, 0.79, 2.0, 6.5, 3.5, 1.1, 0.6, 1.8),
+    'PF': (13, 0.50, 4.2, 0.74, 1.3, 8.5, 3.0, 0.9, 1.0, 1.8),
+    'C': (11, 0.57, 4.5, 0.68, 0.4, 11.5, 2.5, 0.8, 1.8, 2.0),
+}
+POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C', 'PG,SG', 'SG,SF', 'SF,PF', 'PF,C']
+
+# games each team plays in a week, and how often
+WEEKLY_GAMES = ([2, 3, 4, 5], [0.1, 0.45, 0.4, 0.05])
+SEASON_GAMES = 82
+
+HTB_COLUMNS = ['R#', 'PLAYER', 'POS', 'TEAM', 'GP', 'MPG', 'FG%', 'FT%', '3PM', 'PTS', 'TREB', 'AST', 'STL', 'BLK', 'TO', 'TOTAL']
+# the header is repeated every this many rows
+HTB_HEADER_EVERY = 50
+
+YAHOO_COLUMNS = ['GP*', 'Current', 'MPG', 'PTS', 'REB', 'AST', 'ST', 'BLK', 'TO']
+YAHOO_NS = 'http://fantasysports.yahooapis.com/fantasy/v2/base.rng'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="directory to write the league to")
+    parser.add_argument("--teams", type=int, default=12, help="number of teams")
+    parser.add_argument("--roster-size", type=int, default=13, help="players on each roster")
+    parser.add_argument("--free-agents", type=int, default=300, help="players not on a roster")
+    parser.add_argument("--weeks", type=int, default=24, help="scoring weeks in the season")
+    parser.add_argument("--week", type=int, help="current week (default a third of the way into the season)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    generate_league(
+        args.directory, n_teams=args.teams, roster_size=args.roster_size, n_free_agents=args.free_agents,
+        weeks=args.weeks, week=args.week, seed=args.seed
+    )
+
+    print(f"Generated a {args.teams} team league in {args.directory}")
+
+
+def generate_league(
+    directory, n_teams=12, roster_size=13, n_free_agents=300, weeks=24, week=None, top_n=10, seed=0, today=None
+):
+    """
+    Write a league's projections, Yahoo projections and playing time, id mapping, games to play overrides, rosters,
+    standings, schedules and config.py to directory
+
+    The season starts so that today is in week.
+
+    """
+    rng = numpy.random.default_rng(seed)
+
+    week = week if week is not None else max(2, weeks // 3)
+    today = pandas.Timestamp(today if today is not None else datetime.date.today()).normalize()
+    season_start = today - pandas.Timedelta(days=today.dayofweek + 7 * (week - 1))
+
+    os.makedirs(directory, exist_ok=True)
+
+    projections = generate_projections(n_teams * roster_size + n_free_agents, rng)
+    daily_schedule = generate_daily_schedule(season_start, weeks, rng)
+    schedule = weekly_schedule(daily_schedule, season_start, weeks)
+    rosters = draft_rosters(projections, n_teams, roster_size, rng)
+
+    yahoo_ids = rosters.set_index('name')['yahoo_id'].reindex(projections['name']).to_numpy(dtype=float, copy=True)
+    free_agents = numpy.isnan(yahoo_ids)
+    yahoo_ids[free_agents] = numpy.arange(free_agents.sum()) + rosters['yahoo_id'].max() + 1
+    yahoo_ids = yahoo_ids.astype(int)
+
+    remaining_weeks = [f"W{i}" for i in range(week, weeks + 1)]
+    remaining_games = schedule.set_index('team').loc[projections['team'], remaining_weeks].sum(axis=1).values
+
+    pandas.DataFrame({
+        'htb_name': projections['name'],
+        'yahoo_name': projections['name'],
+        'yahoo_id': yahoo_ids,
+    }).to_csv(os.path.join(directory, 'id_mapping.csv'), encoding='utf8', index=False)
+
+    yahoo_projections(projections, yahoo_ids, remaining_games, rng).to_csv(
+        os.path.join(directory, 'yahoo_projections.csv'), encoding='utf8', index=False
+    )
+    yahoo_playing_time(projections, yahoo_ids, rng).to_csv(
+        os.path.join(directory, 'yahoo_playing_time.csv'), encoding='utf8', index=False
+    )
+
+    # a few injured players are overridden by hand
+    injured = rng.choice(len(rosters), min(3, len(rosters)), replace=False)
+    pandas.DataFrame({
+        'yahoo_id': rosters['yahoo_id'].values[injured],
+        'name': rosters['name'].values[injured],
+        'gtp_override': rng.integers(0, 20, len(injured)),
+    }).to_csv(os.path.join(directory, 'gtp_manual.csv'), encoding='utf8', index=False)
+
+    projections.to_csv(os.path.join(directory, 'projections.csv'), encoding='utf8', index=False)
+    rosters.to_csv(os.path.join(directory, 'rosters.csv'), encoding='utf8', index=False)
+
+    played = schedule.set_index('team')[[f"W{i}" for i in range(1, week)]].sum(axis=1)
+    standings = played_standings(projections, rosters, played, top_n, rng)
+    standings.to_csv(os.path.join(directory, 'standings.csv'), encoding='utf8', index=False)
+
+    schedule.to_csv(os.path.join(directory, f"schedule_{season_start.year}.csv"), encoding='utf8', index=False)
+    daily_schedule.to_csv(
+        os.path.join(directory, f"daily_schedule_{season_start.year}.csv"), encoding='utf8', index=False,
+        date_format='%Y-%m-%d'
+    )
+
+    with open(os.path.join(directory, 'config.py'), 'w') as f:
+        f.write(league_config(season_start, weeks, top_n, roster_size, n_teams))
+
+
+def generate_projections(n_players, rng):
+    """
+    Hashtag Basketball projections of n_players players, ranked by the sum of their z-scores
+
+    """
+    names = player_names(n_players, rng)
+    positions = rng.choice(POSITIONS, n_players)
+
+    mpg = numpy.clip(rng.normal(22, 8, n_players), 6, 38)
+    # better players play more, and better
+    skill = numpy.clip(rng.normal(1 + (mpg - 22) / 60, 0.12), 0.6, 1.5)
+    per_36 = numpy.array([
+        numpy.mean([POSITION_RATES[pos] for pos in position.split(',')], axis=0) for position in positions
+    ])
+    per_game = per_36 * (mpg / 36)[:, numpy.newaxis]
+
+    fga = per_game[:, 0] * skill
+    fg_pct = numpy.clip(per_36[:, 1] + rng.normal(0, 0.03, n_players), 0.35, 0.7)
+    fta = per_game[:, 2] * skill * rng.uniform(0.6, 1.4, n_players)
+    ft_pct = numpy.clip(per_36[:, 3] + rng.normal(0, 0.06, n_players), 0.5, 0.95)
+    threes = per_game[:, 4] * rng.uniform(0.5, 1.5, n_players)
+
+    projections = pandas.DataFrame({
+        'name': names,
+        'pos': positions,
+        'team': rng.choice(TEAMS, n_players),
+        'gp': rng.integers(40, SEASON_GAMES + 1, n_players),
+        'mpg': mpg.round(1),
+        'fg%': fg_pct.round(3),
+        'fgm': (fga * fg_pct).round(1),
+        'fga': fga.round(1),
+        'ft%': ft_pct.round(3),
+        'ftm': (fta * ft_pct).round(1),
+        'fta': fta.round(1),
+        '3pm': threes.round(1),
+        'pts': (2 * fga * fg_pct + threes + fta * ft_pct).round(1),
+        'treb': (per_game[:, 5] * rng.uniform(0.7, 1.3, n_players)).round(1),
+        'ast': (per_game[:, 6] * skill * rng.uniform(0.7, 1.3, n_players)).round(1),
+        'stl': (per_game[:, 7] * rng.uniform(0.6, 1.4, n_players)).round(1),
+        'blk': (per_game[:, 8] * rng.uniform(0.5, 1.5, n_players)).round(1),
+        'to': (per_game[:, 9] * skill * rng.uniform(0.7, 1.3, n_players)).round(1),
+    })
+
+    counting = projections[['3pm', 'pts', 'treb', 'ast', 'stl', 'blk']].values
+    z_scores = (counting - counting.mean(axis=0)) / counting.std(axis=0)
+    to = projections['to'].values
+    # % are weighted by attempts
+    fg_impact = (projections['fg%'] - projections['fg%'].mean()) * projections['fga']
+    ft_impact = (projections['ft%'] - projections['ft%'].mean()) * projections['fta']
+
+    projections['total'] = (
+        z_scores.sum(axis=1) - (to - to.mean()) / to.std() + fg_impact / fg_impact.std() + ft_impact / ft_impact.std()
+    ).round(2)
+
+    projections = projections.sort_values('total', ascending=False, kind='stable').reset_index(drop=True)
+    projections.insert(0, 'r#', numpy.arange(1, n_players + 1))
+
+    return projections
+
+
+def player_names(n_players, rng):
+    """
+    n_players different names, with a number added to the last name once all first and last name pairs are used
+
+    """
+    pairs = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    order = rng.permutation(len(pairs))
+
+    return [
+        pairs[order[i % len(pairs)]] + (f"{i // len(pairs) + 1}" if i >= len(pairs) else '') for i in range(n_players)
+    ]
+
+
+def draft_rosters(projections, n_teams, roster_size, rng):
+    """
+    Rosters of a snake draft where each team picks about the best ranked player left
+
+    """
+    # teams don't draft exactly by rank
+    order = numpy.argsort(projections['r#'].values + rng.normal(0, 8, len(projections)), kind='stable')
+    drafted = projections.iloc[order[:n_teams * roster_size]]
+
+    rounds = numpy.arange(n_teams * roster_size) // n_teams
+    picks = numpy.arange(n_teams * roster_size) % n_teams
+    team_ids = numpy.where(rounds % 2 == 0, picks, n_teams - 1 - picks) + 1
+
+    rosters = pandas.DataFrame({
+        'team_id': team_ids,
+        'yahoo_id': 10000 + numpy.arange(n_teams * roster_size),
+        'name': drafted['name'].values,
+        'nba_team': drafted['team'].values,
+        'pos': drafted['pos'].values,
+    })
+
+    return rosters.sort_values(['team_id', 'yahoo_id']).reset_index(drop=True)
+
+
+def generate_daily_schedule(season_start, weeks, rng):
+    """
+    Dates of every team's games, with a number of games each week drawn from WEEKLY_GAMES
+
+    """
+    games = []
+
+    for week in range(weeks):
+        for team, n_games in zip(TEAMS, rng.choice(WEEKLY_GAMES[0], len(TEAMS), p=WEEKLY_GAMES[1])):
+            for day in numpy.sort(rng.choice(7, n_games, replace=False)):
+                games.append((season_start + pandas.Timedelta(days=7 * week + int(day)), team))
+
+    return pandas.DataFrame(games, columns=['date', 'team']).sort_values(['date', 'team']).reset_index(drop=True)
+
+
+def weekly_schedule(daily_schedule, season_start, weeks):
+    """
+    Games of every team in every week, as in schedule_{year}.csv
+
+    """
+    week = (daily_schedule['date'] - season_start).dt.days // 7 + 1
+    schedule = pandas.crosstab(daily_schedule['team'], week).reindex(columns=range(1, weeks + 1), fill_value=0)
+    schedule.columns = [f"W{i}" for i in schedule.columns]
+
+    return schedule.rename_axis(None, axis=1).reset_index()
+
+
+def yahoo_projections(projections, yahoo_ids, remaining_games, rng):
+    """
+    Yahoo rest of season projections, as scraped by scrape_yahoo
+
+    """
+    players = yahoo_players(projections, yahoo_ids, rng)
+    players['gtp'] = numpy.round(remaining_games * projections['gp'].values / SEASON_GAMES)
+    players['mpg'] = minutes(projections['mpg'].values)
+
+    return players
+
+
+def yahoo_playing_time(projections, yahoo_ids, rng):
+    """
+    Yahoo stats of the last 14 days, as scraped by scrape_yahoo, where players without games have no minutes
+
+    """
+    players = yahoo_players(projections, yahoo_ids, rng)
+    players['gtp'] = rng.binomial(7, projections['gp'].values / SEASON_GAMES).astype(float)
+    players['mpg'] = numpy.where(
+        players['gtp'] > 0, minutes(numpy.clip(projections['mpg'].values + rng.normal(0, 4, len(players)), 1, 44)), '-'
+    )
+
+    return players
+
+
+def yahoo_players(projections, yahoo_ids, rng):
+    n_players = len(projections)
+
+    players = pandas.DataFrame({
+        'abbr_name': [f"{name[0]}. {name.split(' ', 1)[1]}" for name in projections['name']],
+        'yahoo_id': yahoo_ids,
+        # Yahoo ranks players a little differently
+        'rank': numpy.argsort(numpy.argsort(projections['r#'].values + rng.normal(0, 10, n_players))) + 1.0,
+    })
+
+    for stat in ['pts', 'treb', 'ast', 'stl', 'blk', 'to']:
+        players[stat] = (projections[stat].values * rng.uniform(0.85, 1.15, n_players)).round(1)
+
+    return players
+
+
+def minutes(mpg):
+    """
+    Minutes per game as mm:ss
+
+    """
+    seconds = numpy.round(numpy.asarray(mpg) * 60).astype(int)
+
+    return [f"{s // 60}:{s % 60:02d}" for s in seconds]
+
+
+def played_standings(projections, rosters, played, top_n, rng):
+    """
+    Roto standings after the rostered players played their teams' games so far, with top_n starting each day
+
+    """
+    players = rosters[['team_id', 'name']].merge(projections, on='name')
+
+    # share of games played and started by each player
+    games = played.reindex(players['team']).values * players['gp'].values / SEASON_GAMES
+    games = games * min(1.0, top_n / rosters.groupby('team_id').size().max()) * rng.uniform(0.9, 1.1, len(players))
+
+    stats = ['fga', 'fgm', 'fta', 'ftm', '3pm', 'pts', 'treb', 'ast', 'stl', 'blk', 'to']
+    totals = pandas.DataFrame(players[stats].values * games[:, numpy.newaxis], columns=stats)
+    totals['gp'] = games
+    totals['team_id'] = players['team_id'].values
+    totals = totals.groupby('team_id').sum().round().astype(int).reset_index()
+
+    standings = pandas.DataFrame({
+        'team_id': totals['team_id'],
+        'gp': totals['gp'],
+        'fga': totals['fga'],
+        'fgm': totals['fgm'],
+        'fta': totals['fta'],
+        'ftm': totals['ftm'],
+        'fg%': (totals['fgm'] / totals['fga']).round(3),
+        'ft%': (totals['ftm'] / totals['fta']).round(3),
+        '3ptm': totals['3pm'],
+        'pts': totals['pts'],
+        'reb': totals['treb'],
+        'ast': totals['ast'],
+        'st': totals['stl'],
+        'blk': totals['blk'],
+        'to': totals['to'],
+    })
+
+    return standings
+
+
+def league_config(season_start, weeks, top_n, roster_size, n_teams):
+    """
+    Text of a config.py with the league settings, and the other settings of config_sample.py
+
+    """
+    return (
+        '"""\nConfig of a league generated by synthetic_league.py\n\n"""\n\n'
+        'import datetime\n\n'
+        'from config_sample import *\n\n'
+        f"SEASON_START = datetime.datetime({season_start.year}, {season_start.month}, {season_start.day})\n"
+        f"LAST_WEEK = {weeks}\n"
+        f"TOP_N = {top_n}\n"
+        f"ROSTER_SIZE = {roster_size}\n"
+        "MY_TEAM_ID = 1\n"
+        f"N_TEAMS = {n_teams}\n"
+    )
+
+
+def htb_page(n_players, rng):
+    """
+    Bytes of a Hashtag Basketball projections page with n_players random players
+
+    """
+    header = '<tr>' + ''.join(f'<th scope="col">{col}</th>' for col in HTB_COLUMNS) + '</tr>\n'
+    repeated_header = '<tr>' + ''.join(f'<td>{col}</td>' for col in HTB_COLUMNS) + '</tr>\n'
+
+    rows = [header]
+
+    for i in range(n_players):
+        if i > 0 and i % HTB_HEADER_EVERY == 0:
+            rows.append(repeated_header)
+
+        fga, fta = rng.uniform(2, 20), rng.uniform(0.5, 10)
+        fgm, ftm = fga * rng.uniform(0.35, 0.6), fta * rng.uniform(0.5, 0.9)
+
+        cells = [
+            str(i + 1),
+            f'<a href="/player/{i}">Player{i} J. Name{i}</a>',
+            rng.choice(['PG', 'SG', 'SF', 'PF', 'C', 'PG,SG', 'SF,PF', 'PF,C']),
+            f"T{rng.integers(30):02d}",
+            str(rng.integers(20, 70)),
+            f"{rng.uniform(10, 38):.1f}",
+            f"\n<span>{fgm / fga:.3f}</span>\n<br />\n<span class=\"fraction\">({fgm:.1f}/{fga:.1f})</span>\n",
+            f"\n<span>{ftm / fta:.3f}</span>\n<br />\n<span class=\"fraction\">({ftm:.1f}/{fta:.1f})</span>\n",
+        ] + [f"{value:.1f}" for value in rng.uniform(0, 10, size=7)] + [f"{rng.normal():.2f}"]
+
+        rows.append('<tr>' + ''.join(f'<td>{cell}</td>' for cell in cells) + '</tr>\n')
+
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Projections</title></head><body>\n'
+        '<form id="form1"><section><div><div class="heading-pricing"><span>'
+        '<small>Last updated: October 18, 2026 by Hashtag Basketball</small></span></div>\n'
+        f'<table id="ContentPlaceHolder1_GridView1">\n{"".join(rows)}</table>\n'
+        '</div></section></form></body></html>\n'
+    ).encode('utf-8')
+
+
+def yahoo_player_page(n_players, rng, start=0):
+    """
+    Bytes of a page of the Yahoo player list with n_players random players, numbered from start
+
+    """
+    header = ''.join(f'<th>{col}</th>' for col in ['', 'Players', 'Action', 'Opp'] + YAHOO_COLUMNS)
+
+    rows = []
+
+    for i in range(start, start + n_players):
+        cells = [
+            '<td><div>&nbsp;</div></td>',
+            f'<td><div class="ysf-player-name"><a href="https://sports.yahoo.com/nba/players/{5000 + i}">P. Name{i}</a>'
+            f'<span>{rng.choice(TEAMS)} - PG</span></div></td>',
+            '<td><div><a>Add</a></div></td>',
+            f'<td><div>@{rng.choice(TEAMS)}</div></td>',
+            f'<td><div>{rng.integers(0, 60)}</div></td>',
+            f'<td><div>{i + 1}</div></td>',
+            f'<td><div>{minutes([rng.uniform(5, 38)])[0]}</div></td>',
+        ] + [f'<td><div>{value:.1f}</div></td>' for value in rng.uniform(0, 25, size=5)] + ['<td><div>-</div></td>']
+
+        rows.append('<tr>' + ''.join(cells) + '</tr>')
+
+    return (
+        '<html><head><meta charset="utf-8"></head><body><div class="players"><table>'
+        f'<thead><tr class="First"><th>Rankings</th></tr><tr class="Last">{header}</tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table></div></body></html>'
+    ).encode('utf-8')
+
+
+def rosters_response(n_teams, roster_size, rng):
+    """
+    Bytes of a Yahoo API response with the rosters of n_teams teams of roster_size random players
+
+    """
+    teams = []
+
+    for team_id in range(1, n_teams + 1):
+        players = ''.join(
+            f'<player><player_key>nba.p.{player_id}</player_key><player_id>{player_id}</player_id>'
+            f'<name><full>P.J. Name{player_id}</full></name>'
+            f'<editorial_team_abbr>{rng.choice(TEAMS)}</editorial_team_abbr>'
+            f'<display_position>{rng.choice(POSITIONS)}</display_position></player>'
+            for player_id in range(team_id * 100, team_id * 100 + roster_size)
+        )
+
+        teams.append(f'<team><team_id>{team_id}</team_id><roster><players>{players}</players></roster></team>')
+
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<fantasy_content xmlns="{YAHOO_NS}"><league><teams>'
+        f'{"".join(teams)}</teams></league></fantasy_content>'
+    ).encode('utf-8')
+
+
+if __name__ == '__main__':
+    main()
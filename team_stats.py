@@ -0,0 +1,77 @@
+"""
+Player stats as a players x stats array with the team of each player, for summing stats by team
+
+"""
+from collections import namedtuple
+
+import numpy
+
+
+# values is a players x columns float array, team_index is the position of each player's team in team_ids (-1 if the
+# player is not on one of the teams)
+PlayerMatrix = namedtuple('PlayerMatrix', 'values columns team_ids team_index')
+
+
+def player_matrix(players, columns, team_ids=None):
+    """
+    Build a PlayerMatrix from a DataFrame of players with a team_id column
+
+    Missing stats count as 0. If team_ids is not given, every team a player is on is used, in sorted order.
+
+    """
+    if team_ids is None:
+        team_ids = numpy.sort(players['team_id'].dropna().unique())
+
+    team_ids = numpy.asarray(team_ids)
+
+    values = numpy.nan_to_num(players[columns].values.astype(float))
+
+    player_teams = players['team_id'].values
+    team_index = numpy.full(len(players), -1)
+
+    for i, team_id in enumerate(team_ids):
+        team_index[player_teams == team_id] = i
+
+    return PlayerMatrix(values=values, columns=list(columns), team_ids=team_ids, team_index=team_index)
+
+
+def roster_rows(matrix, pad=-1):
+    """
+    Teams x roster spots array of each team's player rows, in row order
+
+    Teams with fewer players than the largest roster are padded with pad.
+
+    """
+    n_teams = len(matrix.team_ids)
+    on_team = numpy.flatnonzero(matrix.team_index >= 0)
+
+    # rows grouped by team, keeping row order within each team
+    rows = on_team[numpy.argsort(matrix.team_index[on_team], kind='stable')]
+    teams = matrix.team_index[rows]
+
+    roster_sizes = numpy.bincount(teams, minlength=n_teams)
+    starts = numpy.concatenate([[0], numpy.cumsum(roster_sizes)[:-1]])
+    spots = numpy.arange(len(rows)) - starts[teams]
+
+    rosters = numpy.full((n_teams, roster_sizes.max(initial=0)), pad)
+    rosters[teams, spots] = rows
+
+    return rosters
+
+
+def team_totals(matrix, weights=None):
+    """
+    Teams x columns array of the (weighted) sum of stats of each team's players
+
+    weights is the weight of each player, e.g. the % of games he starts.
+
+    """
+    values = matrix.values if weights is None else matrix.values * weights[:, numpy.newaxis]
+
+    on_team = matrix.team_index >= 0
+    n_teams = len(matrix.team_ids)
+
+    return numpy.column_stack([
+        numpy.bincount(matrix.team_index[on_team], weights=values[on_team, i], minlength=n_teams)
+        for i in range(len(matrix.columns))
+    ]).reshape(n_teams, len(matrix.columns))
@@ -0,0 +1,18 @@
+"""
+Tests run in a league generated by synthetic_league, which brings the config.py the scripts import
+
+"""
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from synthetic_league import generate_league  # noqa: E402
+
+LEAGUE_DIR = tempfile.mkdtemp(prefix='league-')
+generate_league(LEAGUE_DIR, n_teams=8, roster_size=13, n_free_agents=60, seed=0)
+
+os.chdir(LEAGUE_DIR)
+sys.path.insert(0, LEAGUE_DIR)
@@ -0,0 +1,60 @@
+import datetime
+
+import numpy
+import pandas
+import pytest
+
+from benchmark import check_if_top_n_loop, weekly_valuation
+from calc_h2h_points import MY_TEAM_ID, SEASON_START, TOP_N, check_if_top_n, load_players, value_players, weeks_left
+
+
+@pytest.fixture(scope='module')
+def players():
+    return load_players()
+
+
+def test_daily_valuation_covers_the_weeks_left(players):
+    # the middle of a week, whose remaining days aren't left
+    as_of = pandas.Timestamp(SEASON_START) + pandas.Timedelta(weeks=10, days=3)
+
+    valuation = value_players(players, as_of, daily=True)
+
+    weeks = weeks_left(as_of)
+    start_columns = [col for col in valuation if col.endswith(' start fpoints') and col != 'ros start fpoints']
+
+    assert start_columns == [f"W{week_num} start fpoints" for week_num in weeks]
+
+
+def test_check_if_top_n_matches_loop():
+    valuation = weekly_valuation()
+    weeks = weeks_left(datetime.datetime.today())
+
+    # no two players tie on both weekly fpoints and fpoints, where the loop's order depends on the weeks before
+    valuation['fpoints'] += numpy.arange(len(valuation)) * 1e-9
+
+    expected = check_if_top_n_loop(valuation.copy(), weeks)
+    result = check_if_top_n(valuation.copy())
+
+    assert result['n_playable_weeks'].tolist() == expected['n_playable_weeks'].tolist()
+    assert result['playable_weeks'].tolist() == expected['playable_weeks'].tolist()
+    numpy.testing.assert_allclose(result['playable_points'], expected['playable_points'], rtol=1e-12)
+
+
+def test_check_if_top_n_ties():
+    weeks = weeks_left(datetime.datetime.today())
+    n = TOP_N + 2
+
+    # my players all tie, as does a free agent
+    valuation = pandas.DataFrame({
+        'name': [f"Player {i}" for i in range(n + 1)],
+        'team_id': [MY_TEAM_ID] * n + [numpy.nan],
+        'fpoints': 10.0,
+    })
+
+    for week_num in weeks:
+        valuation[f"W{week_num} fpoints"] = 30.0
+
+    result = check_if_top_n(valuation)
+
+    # my players listed first start, and the free agent falls behind all of them
+    assert result['n_playable_weeks'].tolist() == [len(weeks)] * TOP_N + [0] * (n - TOP_N) + [0]
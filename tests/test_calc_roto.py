@@ -0,0 +1,109 @@
+import itertools
+
+import numpy
+import pytest
+from scipy.optimize import minimize_scalar
+
+from calc_roto import (
+    MULT_BOUNDS, MY_TEAM_ID, PCT_PLAYED, ROSTER_SIZE, SwapEngine, calc_final_standings, calc_ros_values,
+    find_weights_batch, iter_trades, load_league
+)
+
+
+@pytest.fixture(scope='module')
+def league():
+    ros, standings = load_league()
+    projections = calc_ros_values(calc_final_standings(standings, ros), ros).reset_index(drop=True)
+
+    return projections, standings
+
+
+def trade_keys(trades):
+    return sorted((trade['partner_team_id'], trade['give_player_ids'], trade['get_player_ids']) for trade in trades)
+
+
+@pytest.mark.parametrize('min_gain', [-3, 0, 2])
+def test_iter_trades_matches_brute_force_with_negative_values(league, min_gain):
+    projections, standings = league
+    projections = projections.copy()
+
+    # most players are worth less than replacement, so the best two on a roster often include a negative value
+    rng = numpy.random.default_rng(1)
+    projections['mod_value'] = rng.normal(-3, 3, len(projections))
+    projections['total_value'] = rng.normal(0, 3, len(projections))
+    # what I give covers every gain the bound could wrongly rule out
+    mine = (projections['team_id'] == MY_TEAM_ID).values
+    projections.loc[mine, 'mod_value'] = numpy.linspace(-3, 3, mine.sum())
+
+    engine = SwapEngine(standings, projections)
+    my_team = engine.team_index[MY_TEAM_ID]
+    mod_value = projections['mod_value'].values
+    total_value = projections['total_value'].values
+    yahoo_ids = projections['yahoo_id'].values
+    max_partner_loss = 2
+
+    def combinations(rows):
+        return itertools.chain.from_iterable(itertools.combinations(rows, k) for k in (1, 2))
+
+    expected = []
+
+    for team, partner_rows in enumerate(engine.rosters):
+        if team == my_team:
+            continue
+
+        for give in combinations(engine.rosters[my_team]):
+            for get in combinations(partner_rows):
+                if (
+                    mod_value[list(get)].sum() - mod_value[list(give)].sum() >= min_gain and
+                    total_value[list(get)].sum() - total_value[list(give)].sum() <= max_partner_loss
+                ):
+                    expected.append({
+                        'partner_team_id': engine.team_ids[team],
+                        'give_player_ids': ','.join(str(yahoo_ids[row]) for row in give),
+                        'get_player_ids': ','.join(str(yahoo_ids[row]) for row in get),
+                    })
+
+    trades = list(iter_trades(engine, projections, 2, min_gain, max_partner_loss))
+
+    assert len(expected) > 0
+    assert trade_keys(trades) == trade_keys(expected)
+
+
+def minimize_scalar_weights(pct_played, max_games, gtp):
+    """
+    The bounded scalar search that find_weights used before find_weights_batch, and its objective
+
+    """
+    def calc_mult(mult):
+        return numpy.abs(max_games - numpy.sum(numpy.clip(pct_played[:len(gtp)] * mult, 0, 1) * gtp))
+
+    result = minimize_scalar(calc_mult, bounds=MULT_BOUNDS, method='bounded')
+
+    return numpy.clip(pct_played[:len(gtp)] * result.x, 0, 1), result.fun
+
+
+@pytest.mark.parametrize('n_players', [ROSTER_SIZE - 1, ROSTER_SIZE, ROSTER_SIZE + 1])
+def test_find_weights_batch_matches_minimize_scalar(n_players):
+    rng = numpy.random.default_rng(n_players)
+    gtp = rng.integers(0, 60, (300, n_players)).astype(float)
+    max_games = rng.uniform(100, 700, len(gtp))
+
+    weights = find_weights_batch(PCT_PLAYED, max_games, gtp)
+    games = (weights * gtp).sum(axis=1)
+
+    # games started at either end of the multiplier's range
+    fewest, most = ((numpy.clip(PCT_PLAYED[:n_players] * mult, 0, 1) * gtp).sum(axis=1) for mult in MULT_BOUNDS)
+
+    for i in range(len(gtp)):
+        expected, objective = minimize_scalar_weights(PCT_PLAYED, max_games[i], gtp[i])
+
+        # never further from max_games than the scalar search
+        assert abs(max_games[i] - games[i]) <= objective + 1e-6
+
+        if objective < 1e-3:
+            numpy.testing.assert_allclose(weights[i], expected, atol=1e-4)
+
+        # rosters a player short after a drop, where the scalar search stops on the flat part of the objective and
+        # starts everyone in every game, start exactly max_games whenever a multiplier in range does
+        if fewest[i] <= max_games[i] <= most[i]:
+            assert games[i] == pytest.approx(max_games[i])
@@ -0,0 +1,43 @@
+import numpy
+import pytest
+
+from daily_lineup import DailyLineups, slot_eligibility
+
+
+POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C', 'PG,SG', 'SG,SF', 'SF,PF', 'PF,C']
+
+
+def random_players(rng, n, days, play_rate):
+    values = rng.uniform(0, 40, n)
+    eligible = slot_eligibility(rng.choice(POSITIONS, n))
+    plays = rng.random((n, days)) < play_rate
+
+    return values, eligible, plays
+
+
+@pytest.mark.parametrize('games_cap', [None, 15, 30, 45])
+def test_pickup_points_match_solving_with_each_candidate(games_cap):
+    rng = numpy.random.default_rng(0)
+    week_of_day = numpy.repeat([1, 2], 7)
+
+    for _ in range(30):
+        play_rate = rng.uniform(0.4, 0.9)
+        values, eligible, plays = random_players(rng, rng.integers(8, 16), len(week_of_day), play_rate)
+        candidate_values, candidate_eligible, candidate_plays = random_players(rng, 20, len(week_of_day), play_rate)
+
+        lineups = DailyLineups(values, eligible, plays, week_of_day, games_cap)
+        points = lineups.pickup_points(candidate_values, candidate_eligible, candidate_plays)
+
+        base = lineups.start_points().sum(axis=0)
+
+        for c in range(len(candidate_values)):
+            with_candidate = DailyLineups(
+                numpy.append(values, candidate_values[c]),
+                numpy.vstack([eligible, candidate_eligible[c]]),
+                numpy.vstack([plays, candidate_plays[c]]),
+                week_of_day,
+                games_cap,
+            )
+
+            assert points[c] == pytest.approx(with_candidate.start_points().sum(axis=0) - base)
+
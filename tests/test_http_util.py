@@ -0,0 +1,120 @@
+import pytest
+import requests
+
+import http_util
+from http_util import HttpCache, TokenBucket
+
+
+class FakeSession:
+    """
+    Serves a body with an ETag, answering 304 to a request with the current ETag
+
+    """
+    def __init__(self, body=b'body', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers or {})
+
+        r = requests.Response()
+        r.url = url
+
+        if headers and headers.get('If-None-Match') == self.etag:
+            r.status_code = 304
+            r._content = b''
+        else:
+            r.status_code = 200
+            r._content = self.body
+            r.headers['ETag'] = self.etag
+
+        return r
+
+
+URL = 'https://example.com/page'
+
+
+def test_response_reused_within_ttl(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    session = FakeSession()
+
+    assert cache.get(session, URL, ttl=60).content == b'body'
+    assert cache.get(session, URL, ttl=60).content == b'body'
+
+    assert len(session.requests) == 1
+    assert cache.stats['hits'] == 1
+
+
+def test_expired_response_revalidated_with_etag(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    session = FakeSession()
+
+    cache.get(session, URL)
+    r = cache.get(session, URL)
+
+    assert r.status_code == 200
+    assert r.content == b'body'
+    assert session.requests[-1]['If-None-Match'] == '"v1"'
+    assert cache.stats['revalidated'] == 1
+
+    # a changed page is downloaded again
+    session.body, session.etag = b'new body', '"v2"'
+
+    assert cache.get(session, URL).content == b'new body'
+
+
+def test_offline_serves_only_cached_responses(tmp_path):
+    HttpCache(str(tmp_path)).get(FakeSession(), URL)
+
+    offline = HttpCache(str(tmp_path), offline=True)
+    session = FakeSession(body=b'not used')
+
+    assert offline.get(session, URL).content == b'body'
+    assert session.requests == []
+
+    with pytest.raises(KeyError):
+        offline.get(session, 'https://example.com/other')
+
+
+def test_invalid_response_not_stored(tmp_path):
+    cache = HttpCache(str(tmp_path))
+
+    def validate(r):
+        if r.content != b'good':
+            raise ValueError("bad page")
+
+    with pytest.raises(ValueError):
+        cache.get(FakeSession(body=b'bad'), URL, ttl=60, validate=validate)
+
+    session = FakeSession(body=b'good')
+
+    assert cache.get(session, URL, ttl=60, validate=validate).content == b'good'
+    assert len(session.requests) == 1
+    assert 'If-None-Match' not in session.requests[0]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_allows_bursts_then_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_util, 'time', clock)
+
+    bucket = TokenBucket(rate=2, capacity=3)
+    times = []
+
+    for _ in range(7):
+        bucket.acquire()
+        times.append(clock.now)
+
+    # three at once, then one every half second
+    assert times == pytest.approx([0, 0, 0, 0.5, 1.0, 1.5, 2.0])
@@ -0,0 +1,40 @@
+import os
+
+import pipeline
+from pipeline import STAGES, Stage, dependencies, run_stage
+
+
+def test_calculations_wait_for_id_mapping():
+    by_name = {stage.name: stage for stage in STAGES}
+
+    for name in ['roto', 'h2h']:
+        assert by_name['ids'] in dependencies(STAGES, by_name[name])
+
+
+def test_stage_reruns_when_an_imported_module_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'SCRIPT_DIR', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / 'helper.py').write_text("VALUE = 1\n")
+    (tmp_path / 'stage.py').write_text(
+        "def main():\n"
+        "    from helper import VALUE\n"
+        "    open('out.txt', 'w').write(str(VALUE))\n"
+        "main()\n"
+    )
+    (tmp_path / 'in.csv').write_text("x\n1\n")
+
+    stage = Stage('stage', 'stage.py', [], ['in.csv'], ['out.txt'], False)
+
+    result, state = run_stage(stage, None)
+    assert result['status'] == 'ran'
+    assert os.path.join(str(tmp_path), 'helper.py') in pipeline.local_modules(str(tmp_path / 'stage.py'))
+
+    result, _ = run_stage(stage, state)
+    assert result['status'] == 'skipped'
+
+    (tmp_path / 'helper.py').write_text("VALUE = 2\n")
+
+    result, _ = run_stage(stage, state)
+    assert result['status'] == 'ran'
+    assert (tmp_path / 'out.txt').read_text() == '2'
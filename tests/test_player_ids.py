@@ -0,0 +1,73 @@
+import pandas
+
+from player_ids import known_players, refuse_taken_ids, resolve_projections, save_mappings
+
+
+def frame(rows, columns):
+    frame = pandas.DataFrame(rows, columns=columns)
+    frame['yahoo_id'] = frame['yahoo_id'].astype('Int32')
+
+    return frame
+
+
+def test_save_mappings_keeps_newest_row_per_name(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    id_mapping = frame([('A One', 'A. One', 1), ('B Two', None, None)], ['htb_name', 'yahoo_name', 'yahoo_id'])
+    learned = frame([('B Two', 'B. Two', 2)], ['htb_name', 'yahoo_name', 'yahoo_id'])
+
+    save_mappings(id_mapping, learned)
+    save_mappings(pandas.read_csv('id_mapping.csv'), learned)
+
+    saved = pandas.read_csv('id_mapping.csv')
+
+    assert saved['htb_name'].tolist() == ['A One', 'B Two']
+    assert saved['yahoo_id'].tolist() == [1, 2]
+
+
+def test_refuse_taken_ids():
+    id_mapping = frame([('A One', 'A. One', 1)], ['htb_name', 'yahoo_name', 'yahoo_id'])
+    mapping = frame([
+        ('A One', 'A. One', 1, 'mapping'),
+        ('A. One Jr', 'A. One', 1, 'fuzzy'),
+        ('C Three', 'C. Three', 3, 'exact'),
+        ('C Thre', 'C. Three', 3, 'fuzzy'),
+        ('D Four', 'D. Four', 4, 'exact'),
+    ], ['htb_name', 'yahoo_name', 'yahoo_id', 'method'])
+
+    refuse_taken_ids(mapping, id_mapping)
+
+    assert mapping['method'].tolist() == ['mapping', 'taken', 'taken', 'taken', 'exact']
+    assert mapping['yahoo_id'].isna().tolist() == [False, True, True, True, False]
+
+
+def test_only_normalized_matches_are_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    pandas.DataFrame({
+        'yahoo_id': [1, 2],
+        'abbr_name': ['Jaylen Brown', 'Christopher Paulson'],
+        'gtp': [60.0, 60.0],
+    }).to_csv('yahoo_projections.csv', index=False)
+
+    projections = pandas.DataFrame({
+        'name': ['Jaylen Brown', 'Chris Paulsen'],
+        'team': ['BOS', 'PHO'],
+        'pos': ['SG', 'PG'],
+    })
+
+    mapping = resolve_projections(projections)
+
+    assert mapping['method'].tolist() == ['exact', 'fuzzy']
+    assert mapping['yahoo_id'].tolist() == [1, 2]
+
+    saved = pandas.read_csv('id_mapping.csv')
+
+    assert saved['htb_name'].tolist() == ['Jaylen Brown']
+
+
+def test_known_players_without_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    assert len(known_players()) == 0
+    assert resolve_projections(pandas.DataFrame({'name': ['A One'], 'team': ['BOS'], 'pos': ['C']}), save=False)['method'].tolist() == ['unmatched']
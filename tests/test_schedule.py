@@ -0,0 +1,18 @@
+import numpy
+import pandas
+
+from schedule import Schedule
+
+
+def test_game_days_between_start_and_end():
+    days = pandas.date_range('2020-01-06', periods=14)
+    daily = numpy.zeros((2, 14), dtype=int)
+    daily[0, [1, 5, 9, 13]] = 1
+    daily[1, [2, 12]] = 1
+    schedule = Schedule(['A', 'B'], numpy.array([[2, 2], [1, 1]]), days, daily)
+
+    game_days, plays = schedule.game_days(['B', 'A', 'X'], '2020-01-07', '2020-01-16')
+
+    assert game_days[0] == pandas.Timestamp('2020-01-07')
+    assert game_days[-1] == pandas.Timestamp('2020-01-15')
+    assert plays.sum(axis=1).tolist() == [1, 3, 0]
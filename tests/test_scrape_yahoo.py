@@ -0,0 +1,86 @@
+import threading
+
+import numpy
+import pytest
+import requests
+
+import scrape_yahoo
+from http_util import HttpCache, TokenBucket
+from synthetic_league import yahoo_player_page
+
+
+class FakeSession:
+    """
+    Serves the player list pages of n_players players, with status codes or contents of pages overridden by count
+
+    """
+    def __init__(self, n_players, overrides=None):
+        rng = numpy.random.default_rng(0)
+        self.pages = {
+            start: yahoo_player_page(min(scrape_yahoo.PAGE_SIZE, n_players - start), rng, start)
+            for start in range(0, n_players + 1, scrape_yahoo.PAGE_SIZE)
+        }
+        self.overrides = overrides or {}
+        self.requested = []
+
+    def get(self, url, headers=None):
+        count = int(url.rsplit('count=', 1)[-1])
+        self.requested.append(count)
+
+        status, content = self.overrides.get(count, (200, self.pages.get(count, self.pages[max(self.pages)])))
+
+        r = requests.Response()
+        r.url = url
+        r.status_code = status
+        r._content = content
+
+        return r
+
+
+@pytest.fixture(autouse=True)
+def http_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape_yahoo, 'HTTP_CACHE', HttpCache(str(tmp_path)))
+
+
+def scrape(session):
+    return scrape_yahoo.scrape_yahoo_player_list(session, 'PSR', TokenBucket(1000, 10))
+
+
+def test_scrape_ends_at_short_page():
+    players = scrape(FakeSession(110))
+
+    assert len(players) == 110
+    assert players['yahoo_id'].is_unique
+
+
+def test_scrape_raises_on_error_response():
+    with pytest.raises(requests.HTTPError):
+        scrape(FakeSession(110, {50: (429, b'Too Many Requests')}))
+
+
+def test_scrape_raises_on_page_without_player_table():
+    with pytest.raises(ValueError):
+        scrape(FakeSession(110, {25: (200, b'<html><body><form id="login"></form></body></html>')}))
+
+
+def test_download_skipped_once_list_ended():
+    session = FakeSession(60)
+    stop = threading.Event()
+    stop.set()
+
+    assert scrape_yahoo.download_player_page(session, 'PSR', 75, TokenBucket(1000, 10), stop) is None
+    assert session.requested == []
+
+
+def test_login_page_is_not_cached():
+    login_page = (200, b'<html><body><form id="login"></form></body></html>')
+
+    with pytest.raises(ValueError):
+        scrape(FakeSession(110, {25: login_page}))
+
+    # the next run, e.g. with the cookie fixed, downloads the page again
+    session = FakeSession(110)
+    players = scrape(session)
+
+    assert len(players) == 110
+    assert 25 in session.requested
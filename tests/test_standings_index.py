@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+from calc_roto import rank_average
+from standings_index import StandingsIndex
+
+
+SIGNS = [1, 1, -1, 1]
+
+
+def sorted_buffer(values, team):
+    """
+    calc_buffer_values as it was before the index, ranking and sorting all the teams
+
+    """
+    values = numpy.array(values, dtype=float) * SIGNS
+    rankings = rank_average(values, axis=0)
+    behind_values = numpy.sort(values, axis=0)[(rankings[team] - 2).astype(int), numpy.arange(values.shape[1])]
+
+    return numpy.abs(1 - behind_values / values[team])
+
+
+@pytest.fixture
+def standings():
+    # few distinct totals, so that teams tie
+    return numpy.random.default_rng(0).integers(1, 8, (10, len(SIGNS))).astype(float)
+
+
+def test_counts_match_rank_average(standings):
+    rng = numpy.random.default_rng(1)
+    index = StandingsIndex(standings, SIGNS)
+
+    for team in range(len(standings)):
+        moves = numpy.vstack([standings[team], rng.integers(0, 9, (20, len(SIGNS)))])
+        below, tied = index.counts(team, moves)
+
+        for move, move_below, move_tied in zip(moves, below, tied):
+            values = standings.copy()
+            values[team] = move
+
+            assert move_below + 1 + move_tied / 2 == pytest.approx(rank_average(values * SIGNS, axis=0)[team])
+
+
+def test_buffer_matches_sorting(standings):
+    rng = numpy.random.default_rng(2)
+    index = StandingsIndex(standings, SIGNS)
+
+    for team in range(len(standings)):
+        assert index.buffer(team) == pytest.approx(sorted_buffer(standings, team))
+
+        moves = rng.integers(1, 9, (20, len(SIGNS))).astype(float)
+
+        for move, buffer in zip(moves, index.buffer(team, moves)):
+            values = standings.copy()
+            values[team] = move
+
+            assert buffer == pytest.approx(sorted_buffer(values, team))
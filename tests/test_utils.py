@@ -0,0 +1,37 @@
+import glob
+import os
+
+import pandas
+
+import utils
+
+
+def test_cached_on_keeps_only_latest_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    @utils.cached_on('input.csv')
+    def load_input():
+        return pandas.read_csv('input.csv')
+
+    for rows in range(1, 4):
+        pandas.DataFrame({'x': range(rows)}).to_csv('input.csv', index=False)
+
+        assert len(load_input()) == rows
+
+    assert utils._loaded['load_input'][1]['x'].tolist() == [0, 1, 2]
+    assert len(glob.glob(os.path.join(utils.CACHE_DIR, 'load_input-*.pkl'))) == 1
+    assert not glob.glob(os.path.join(utils.CACHE_DIR, '*.tmp'))
+
+
+def test_replace_cache_file_skips_files_already_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    # another process removes the old version between the glob and the remove
+    old_path = os.path.join(utils.CACHE_DIR, 'load_input-old.pkl')
+    monkeypatch.setattr(utils.glob, 'glob', lambda pattern: [old_path])
+
+    new_path = os.path.join(utils.CACHE_DIR, 'load_input-new.pkl')
+    utils.replace_cache_file(new_path, b'new', 'load_input-*.pkl')
+
+    with open(new_path, 'rb') as f:
+        assert f.read() == b'new'
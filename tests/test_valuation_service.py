@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import numpy
+import pytest
+
+import valuation_service
+from valuation_service import MY_TEAM_ID, STANDINGS_COLUMNS, LeagueState, ValuationHandler
+
+
+@pytest.fixture(scope='module')
+def state():
+    state = LeagueState()
+    state.refresh()
+
+    return state
+
+
+def players(state, on_team):
+    values = state.ros_values
+
+    return [int(yahoo_id) for yahoo_id in values.loc[on_team(values['team_id']), 'yahoo_id']]
+
+
+def test_whatif_add_free_agent(state):
+    free_agent = players(state, lambda team_id: team_id.isna())[0]
+
+    result = state.whatif([], [free_agent])
+
+    assert result['add'] == [free_agent]
+
+
+@pytest.mark.parametrize('drop, add', [
+    ([], ['own']),
+    ([], ['free agent', 'free agent']),
+    (['own', 'own'], []),
+])
+def test_whatif_rejects_counting_a_player_twice(state, drop, add):
+    ids = {
+        'own': players(state, lambda team_id: team_id == MY_TEAM_ID)[0],
+        'free agent': players(state, lambda team_id: team_id.isna())[0],
+    }
+
+    with pytest.raises(ValueError):
+        state.whatif([ids[name] for name in drop], [ids[name] for name in add])
+
+
+def test_whatif_drop_and_add_back(state):
+    own = players(state, lambda team_id: team_id == MY_TEAM_ID)[0]
+
+    assert state.whatif([own], [own])['total_change'] == 0
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_refresh_only_recomputes_changed_parts():
+    state = LeagueState()
+
+    assert state.refresh() == ['projections', 'rosters', 'standings', 'valuations']
+    assert state.refresh() == []
+
+    touch('rosters.csv')
+
+    assert state.refresh() == ['rosters', 'valuations']
+    assert state.refresh() == []
+
+
+def test_refresh_keeps_state_and_retries_after_failure(monkeypatch):
+    state = LeagueState()
+    state.refresh()
+    engine = state.engine
+
+    def fail():
+        raise ValueError("standings.csv caught mid-write")
+
+    touch('standings.csv')
+    monkeypatch.setattr(valuation_service, 'load_standings', fail)
+
+    with pytest.raises(ValueError):
+        state.refresh()
+
+    assert state.engine is engine
+
+    monkeypatch.undo()
+
+    assert state.refresh() == ['standings', 'valuations']
+    assert state.engine is not engine
+
+
+@pytest.fixture
+def server(state):
+    server = valuation_service.ThreadingHTTPServer(('127.0.0.1', 0), ValuationHandler)
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path):
+    """
+    Status and decoded JSON body of a GET request, which must be valid JSON
+
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as response:
+            status, content = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, content = e.code, e.read()
+
+    def reject(constant):
+        raise ValueError(f"invalid JSON constant {constant}")
+
+    return status, json.loads(content, parse_constant=reject)
+
+
+def test_whatif_sends_nan_standings_as_null(server, state, monkeypatch):
+    # the engine is patched, so it must not be rebuilt for files touched by other tests
+    state.refresh()
+    free_agent = players(state, lambda team_id: team_id.isna())[0]
+    move = state.engine.move
+
+    def move_with_nan(new_rosters):
+        final, ranks = move(new_rosters)
+        final[:, STANDINGS_COLUMNS.index('fg%')] = numpy.nan
+
+        return final, ranks
+
+    monkeypatch.setattr(state.engine, 'move', move_with_nan)
+
+    status, body = get(server, f"/whatif?add={free_agent}")
+
+    assert status == 200
+    assert body['standings']['fg%'] is None
+
+
+def test_failed_refresh_is_a_server_error(server, state, monkeypatch):
+    def fail():
+        raise ValueError("standings.csv caught mid-write")
+
+    monkeypatch.setattr(state, 'refresh', fail)
+
+    status, body = get(server, '/standings')
+
+    assert status == 500
+    assert 'mid-write' in body['error']
+
+
+def test_unexpected_error_is_a_server_error(server, state, monkeypatch):
+    def fail(team_id=None):
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(state, 'valuation', fail)
+
+    assert get(server, '/valuation')[0] == 500
+    assert get(server, '/whatif?add=0')[0] == 400
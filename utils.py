@@ -3,27 +3,124 @@ Utility functions
 
 """
 
+import functools
+import glob
+import hashlib
+import os
+import pickle
+
 import pandas
 
+from categories import POINTS_SCORING, fantasy_points
+from http_util import write_atomic
+from instrumentation import increment, span
+
+
+# loaded inputs are cached here between runs
+CACHE_DIR = '.cache'
+
+STAT_COLUMNS = ['gp', 'mpg', 'fg%', 'fgm', 'fga', 'ft%', 'ftm', 'fta', '3pm', 'pts', 'treb', 'ast', 'stl', 'blk', 'to', 'total']
+YAHOO_STAT_COLUMNS = ['gtp', 'rank', 'pts', 'treb', 'ast', 'stl', 'blk', 'to']
+
+# explicit column types of the input CSVs
+DTYPES = {
+    'rosters.csv': {'team_id': 'int32', 'yahoo_id': 'int32', 'name': 'category', 'nba_team': 'category', 'pos': 'category'},
+    'projections.csv': dict({'r#': 'int32', 'name': 'category', 'pos': 'category', 'team': 'category'}, **{col: 'float64' for col in STAT_COLUMNS}),
+    'yahoo_projections.csv': dict({'abbr_name': 'category', 'yahoo_id': 'int32', 'mpg': 'object'}, **{col: 'float64' for col in YAHOO_STAT_COLUMNS}),
+    'yahoo_playing_time.csv': dict({'abbr_name': 'category', 'yahoo_id': 'int32', 'mpg': 'object'}, **{col: 'float64' for col in YAHOO_STAT_COLUMNS}),
+    'id_mapping.csv': {'htb_name': 'object', 'yahoo_name': 'object', 'yahoo_id': 'Int32'},
+    'gtp_manual.csv': {'yahoo_id': 'int32', 'name': 'object', 'gtp_override': 'float64'},
+    'standings.csv': {'team_id': 'int32'},
+}
+
+# key and result of the latest call of each cached loader in this process
+_loaded = {}
+
+
+def cached_on(*paths, settings=None):
+    """
+    Cache a loader's result in memory and on disk until one of the files it reads changes
+
+    Files are considered changed when their modification time or size changes. Settings the loader depends on, such as
+    the points scoring, are part of the cache key. Callers get a copy of the cached DataFrame, so they are free to
+    modify it. Only the result for the latest version of the files is kept, in memory and on disk.
+
+    """
+    def decorator(loader):
+        @functools.wraps(loader)
+        def cached_loader():
+            stamps = [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths]
+            key = hashlib.sha256(repr((loader.__name__, stamps, settings)).encode('utf-8')).hexdigest()[:16]
+
+            if _loaded.get(loader.__name__, (None,))[0] != key:
+                cache_path = os.path.join(CACHE_DIR, f"{loader.__name__}-{key}.pkl")
+
+                try:
+                    result = pandas.read_pickle(cache_path)
+                    increment('loader disk cache hits')
+                except FileNotFoundError:
+                    increment('loader cache misses')
+
+                    with span(loader.__name__):
+                        result = loader()
 
+                    content = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+                    replace_cache_file(cache_path, content, f"{loader.__name__}-*.pkl")
+
+                # replaces the result of older versions of the files
+                _loaded[loader.__name__] = (key, result)
+
+            return _loaded[loader.__name__][1].copy()
+
+        return cached_loader
+
+    return decorator
+
+
+def replace_cache_file(cache_path, content, pattern):
+    """
+    Write content to cache_path in CACHE_DIR and remove the other files matching pattern, its older versions
+
+    Other processes, such as pipeline stages running at the same time, may be reading, writing or removing the same
+    files, so the file is written atomically and files already removed are skipped.
+
+    """
+    write_atomic(cache_path, content)
+
+    for old_path in glob.glob(os.path.join(CACHE_DIR, pattern)):
+        if old_path != cache_path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+
+
+@cached_on('rosters.csv')
 def load_rosters():
     """
     Load current rosters
 
     """
-    rosters = pandas.read_csv('rosters.csv', comment='#')
+    rosters = pandas.read_csv('rosters.csv', comment='#', dtype=DTYPES['rosters.csv'])
 
     return rosters
 
 
+@cached_on('projections.csv', settings=POINTS_SCORING)
 def load_projections():
     """
     Load projections
 
     """
-    projections = pandas.read_csv('projections.csv')
+    return prepare_projections(pandas.read_csv('projections.csv', dtype=DTYPES['projections.csv']))
+
+
+def prepare_projections(projections):
+    """
+    Add fantasy points and team games to play to Hashtag Basketball projections
 
-    projections = projections.eval('fpoints = 1.0 * pts + 1.2 * treb + 1.5 * ast + 3.0 * blk + 3.0 * stl - 1.0 * to')
+    """
+    projections = projections.assign(fpoints=fantasy_points(projections, POINTS_SCORING))
 
     team_gtp = calc_team_games_to_play(projections)
 
@@ -32,24 +129,73 @@ def load_projections():
     return projections
 
 
+@cached_on('yahoo_playing_time.csv')
 def load_recent_playing_time():
-    pt = pandas.read_csv('yahoo_playing_time.csv', na_values=['-'])
+    return prepare_recent_playing_time(pandas.read_csv('yahoo_playing_time.csv', na_values=['-'], dtype=DTYPES['yahoo_playing_time.csv']))
+
+
+def prepare_recent_playing_time(pt):
+    """
+    Games played and minutes per game of every player in the Yahoo last 14 days stats
+
+    """
+    pt = pt.copy()
 
     components = pt['mpg'].str.split(':', n=2, expand=True)
 
-    pt['mpg_recent'] = components[[0]].astype(float).values + components[[1]].astype(float).values / 60
+    # players without minutes are "-", read as missing from the csv but kept as they are in historical snapshots
+    minutes = pandas.to_numeric(components[0], errors='coerce')
+    seconds = pandas.to_numeric(components[1], errors='coerce')
+
+    pt['mpg_recent'] = minutes.values + seconds.values / 60
 
     pt['gp_recent'] = pt['gtp']
 
     return pt[['yahoo_id', 'gp_recent', 'mpg_recent']]
 
 
+@cached_on('yahoo_projections.csv')
+def load_yahoo_projections():
+    """
+    Load Yahoo rest of season projections
+
+    """
+    return pandas.read_csv('yahoo_projections.csv', dtype=DTYPES['yahoo_projections.csv'])
+
+
+@cached_on('id_mapping.csv')
+def load_id_mapping():
+    """
+    Load mapping between Hashtag Basketball names and Yahoo ids
+
+    """
+    return pandas.read_csv('id_mapping.csv', dtype=DTYPES['id_mapping.csv'])
+
+
+@cached_on('gtp_manual.csv')
+def load_gtp_manual():
+    """
+    Load manual overrides of games to play
+
+    """
+    return pandas.read_csv('gtp_manual.csv', comment='#', dtype=DTYPES['gtp_manual.csv'])
+
+
+@cached_on('standings.csv')
+def load_standings_table():
+    """
+    Load current roto standings as retrieved from Yahoo
+
+    """
+    return pandas.read_csv('standings.csv', dtype=DTYPES['standings.csv'])
+
+
 def calc_team_games_to_play(projections):
     """
     Assume that each team has a player projected to play in every remaining game. Use that player's games to play as the team's.
 
     """
-    team_gtp = projections.groupby('team', as_index=False).aggregate({
+    team_gtp = projections.groupby('team', as_index=False, observed=True).aggregate({
         'gp': 'max'
     })
 
@@ -0,0 +1,328 @@
+"""
+Local HTTP service answering roto valuation and what-if questions from league state kept in memory
+
+The projections, standings and valuations are computed once and kept, along with the SwapEngine, so a query only
+evaluates the moves it asks about. When an input CSV changes on disk, only the parts of the state that depend on it are
+recomputed before the next query.
+
+Endpoints (all GET, all returning JSON):
+
+    /valuation?team_id=1        rest of season values of every player, or of one team's players
+    /free_agents?n=15           best available free agents by total value
+    /standings                  projected final standings and roto points
+    /whatif?drop=1001&add=1244  final roto points of my team (or team_id) after dropping / adding players
+
+drop and add take comma separated Yahoo ids. Added players on another team are taken off that team, so trades can be
+evaluated too.
+
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy
+import pandas
+
+from calc_roto import (
+    IMPORTANT_CATS, RANKING_COLUMNS, STANDINGS_COLUMNS, VALUE_COLUMNS, SwapEngine, calc_buffer_values,
+    calc_final_standings, calc_rankings, calc_ros_values, combine_projections, load_standings
+)
+from instrumentation import entry_point, parse_args, span
+from utils import load_rosters
+from config import MY_TEAM_ID
+
+
+# input files of each part of the league state
+PROJECTION_INPUTS = ['projections.csv', 'yahoo_projections.csv', 'yahoo_playing_time.csv', 'gtp_manual.csv', 'id_mapping.csv']
+ROSTER_INPUTS = ['rosters.csv']
+STANDINGS_INPUTS = ['standings.csv']
+STATE_INPUTS = {'projections': PROJECTION_INPUTS, 'rosters': ROSTER_INPUTS, 'standings': STANDINGS_INPUTS}
+
+PLAYER_COLUMNS = ['yahoo_name', 'yahoo_id', 'team_id', 'rank', 'gtp', 'p_mpg'] + VALUE_COLUMNS
+
+
+@entry_point
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default='127.0.0.1', help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    args = parse_args(parser)
+
+    state = LeagueState()
+    state.refresh()
+
+    server = ThreadingHTTPServer((args.host, args.port), ValuationHandler)
+    server.state = state
+
+    print(f"Serving valuations on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class LeagueState:
+    """
+    Projections, standings, valuations and SwapEngine of the league, recomputed only when their inputs change
+
+    Projections depend on PROJECTION_INPUTS, the players' teams on ROSTER_INPUTS as well and the standings on
+    STANDINGS_INPUTS. The valuations and the SwapEngine depend on all of them.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stamps = {}
+
+        self.projections = None
+        self.ros = None
+        self.standings = None
+
+        self.final_standings = None
+        self.rankings = None
+        self.ros_values = None
+        self.engine = None
+        self.rows = None
+
+    def refresh(self):
+        """
+        Recompute the parts of the state whose input files changed since they were last computed
+
+        Returns the names of the recomputed parts. The new state replaces the old one all at once, and only once every
+        part is recomputed, so if loading an input fails (e.g. a CSV caught mid-write) the old state is kept and the
+        next refresh tries again.
+
+        """
+        with self.lock:
+            # taken before loading, so that files changing while they're loaded are loaded again next time
+            stamps = {part: file_stamps(paths) for part, paths in STATE_INPUTS.items()}
+            changed = [part for part in STATE_INPUTS if self.stamps.get(part) != stamps[part]]
+
+            if not changed:
+                return []
+
+            refreshed = []
+            projections, ros, standings = self.projections, self.ros, self.standings
+
+            if 'projections' in changed:
+                projections = combine_projections()
+                refreshed.append('projections')
+
+            if 'projections' in changed or 'rosters' in changed:
+                rosters = load_rosters()
+                ros = projections.merge(rosters[['yahoo_id', 'team_id']], on='yahoo_id', how='left')
+                refreshed.append('rosters')
+
+            if 'standings' in changed:
+                standings = load_standings()
+                refreshed.append('standings')
+
+            final_standings = calc_final_standings(standings, ros)
+            rankings = calc_rankings(final_standings)
+            ros_values = calc_ros_values(final_standings, ros).reset_index(drop=True)
+
+            engine = SwapEngine(standings, ros_values)
+            rows = {int(yahoo_id): row for row, yahoo_id in enumerate(ros_values['yahoo_id']) if pandas.notna(yahoo_id)}
+            refreshed.append('valuations')
+
+            self.projections, self.ros, self.standings = projections, ros, standings
+            self.final_standings, self.rankings, self.ros_values = final_standings, rankings, ros_values
+            self.engine, self.rows = engine, rows
+            self.stamps = stamps
+
+            return refreshed
+
+    def valuation(self, team_id=None):
+        values = self.ros_values[PLAYER_COLUMNS]
+
+        if team_id is not None:
+            values = values[values['team_id'] == team_id]
+
+        return records(values)
+
+    def free_agents(self, n=15):
+        values = self.ros_values.loc[self.ros_values['team_id'].isna(), PLAYER_COLUMNS]
+
+        return records(values.sort_values('total_value', ascending=False).head(n))
+
+    def final(self):
+        standings = self.final_standings[['team_id'] + STANDINGS_COLUMNS]
+
+        return {
+            'standings': records(standings),
+            'rankings': records(self.rankings[['team_id'] + RANKING_COLUMNS]),
+        }
+
+    def whatif(self, drop_ids, add_ids, team_id=MY_TEAM_ID):
+        """
+        Final standings of a team after it drops drop_ids and adds add_ids, all Yahoo ids
+
+        Added players that are on other teams are taken off those teams. Raises KeyError for an unknown team or player
+        and ValueError for dropping a player not on the team, adding a player already on it or repeating a player.
+
+        """
+        for action, yahoo_ids in (('dropped', drop_ids), ('added', add_ids)):
+            repeated = sorted({yahoo_id for yahoo_id in yahoo_ids if yahoo_ids.count(yahoo_id) > 1})
+
+            if repeated:
+                raise ValueError(f"players {repeated} are {action} more than once")
+
+        team = self.engine.team_index[team_id]
+        rosters = {team: list(self.engine.rosters[team])}
+
+        for yahoo_id in drop_ids:
+            row = self.rows[yahoo_id]
+
+            if row not in rosters[team]:
+                raise ValueError(f"player {yahoo_id} is not on team {team_id}")
+
+            rosters[team].remove(row)
+
+        for yahoo_id in add_ids:
+            row = self.rows[yahoo_id]
+            other_team_id = self.ros_values.at[row, 'team_id']
+
+            if row in rosters[team]:
+                raise ValueError(f"player {yahoo_id} is already on team {team_id}")
+
+            if pandas.notna(other_team_id) and other_team_id != team_id:
+                other_team = self.engine.team_index[other_team_id]
+                rosters.setdefault(other_team, list(self.engine.rosters[other_team])).remove(row)
+
+            rosters[team].append(row)
+
+        final, ranks = self.engine.move(rosters)
+
+        changes = ranks[team] - self.engine.ranks[team]
+        buffer = calc_buffer_values(final[:, self.engine.buffer_columns], team)
+
+        return {
+            'team_id': team_id,
+            'drop': drop_ids,
+            'add': add_ids,
+            'total': ranks[team, -1],
+            'total_change': changes[-1],
+            'changes': {col: change for col, change in zip(RANKING_COLUMNS, changes) if change != 0},
+            'rankings': dict(zip(RANKING_COLUMNS, ranks[team])),
+            'standings': dict(zip(STANDINGS_COLUMNS, final[team])),
+            'buffer': {cat: buffer[cat] for cat in IMPORTANT_CATS},
+            'other_teams': {
+                int(self.engine.team_ids[other]): ranks[other, -1] - self.engine.ranks[other, -1]
+                for other in rosters if other != team
+            },
+        }
+
+
+class ValuationHandler(BaseHTTPRequestHandler):
+    """
+    Answers queries from the LeagueState of the server, refreshing it first
+
+    """
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        start = time.perf_counter()
+        state = self.server.state
+
+        try:
+            with span(url.path):
+                try:
+                    state.refresh()
+                except Exception as e:
+                    # the inputs are broken, not the query
+                    traceback.print_exc()
+                    self.send_json(500, {'error': f"refreshing the league state failed: {type(e).__name__}: {e}"})
+                    return
+
+                with state.lock:
+                    if url.path == '/valuation':
+                        body = state.valuation(int(query['team_id']) if 'team_id' in query else None)
+                    elif url.path == '/free_agents':
+                        body = state.free_agents(int(query.get('n', 15)))
+                    elif url.path == '/standings':
+                        body = state.final()
+                    elif url.path == '/whatif':
+                        body = state.whatif(
+                            parse_ids(query.get('drop')), parse_ids(query.get('add')),
+                            int(query.get('team_id', MY_TEAM_ID))
+                        )
+                    else:
+                        self.send_json(404, {'error': f"unknown path {url.path}"})
+                        return
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {'error': f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+
+        self.send_json(200, body, time.perf_counter() - start)
+
+    def send_json(self, status, body, elapsed=None):
+        content = json.dumps(to_json(body), allow_nan=False).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        if elapsed is not None:
+            self.send_header('Server-Timing', f"total;dur={elapsed * 1000:.1f}")
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def file_stamps(paths):
+    """
+    Modification time and size of each of paths that exists
+
+    """
+    return [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths if os.path.exists(path)]
+
+
+def parse_ids(ids):
+    if not ids:
+        return []
+
+    return [int(yahoo_id) for yahoo_id in ids.split(',')]
+
+
+def records(frame):
+    """
+    Rows of a DataFrame as a list of dicts, with missing values as None
+
+    """
+    return json.loads(frame.to_json(orient='records'))
+
+
+def to_json(value):
+    """
+    Convert a body for json.dumps: numpy scalars to Python numbers and NaN and infinite floats to None
+
+    Floats are checked even inside dicts and lists, since numpy.float64 is a float that json.dumps would write as NaN.
+
+    """
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+
+    if isinstance(value, numpy.integer):
+        return int(value)
+
+    if isinstance(value, (float, numpy.floating)):
+        return float(value) if numpy.isfinite(value) else None
+
+    return value
+
+
+if __name__ == '__main__':
+    main()
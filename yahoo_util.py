@@ -3,15 +3,22 @@ Yahoo API utility functions
 
 """
 import json
+import os
+import time
 
+import requests
 from lxml import etree
 from rauth import OAuth2Service
 
 from config import YAHOO_CLIENT_ID, YAHOO_CLIENT_SECRET, yahoo_refresh_token
+from http_util import HTTP_CACHE
 
 
 NS = {'f': 'http://fantasysports.yahooapis.com/fantasy/v2/base.rng'}
 
+# base url of the Fantasy Sports API, can be pointed at a local fake server
+API_URL = os.environ.get('YAHOO_API_URL', 'https://fantasysports.yahooapis.com/fantasy/v2')
+
 
 def create_yahoo_service():
     """
@@ -60,10 +67,35 @@ def json_decoder(content):
     return json.loads(str_content)
 
 
+def get_with_retries(session, url, ttl=0, retries=3, backoff=1):
+    """
+    GET a url through the HTTP cache, retrying connection errors, rate limiting and server errors with exponential
+    backoff
+
+    Cached responses younger than ttl seconds are used without a request.
+
+    """
+    for attempt in range(retries + 1):
+        try:
+            r = HTTP_CACHE.get(session, url, ttl=ttl)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+        else:
+            if r.status_code != 429 and r.status_code < 500:
+                r.raise_for_status()
+                return r
+
+            if attempt == retries:
+                r.raise_for_status()
+
+        time.sleep(backoff * 2 ** attempt)
+
+
 def get_sport_id():
     session = get_yahoo_session()
 
-    r = session.get('https://fantasysports.yahooapis.com/fantasy/v2/game/nba')
+    r = session.get(f'{API_URL}/game/nba')
 
     root = etree.fromstring(r.content)
 